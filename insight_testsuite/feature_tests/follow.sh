@@ -0,0 +1,8 @@
+# The follow mode writes the blocked attempts of the batch run of every fixture while its lines are appended to the
+# followed log, with a partial line, a rotation and a truncation in between, and the login failure detector of the
+# follow mode evicts the idle and the least recently seen hosts.
+
+function run_follow_tests {
+  run_python_tests ${FEATURE_TESTS_PATH}/test_follow.py ${TEST_OUTPUT_PATH} \
+    $(for log_file in ${FIXTURE_LOGS}; do dirname $(dirname ${log_file}); done)
+}
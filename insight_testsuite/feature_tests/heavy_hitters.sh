@@ -0,0 +1,22 @@
+# Every fixture log processed with Space-Saving counters of more keys than its distinct hosts and resources gives the
+# expected outputs, the counters of a seeded synthetic log with many more distinct hosts and resources than keys
+# still report its top hosts and resources, and the counts of the counters are within their error bounds.
+
+HEAVY_HITTERS_CAPACITY=300
+
+function run_heavy_hitters_tests {
+  for log_file in ${FIXTURE_LOGS}; do
+    fixture_path=$(dirname $(dirname ${log_file}))
+    output_path=${TEST_OUTPUT_PATH}/$(basename ${fixture_path})
+
+    run_features ${output_path} ${log_file} --heavy-hitters 1000
+    compare_outputs ${fixture_path}/log_output ${output_path} $(basename ${fixture_path})
+  done
+
+  python ${PROJECT_PATH}/src/log_generator.py ${TEST_OUTPUT_PATH}/log.txt --lines 30000 --hosts 5000 --uris 2000 \
+    --seed 5 > /dev/null
+  run_features ${TEST_OUTPUT_PATH}/exact ${TEST_OUTPUT_PATH}/log.txt
+  run_features ${TEST_OUTPUT_PATH}/approximate ${TEST_OUTPUT_PATH}/log.txt --heavy-hitters ${HEAVY_HITTERS_CAPACITY}
+
+  run_python_tests ${FEATURE_TESTS_PATH}/test_heavy_hitters.py ${TEST_OUTPUT_PATH} ${HEAVY_HITTERS_CAPACITY}
+}
@@ -0,0 +1,11 @@
+# Every fixture log processed by the single-pass engine with the log file memory-mapped gives the expected outputs.
+
+function run_mmap_tests {
+  for log_file in ${FIXTURE_LOGS}; do
+    fixture_path=$(dirname $(dirname ${log_file}))
+    output_path=${TEST_OUTPUT_PATH}/$(basename ${fixture_path})
+
+    run_features ${output_path} ${log_file} --mmap
+    compare_outputs ${fixture_path}/log_output ${output_path} $(basename ${fixture_path})
+  done
+}
@@ -0,0 +1,11 @@
+# The queries of the query server on the custom_tests log give its expected outputs, a partial line appended to the
+# log is held back until its newline is written, the log is loaded again after it is rotated or truncated, and every
+# invalid query is rejected.
+
+function run_query_server_tests {
+  # the last line of the custom_tests log has no newline, it is appended by the tests
+  cp ${GRADER_ROOT}/tests/custom_tests/log_input/log.txt ${TEST_OUTPUT_PATH}/log.txt
+
+  run_python_tests ${FEATURE_TESTS_PATH}/test_query_server.py ${TEST_OUTPUT_PATH} \
+    ${GRADER_ROOT}/tests/custom_tests/log_output
+}
@@ -0,0 +1,27 @@
+"""Reports the results of a python feature test script to run_feature_tests.sh, one "PASS test_name" or "FAIL
+test_name" line per test on the standard output. The messages printed by the tested modules are dropped."""
+
+import os
+import sys
+
+results_file, sys.stdout = sys.stdout, open(os.devnull, 'w')
+
+
+def report(test_name, passed):
+
+    """Reports whether the test passed."""
+
+    results_file.write('{} {}\n'.format('PASS' if passed else 'FAIL', test_name))
+
+
+def raises(error, function, *args, **kwargs):
+
+    """Tells whether calling the function with the arguments raises the error, and not e.g. exits the program."""
+
+    try:
+        function(*args, **kwargs)
+        return False
+    except error:
+        return True
+    except SystemExit:
+        return False
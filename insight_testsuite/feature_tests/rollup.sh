@@ -0,0 +1,12 @@
+# The range queries of the rollup index saved by process_log match a brute force count over the records of a seeded
+# synthetic log, including the ranges not aligned to the minute or the hour, the index answers the same queries after
+# a save and load round trip, and an index of another version is rejected.
+
+function run_rollup_tests {
+  python ${PROJECT_PATH}/src/log_generator.py ${TEST_OUTPUT_PATH}/log.txt --lines 20000 --hosts 500 --uris 300 \
+    --span-days 2 --seed 7 > /dev/null
+  python ${PROJECT_PATH}/src/process_log.py ${TEST_OUTPUT_PATH}/log.txt /dev/null /dev/null /dev/null /dev/null \
+    ${TEST_OUTPUT_PATH}/bad_records.txt --rollup-index ${TEST_OUTPUT_PATH}/rollup.npz > /dev/null
+
+  run_python_tests ${FEATURE_TESTS_PATH}/test_rollup.py ${TEST_OUTPUT_PATH}
+}
@@ -0,0 +1,47 @@
+# Every fixture log with its consecutive lines rotated into a gzip, a bzip2 and an uncompressed file, oldest first,
+# processed through a glob gives the expected outputs.
+
+function run_rotated_tests {
+  for log_file in ${FIXTURE_LOGS}; do
+    fixture_path=$(dirname $(dirname ${log_file}))
+    rotated_path=${TEST_OUTPUT_PATH}/$(basename ${fixture_path})
+    mkdir -p ${rotated_path}
+
+    split -n l/3 -d ${log_file} ${rotated_path}/part.
+    gzip -c ${rotated_path}/part.00 > ${rotated_path}/access.log.2.gz
+    bzip2 -c ${rotated_path}/part.01 > ${rotated_path}/access.log.1.bz2
+    mv ${rotated_path}/part.02 ${rotated_path}/access.log
+    rm ${rotated_path}/part.*
+
+    run_features ${rotated_path}/output "${rotated_path}/access.log*"
+    compare_outputs ${fixture_path}/log_output ${rotated_path}/output $(basename ${fixture_path})
+  done
+
+  run_rotated_without_commands_tests
+}
+
+# Without the decompressor commands on the PATH, a corrupt and a truncated gzip file are read with the gzip module and
+# fail with a decompression error, instead of hanging or failing without a message.
+
+function run_rotated_without_commands_tests {
+  local commands_path=${TEST_OUTPUT_PATH}/commands
+  local log_file=${GRADER_ROOT}/tests/test_features/log_input/log.txt
+  mkdir -p ${commands_path}
+  ln -s $(python -c 'import sys; print sys.executable') ${commands_path}/python
+
+  gzip -c ${log_file} > ${TEST_OUTPUT_PATH}/corrupt.log.gz
+  printf '%030d' 0 | dd of=${TEST_OUTPUT_PATH}/corrupt.log.gz bs=1 seek=30 conv=notrunc 2> /dev/null
+  gzip -c ${log_file} | head -c 200 > ${TEST_OUTPUT_PATH}/truncated.log.gz
+
+  for broken_file in corrupt.log.gz truncated.log.gz; do
+    for engine in pandas single-pass; do
+      if timeout 30 env PATH=${commands_path} python ${PROJECT_PATH}/src/process_log.py \
+          ${TEST_OUTPUT_PATH}/${broken_file} /dev/null /dev/null /dev/null /dev/null /dev/null --engine ${engine} \
+          2>&1 | grep -q 'Error decompressing the log file'; then
+        report_result PASS "${broken_file} ${engine} engine without the decompressor commands"
+      else
+        report_result FAIL "${broken_file} ${engine} engine without the decompressor commands"
+      fi
+    done
+  done
+}
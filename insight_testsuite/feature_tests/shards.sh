@@ -0,0 +1,27 @@
+# Every fixture log split into 1, 2, 3 and 5 consecutive shards of lines, mapped into partial aggregates files and
+# reduced gives the same outputs as a single run over the whole log.
+
+SHARD_COUNTS="1 2 3 5"
+
+function run_shards_tests {
+  for log_file in ${FIXTURE_LOGS}; do
+    test_folder=$(basename $(dirname $(dirname ${log_file})))
+    run_features ${TEST_OUTPUT_PATH}/${test_folder}/single ${log_file}
+
+    for num_shards in ${SHARD_COUNTS}; do
+      shard_path=${TEST_OUTPUT_PATH}/${test_folder}/shards-${num_shards}
+      mkdir -p ${shard_path}
+      split -n l/${num_shards} -d ${log_file} ${shard_path}/log.
+
+      # the shards are mapped in their reverse order, the reduce step orders them by their first timestamp
+      for shard_file in $(ls -r ${shard_path}/log.*); do
+        python ${PROJECT_PATH}/src/process_log.py ${shard_file} /dev/null /dev/null /dev/null /dev/null \
+          ${shard_file}.bad --engine single-pass --map ${shard_file}.part > /dev/null 2>&1
+      done
+
+      run_features ${shard_path}/output "${shard_path}/*.part" --reduce
+      compare_outputs ${TEST_OUTPUT_PATH}/${test_folder}/single ${shard_path}/output \
+        "${test_folder} ${num_shards} shards"
+    done
+  done
+}
@@ -0,0 +1,16 @@
+# The sketches of the parts of a seeded synthetic log merged are the sketches of the whole log, the distinct hosts and
+# bytes quantiles estimates are within their error bounds, and a sketch file with registers of the wrong shape is
+# rejected.
+
+function run_sketches_tests {
+  python ${PROJECT_PATH}/src/log_generator.py ${TEST_OUTPUT_PATH}/log.txt --lines 30000 --hosts 5000 --uris 500 \
+    --seed 11 > /dev/null
+  split -n l/3 -d ${TEST_OUTPUT_PATH}/log.txt ${TEST_OUTPUT_PATH}/part.
+
+  for log_file in ${TEST_OUTPUT_PATH}/log.txt ${TEST_OUTPUT_PATH}/part.*; do
+    python ${PROJECT_PATH}/src/process_log.py ${log_file} /dev/null /dev/null /dev/null /dev/null \
+      ${log_file}.bad --engine single-pass --sketch-stats ${log_file}.npz > /dev/null
+  done
+
+  run_python_tests ${FEATURE_TESTS_PATH}/test_sketches.py ${TEST_OUTPUT_PATH}
+}
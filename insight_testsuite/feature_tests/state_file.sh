@@ -0,0 +1,23 @@
+# Every fixture log processed incrementally with a state file gives the expected outputs: the first half of the lines
+# is checkpointed, then the second half is appended and the run resumed, then the newline of the last line, held back
+# while partially written, is appended and the run resumed again.
+
+function run_state_file_tests {
+  for log_file in ${FIXTURE_LOGS}; do
+    fixture_path=$(dirname $(dirname ${log_file}))
+    output_path=${TEST_OUTPUT_PATH}/$(basename ${fixture_path})
+    incremental_log=${output_path}/incremental.log
+    mkdir -p ${output_path}
+
+    num_lines=$(wc -l < ${log_file})
+    head -n $((num_lines / 2)) ${log_file} > ${incremental_log}
+    run_features ${output_path} ${incremental_log} --state-file ${output_path}/state
+    tail -n +$((num_lines / 2 + 1)) ${log_file} >> ${incremental_log}
+    run_features ${output_path} ${incremental_log} --state-file ${output_path}/state
+    if [ -n "$(tail -c 1 ${incremental_log})" ]; then
+      echo >> ${incremental_log}
+      run_features ${output_path} ${incremental_log} --state-file ${output_path}/state
+    fi
+    compare_outputs ${fixture_path}/log_output ${output_path} $(basename ${fixture_path})
+  done
+}
@@ -0,0 +1,118 @@
+import os
+import sys
+import time
+import thread
+import threading
+
+from log_aggregator import ExpiringLoginFailureDetector
+from log_follower import follow_log_file
+from process_log import LogPipeline, PipelineConfig
+from reporting import report
+
+test_path, fixture_paths = sys.argv[1], sys.argv[2:]
+
+# the follow mode checks the log file again every 0.2 seconds, so the waits give it time to read the appended lines
+FOLLOW_WAIT = 0.5
+
+
+def read_lines(file_name):
+    with open(file_name) as input_file:
+        return input_file.read().splitlines()
+
+
+def append_text(file_name, text, mode='a'):
+    with open(file_name, mode) as output_file:
+        output_file.write(text)
+
+
+def append_lines(file_name, lines, mode='a'):
+    append_text(file_name, ''.join(line + '\n' for line in lines), mode)
+
+
+def feed_log_file(log_file, log_lines, blocked_file, num_blocked_lines):
+
+    """Appends the log lines in four parts, a partial line, a rotation and a truncation apart, and stops the follow
+    mode running in the main thread like Ctrl+C once the blocked attempts are written."""
+
+    parts = [log_lines[part * len(log_lines) // 4:(part + 1) * len(log_lines) // 4] for part in range(4)]
+
+    time.sleep(FOLLOW_WAIT)
+    append_lines(log_file, parts[0])
+
+    # the last line of the second part is written in two halves
+    time.sleep(FOLLOW_WAIT)
+    append_lines(log_file, parts[1][:-1])
+    append_text(log_file, parts[1][-1][:len(parts[1][-1]) // 2])
+    time.sleep(FOLLOW_WAIT)
+    append_lines(log_file, [parts[1][-1][len(parts[1][-1]) // 2:]])
+
+    # the log file is rotated, the new file is followed from its start
+    time.sleep(FOLLOW_WAIT)
+    os.rename(log_file, log_file + '.1')
+    append_lines(log_file, parts[2], mode='w')
+
+    # the log file is truncated, and followed from its start again
+    time.sleep(FOLLOW_WAIT)
+    append_text(log_file, '', mode='w')
+    time.sleep(FOLLOW_WAIT)
+    append_lines(log_file, parts[3])
+
+    stop_time = time.time() + 10
+    while time.time() < stop_time and len(read_lines(blocked_file)) < num_blocked_lines:
+        time.sleep(0.1)
+
+    time.sleep(FOLLOW_WAIT)
+    thread.interrupt_main()
+
+
+# the blocked attempts of the followed log are the blocked attempts of the batch run of every fixture
+for fixture_path in fixture_paths:
+    fixture_name = os.path.basename(fixture_path)
+    log_file, blocked_file = test_path + '/' + fixture_name + '.log', test_path + '/' + fixture_name + '.blocked'
+    expected_blocked_lines = read_lines(fixture_path + '/log_output/blocked.txt')
+
+    # the lines already in the log file are not followed
+    append_lines(log_file, ['old line'], mode='w')
+    append_text(blocked_file, '', mode='w')
+
+    feeder = threading.Thread(target=feed_log_file, args=(log_file, read_lines(fixture_path + '/log_input/log.txt'),
+                                                          blocked_file, len(expected_blocked_lines)))
+    feeder.start()
+
+    try:
+        LogPipeline(PipelineConfig()).follow(input_file=log_file, blocked_file=blocked_file,
+                                             bad_records_file=test_path + '/' + fixture_name + '.bad')
+    except KeyboardInterrupt:
+        pass
+
+    feeder.join()
+
+    report(fixture_name + ' blocked', read_lines(blocked_file) == expected_blocked_lines and
+           'old line' not in read_lines(test_path + '/' + fixture_name + '.bad'))
+
+# a partial line is only yielded once its new line character is written
+log_file = test_path + '/partial.log'
+append_lines(log_file, ['old line'], mode='w')
+log_lines = follow_log_file(input_file=log_file, poll_interval=0.01)
+threading.Timer(0.2, append_text, args=(log_file, 'first line\nsecond ')).start()
+threading.Timer(0.6, append_text, args=(log_file, 'line\n')).start()
+report('partial line', next(log_lines) == 'first line' and next(log_lines) == 'second line')
+log_lines.close()
+
+# the hosts idle for longer than the login failure and blocked windows are evicted, and the least recently seen hosts
+# beyond the limit, without changing the blocks of the active hosts
+login_failure_detector = ExpiringLoginFailureDetector(blocked_window_time=5, consecutive_failure_limit=3,
+                                                      login_failure_window=20, max_tracked_hosts=2)
+for timestamp in [0, 1]:
+    login_failure_detector.update('idle.host', timestamp, '401')
+for timestamp in [400, 401, 402]:
+    login_failure_detector.update('blocked.host', timestamp, '401')
+report('idle host evicted', 'idle.host' not in login_failure_detector.host_states and
+       login_failure_detector.num_evicted_hosts == 1 and
+       login_failure_detector.update('blocked.host', 403, '200'))
+
+login_failure_detector.update('first.host', 404, '401')
+login_failure_detector.update('second.host', 405, '401')
+report('least recently seen host evicted', sorted(login_failure_detector.host_states) == ['first.host', 'second.host']
+       and login_failure_detector.num_evicted_hosts == 2 and
+       not login_failure_detector.update('blocked.host', 406, '200'))
@@ -0,0 +1,59 @@
+import sys
+import numpy as np
+from collections import Counter
+
+from heavy_hitters import SpaceSavingCounter
+from reporting import report
+
+test_path, capacity = sys.argv[1], int(sys.argv[2])
+
+
+def read_lines(file_name):
+    with open(file_name) as input_file:
+        return input_file.read().splitlines()
+
+
+def count_keys(keys, weights, capacity):
+    counter = SpaceSavingCounter(capacity=capacity)
+    for key, weight in zip(keys, weights):
+        counter[key] += weight
+    return counter
+
+
+def within_bounds(counter, exact_counts, total):
+    # every kept key is overestimated by at most its error, itself at most total / capacity, and every key with more
+    # than total / capacity is kept
+    return len(counter) <= counter.capacity and \
+        all(exact_counts[key] <= count <= exact_counts[key] + counter.get_error(key) <= exact_counts[key] +
+            total // counter.capacity for key, count in counter.iteritems()) and \
+        all(key in counter for key, count in exact_counts.iteritems() if count > total // counter.capacity)
+
+
+# a seeded Zipf stream of keys, counted and weighted like the host visits and the bytes of the resources
+random_state = np.random.RandomState(3)
+keys = (random_state.zipf(1.3, 20000) % 5000).tolist()
+weights = random_state.randint(0, 10000, len(keys)).tolist()
+exact_counts, exact_weights = Counter(keys), Counter()
+for key, weight in zip(keys, weights):
+    exact_weights[key] += weight
+
+large_counter = count_keys(keys, [1] * len(keys), 5000)
+report('counts exact above the distinct keys', large_counter.counts == exact_counts and
+       not any(large_counter.errors.values()))
+report('counts within the error bounds', within_bounds(count_keys(keys, [1] * len(keys), 100), exact_counts,
+                                                       len(keys)))
+report('weights within the error bounds', within_bounds(count_keys(keys, weights, 100), exact_weights, sum(weights)))
+
+# the top hosts and resources of the synthetic log, with many more distinct hosts and resources than the capacity, are
+# the exact ones, the host visits overestimated by at most the number of requests / capacity
+exact_hosts = [line.split(',') for line in read_lines(test_path + '/exact/hosts.txt')]
+approximate_hosts = [line.split(',') for line in read_lines(test_path + '/approximate/hosts.txt')]
+num_requests = len(read_lines(test_path + '/log.txt'))
+num_distinct_hosts = len(set(line.split(' ', 1)[0] for line in read_lines(test_path + '/log.txt')))
+
+report('top hosts at a small capacity', num_distinct_hosts > 10 * capacity and len(exact_hosts) == 10 and
+       [host for host, count in approximate_hosts] == [host for host, count in exact_hosts] and
+       all(int(exact_count) <= int(count) <= int(exact_count) + num_requests // capacity
+           for (host, exact_count), (host, count) in zip(exact_hosts, approximate_hosts)))
+report('top resources at a small capacity', read_lines(test_path + '/approximate/resources.txt') ==
+       read_lines(test_path + '/exact/resources.txt'))
@@ -0,0 +1,101 @@
+import os
+import sys
+import gzip
+
+from query_server import QueryServer
+from reporting import report, raises
+
+test_path, expected_path = sys.argv[1], sys.argv[2]
+log_file = test_path + '/log.txt'
+
+
+def read_lines(file_name):
+    with open(file_name) as input_file:
+        return input_file.read().splitlines()
+
+
+def get_results(query_server, query, parameters=None):
+    return query_server.query(query, parameters or dict())['results']
+
+
+def is_rejected(query_server, query, parameters, error=ValueError):
+    return raises(error, query_server.query, query, parameters)
+
+
+with open(log_file) as input_file:
+    log_lines = input_file.read().splitlines()
+
+query_server = QueryServer(log_files=[log_file], refresh_interval=0)
+
+# the last line, without its newline, is held back
+report('partial line held back', get_results(query_server, 'hosts') == ['199.72.81.55,22'] and
+       get_results(query_server, 'statuses') == ['200,5', '401,17'])
+
+blocked_status = get_results(query_server, 'blocked', {'host': '199.72.81.55'})
+report('blocked before the last line', blocked_status['blocked'] and
+       blocked_status['time'] == '01/Jul/1995:00:07:17 -0400' and
+       blocked_status['blocked_until'] == '01/Jul/1995:00:10:50 -0400' and
+       blocked_status['blocked_requests'] == len(read_lines(expected_path + '/blocked.txt')))
+
+# the last line is included once its newline is written
+with open(log_file, 'a') as output_file:
+    output_file.write('\n')
+report('partial line completed', query_server.log_states[log_file].refresh() and
+       get_results(query_server, 'hosts') == ['199.72.81.55,23'])
+
+report('hosts', get_results(query_server, 'hosts') == read_lines(expected_path + '/hosts.txt'))
+report('resources', get_results(query_server, 'resources') == read_lines(expected_path + '/resources.txt'))
+report('hours', get_results(query_server, 'hours')[60] == read_lines(expected_path + '/hours.txt'))
+report('statuses', get_results(query_server, 'statuses') == ['200,5', '401,18'])
+report('time range', get_results(query_server, 'hosts', {'start': '01/Jul/1995:00:05:00 -0400',
+                                                         'end': '01/Jul/1995:00:07:00 -0400'}) ==
+       ['199.72.81.55,8'])
+
+blocked_status = get_results(query_server, 'blocked', {'host': '199.72.81.55'})
+report('blocked', not blocked_status['blocked'] and blocked_status['time'] == '01/Jul/1995:00:10:51 -0400' and
+       blocked_status['blocked_requests'] == len(read_lines(expected_path + '/blocked.txt')) and
+       get_results(query_server, 'blocked', {'host': '199.72.81.55', 'at': '01/Jul/1995:00:10:51 -0400'}) ==
+       blocked_status and not get_results(query_server, 'blocked', {'host': '10.0.0.1'})['blocked'])
+
+# a rotated log file, a new file with the first lines, is loaded again from its start
+os.rename(log_file, log_file + '.1')
+with open(log_file, 'w') as output_file:
+    output_file.write('\n'.join(log_lines[:10]) + '\n')
+report('rotated log', query_server.log_states[log_file].refresh() and
+       get_results(query_server, 'hosts') == ['199.72.81.55,10'])
+
+# a truncated log file is loaded again from its start
+with open(log_file, 'w') as output_file:
+    output_file.write('\n'.join(log_lines[:4]) + '\n')
+report('truncated log', query_server.log_states[log_file].refresh() and
+       get_results(query_server, 'hosts') == ['199.72.81.55,4'])
+
+# the invalid queries are rejected, answered with a 400 error by the HTTP server
+report('unknown query rejected', is_rejected(query_server, 'visits', dict()))
+report('n not a number rejected', is_rejected(query_server, 'hosts', {'n': 'ten'}))
+report('period not a number rejected', is_rejected(query_server, 'hours', {'period': '60,hour'}))
+report('negative n rejected', is_rejected(query_server, 'hosts', {'n': '-1'}))
+report('period below 1 minute rejected', is_rejected(query_server, 'hours', {'period': '0'}))
+report('bad start time rejected', is_rejected(query_server, 'hosts', {'start': '1995-07-01 00:00:00'}))
+report('log not served rejected', is_rejected(query_server, 'hosts', {'log': test_path + '/other_log.txt'}))
+report('blocked without a host rejected', is_rejected(query_server, 'blocked', dict()))
+report('blocked before the latest record rejected',
+       is_rejected(query_server, 'blocked', {'host': '199.72.81.55', 'at': '01/Jul/1995:00:00:01 -0400'}))
+
+# the queries of a log whose aggregates alone take more than the memory limit fail, with a 503 error
+report('log over the memory limit rejected', is_rejected(QueryServer(log_files=[log_file], memory_limit=1), 'hosts',
+                                                         dict(), error=MemoryError))
+
+# the queries of a missing or a truncated compressed log fail with an IOError or OSError, answered with a 500 error,
+# instead of stopping the server
+report('missing log fails', is_rejected(QueryServer(log_files=[test_path + '/missing_log.txt']), 'hosts', dict(),
+                                        error=(IOError, OSError)))
+
+compressed_log_file = test_path + '/log.txt.gz'
+output_file = gzip.open(compressed_log_file, 'wb')
+output_file.write('\n'.join(log_lines * 100) + '\n')
+output_file.close()
+with open(compressed_log_file, 'r+b') as output_file:
+    output_file.truncate(os.path.getsize(compressed_log_file) // 2)
+report('truncated compressed log fails', is_rejected(QueryServer(log_files=[compressed_log_file]), 'hosts', dict(),
+                                                     error=IOError))
@@ -0,0 +1,128 @@
+import sys
+import json
+import random
+import numpy as np
+from collections import Counter
+
+from process_log import parse_log_file_chunks
+from rollup_index import RollupIndexBuilder, load_rollup_index, decode_batch_columns
+from log_aggregator import format_timestamp
+from timestamp_decoder import TimestampDecoder
+from log_tokenizer import LOG_LINE_REGEX
+from reporting import report, raises
+
+test_path = sys.argv[1]
+
+# the records of the log, decoded like the ones rolled up
+timestamp_decoder = TimestampDecoder()
+records = [decode_batch_columns(batch, timestamp_decoder) for batch in
+           parse_log_file_chunks(input_file=test_path + '/log.txt', regular_exp=LOG_LINE_REGEX, keep_log_entries=False)]
+records = dict((column, np.concatenate([batch[column] for batch in records if batch is not None]))
+               for column in ('host_name', 'uri', 'http_status_code', 'epoch_seconds', 'bytes_transferred'))
+epoch_seconds = records['epoch_seconds']
+
+
+def get_brute_force_totals(column, start_time, end_time, weights=None):
+    # the host, uri and status code ranges are rounded down to the minute
+    in_range = np.ones(len(epoch_seconds), dtype=bool)
+    if start_time is not None:
+        in_range &= epoch_seconds >= start_time // 60 * 60
+    if end_time is not None:
+        in_range &= epoch_seconds < end_time // 60 * 60
+    totals = Counter()
+    for value, weight in zip(records[column][in_range], (weights if weights is not None else
+                                                         np.ones(len(epoch_seconds), dtype=np.int64))[in_range]):
+        totals[value] += int(weight)
+    return totals
+
+
+def get_brute_force_busiest_periods(n, window_seconds, start_time, end_time):
+    # every second between the first and the last visit of the range is a window start
+    seconds = np.sort(epoch_seconds[(epoch_seconds >= (start_time if start_time is not None else -sys.maxint)) &
+                                    (epoch_seconds < (end_time if end_time is not None else sys.maxint))])
+    if len(seconds) == 0:
+        return list()
+    window_starts = np.arange(seconds[0], seconds[-1] + 1)
+    visits = np.searchsorted(seconds, window_starts + window_seconds) - np.searchsorted(seconds, window_starts)
+    return [(int(window_start), int(visits[window_start - seconds[0]]))
+            for window_start in window_starts[np.lexsort((window_starts, -visits))[:n]]]
+
+
+def get_top_n(totals, n):
+    return sorted(totals.iteritems(), key=lambda (value, total): (-total, value))[:n]
+
+
+def check_queries(rollup_index, time_ranges):
+    for start_time, end_time in time_ranges:
+        hosts = get_brute_force_totals('host_name', start_time, end_time)
+        uris = get_brute_force_totals('uri', start_time, end_time, weights=records['bytes_transferred'])
+        statuses = get_brute_force_totals('http_status_code', start_time, end_time)
+
+        if rollup_index.get_top_n('hosts', 10 ** 6, start_time, end_time) != get_top_n(hosts, 10 ** 6) or \
+                rollup_index.get_top_n('uris', 10, start_time, end_time) != get_top_n(uris, 10) or \
+                rollup_index.get_status_code_counts(start_time, end_time) != \
+                ['{},{}'.format(status_code, visits) for status_code, visits in sorted(statuses.iteritems())]:
+            return False
+
+        for window_seconds in (60, 3600):
+            busiest_periods = get_brute_force_busiest_periods(10, window_seconds, start_time, end_time)
+            if rollup_index.get_top_n_busiest_periods_by_window(10, [window_seconds // 60], start_time, end_time) \
+                    [window_seconds // 60] != ['{},{}'.format(format_timestamp(window_start, rollup_index.timezone),
+                                                              visits) for window_start, visits in busiest_periods]:
+                return False
+
+    return True
+
+
+rollup_index = load_rollup_index(test_path + '/rollup.npz')
+first_time, last_time = int(epoch_seconds.min()), int(epoch_seconds.max())
+first_hour = -(-first_time // 3600) * 3600
+
+random.seed(7)
+report('whole log', check_queries(rollup_index, [(None, None), (first_time, None), (None, last_time)]))
+report('hour aligned ranges', check_queries(rollup_index, [(first_hour, first_hour + 3600),
+                                                           (first_hour + 3600, first_hour + 5 * 3600)]))
+report('minute aligned ranges', check_queries(rollup_index, [(first_hour + 17 * 60, first_hour + 3600 + 43 * 60),
+                                                             (first_hour + 60, first_hour + 120)]))
+report('unaligned ranges', check_queries(rollup_index, [
+    (start_time, start_time + random.randint(1, 6 * 3600)) for start_time in
+    [random.randint(first_time - 3600, last_time) for _ in xrange(20)]] + [(first_hour + 59, first_hour + 3601)]))
+report('empty ranges', check_queries(rollup_index, [(last_time + 60, None), (None, first_time - 60),
+                                                    (first_hour + 30, first_hour + 50)]))
+
+# the index built in memory from the same records and saved again answers the same queries
+rollup_index_builder = RollupIndexBuilder()
+for batch in parse_log_file_chunks(input_file=test_path + '/log.txt', regular_exp=LOG_LINE_REGEX,
+                                   keep_log_entries=False):
+    rollup_index_builder.update(batch)
+rollup_index_builder.build().save(test_path + '/rollup_saved.npz')
+saved_index = load_rollup_index(test_path + '/rollup_saved.npz')
+report('save and load round trip', saved_index.num_records == rollup_index.num_records and
+       saved_index.timezone == rollup_index.timezone and
+       all(np.array_equal(saved_index.dimension_values[dimension], rollup_index.dimension_values[dimension])
+           for dimension in rollup_index.dimension_values) and
+       all(np.array_equal(saved_array, array) for rollup in rollup_index.rollups
+           for saved_array, array in zip(saved_index.rollups[rollup], rollup_index.rollups[rollup])) and
+       check_queries(saved_index, [(None, None), (first_hour + 59, first_hour + 3601)]))
+
+# the totals are exact above 2 ** 53 bytes, where float64 sums round
+large_index_builder = RollupIndexBuilder()
+large_index_builder.update_records({
+    'timezone': '-0400', 'host_name': np.array(['a', 'b', 'b'], dtype=object),
+    'uri': np.array(['/large', '/large', '/small'], dtype=object),
+    'http_status_code': np.array(['200', '200', '200'], dtype=object),
+    'epoch_seconds': np.array([first_hour, first_hour + 3 * 3600, first_hour + 3600], dtype=np.int64),
+    'bytes_transferred': np.array([2 ** 53, 1, 2 ** 53], dtype=np.int64)})
+large_index = large_index_builder.build()
+report('totals above 2 ** 53', large_index.get_top_n('uris', 2, None, None) == [('/large', 2 ** 53 + 1),
+                                                                              ('/small', 2 ** 53)] and
+       large_index.get_top_n('uris', 2, first_hour + 60, None) == [('/small', 2 ** 53), ('/large', 1)])
+
+# an index of another version is rejected
+index_arrays = dict(np.load(test_path + '/rollup.npz', allow_pickle=False))
+manifest = json.loads(index_arrays['manifest'].tostring())
+manifest['version'] += 1
+index_arrays['manifest'] = np.frombuffer(json.dumps(manifest), dtype=np.uint8)
+np.savez(test_path + '/rollup_other_version.npz', **index_arrays)
+
+report('other version rejected', raises(ValueError, load_rollup_index, test_path + '/rollup_other_version.npz'))
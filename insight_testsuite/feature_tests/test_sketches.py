@@ -0,0 +1,97 @@
+import sys
+import glob
+import numpy as np
+from collections import defaultdict
+
+from cardinality_sketches import DEFAULT_PRECISIONS, DEFAULT_RELATIVE_ACCURACY, load_sketch_statistics
+from process_log import parse_log_file_chunks
+from rollup_index import decode_batch_columns
+from timestamp_decoder import TimestampDecoder
+from log_tokenizer import LOG_LINE_REGEX
+from reporting import report, raises
+
+test_path = sys.argv[1]
+
+
+def get_sketch_outputs(sketch_statistics):
+    return (sketch_statistics.num_records, sketch_statistics.timezone, sketch_statistics.get_distinct_hosts(),
+            sketch_statistics.get_distinct_hosts_per_hour(),
+            sketch_statistics.get_top_n_resources_distinct_hosts(10 ** 6),
+            sketch_statistics.get_top_n_resources_bytes_quantiles(10 ** 6, [0, 0.5, 0.9, 0.99, 1]))
+
+
+def get_standard_error(precision):
+    # relative standard error of the HyperLogLog estimates of the precision
+    return 1.04 / np.sqrt(1 << precision)
+
+
+def within_bound(estimate, exact, precision):
+    # three standard errors, and two values for the register collisions of the few values of the small cardinalities
+    return abs(estimate - exact) <= 3 * get_standard_error(precision) * exact + 2
+
+
+def within_mean_bound(estimates, exact_values, precision):
+    # the mean relative error of the keys is within one standard error
+    return np.mean([abs(estimates[key] - len(values)) / float(len(values)) for key, values in
+                    exact_values.iteritems()]) <= get_standard_error(precision)
+
+
+sketch_statistics = load_sketch_statistics(test_path + '/log.txt.npz')
+
+# the sketches of the parts merged in any order are the ones of the whole log
+part_files = sorted(glob.glob(test_path + '/part.*.npz'))
+for test_name, part_order in [('merge of the parts', part_files), ('merge in reverse order', part_files[::-1])]:
+    merged_statistics = load_sketch_statistics(part_order[0])
+    for part_file in part_order[1:]:
+        merged_statistics.merge(load_sketch_statistics(part_file))
+    report(test_name, get_sketch_outputs(merged_statistics) == get_sketch_outputs(sketch_statistics))
+
+# the exact distinct hosts and bytes transferred of the records, decoded like the ones sketched
+timestamp_decoder = TimestampDecoder()
+hosts, hour_hosts, resource_hosts, resource_bytes = set(), defaultdict(set), defaultdict(set), defaultdict(list)
+for batch in parse_log_file_chunks(input_file=test_path + '/log.txt', regular_exp=LOG_LINE_REGEX,
+                                   keep_log_entries=False):
+    records = decode_batch_columns(batch, timestamp_decoder)
+    if records is None:
+        continue
+    for host_name, uri, epoch_seconds, bytes_transferred in zip(records['host_name'], records['uri'],
+                                                                records['epoch_seconds'].tolist(),
+                                                                records['bytes_transferred'].tolist()):
+        hosts.add(host_name)
+        hour_hosts[epoch_seconds // 3600].add(host_name)
+        resource_hosts[uri].add(host_name)
+        resource_bytes[uri].append(bytes_transferred)
+
+report('distinct hosts error', len(hosts) > 1000 and
+       within_bound(sketch_statistics.get_distinct_hosts(), len(hosts), DEFAULT_PRECISIONS['hosts']))
+
+hour_estimates = dict(sketch_statistics.hour_host_sketches.get_estimates())
+report('distinct hosts per hour error', sorted(hour_estimates) == sorted(hour_hosts) and
+       all(within_bound(hour_estimates[hour], len(hour_hosts[hour]), DEFAULT_PRECISIONS['hours'])
+           for hour in hour_hosts) and within_mean_bound(hour_estimates, hour_hosts, DEFAULT_PRECISIONS['hours']))
+
+resource_estimates = dict(sketch_statistics.resource_host_sketches.get_estimates())
+report('distinct hosts per resource error', sorted(resource_estimates) == sorted(resource_hosts) and
+       all(within_bound(resource_estimates[uri], len(resource_hosts[uri]), DEFAULT_PRECISIONS['resources'])
+           for uri in resource_hosts) and
+       within_mean_bound(resource_estimates, resource_hosts, DEFAULT_PRECISIONS['resources']))
+
+# the quantiles are within the relative accuracy of the values of the exact ranks, rounded to whole bytes
+quantiles = [0, 0.5, 0.9, 0.99, 1]
+num_values, quantile_values = sketch_statistics.resource_bytes_sketches.get_quantiles(quantiles)
+quantiles_within_bound = True
+for row, uri in enumerate(sketch_statistics.resource_bytes_sketches.keys):
+    values = sorted(resource_bytes[uri])
+    quantiles_within_bound &= num_values[row] == len(values)
+    for quantile, quantile_value in zip(quantiles, quantile_values[row]):
+        exact_value = values[int(np.floor(quantile * (len(values) - 1)))]
+        quantiles_within_bound &= abs(quantile_value - exact_value) <= DEFAULT_RELATIVE_ACCURACY * exact_value + 1
+report('bytes quantiles error', quantiles_within_bound)
+
+# a sketch file with registers of the wrong shape is rejected
+sketch_arrays = dict(np.load(test_path + '/log.txt.npz', allow_pickle=False))
+sketch_arrays['hour_registers'] = sketch_arrays['hour_registers'][:, :-1]
+np.savez(test_path + '/wrong_shape.npz', **sketch_arrays)
+
+report('registers of the wrong shape rejected', raises(ValueError, load_sketch_statistics,
+                                                      test_path + '/wrong_shape.npz'))
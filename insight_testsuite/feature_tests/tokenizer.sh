@@ -0,0 +1,10 @@
+# Every line of the fixture logs and of tokenizer_tests/log.txt is accepted or rejected by the log line tokenizer
+# exactly as with the regular expression, with the same groups.
+
+function run_tokenizer_tests {
+  if python ${PROJECT_PATH}/src/log_tokenizer.py ${GRADER_ROOT}/tokenizer_tests/log.txt ${FIXTURE_LOGS}; then
+    report_result PASS "tokenizer matches the regular expression"
+  else
+    report_result FAIL "tokenizer differs from the regular expression"
+  fi
+}
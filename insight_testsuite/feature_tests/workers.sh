@@ -0,0 +1,11 @@
+# Every fixture log processed by the single-pass engine with two worker processes gives the expected outputs.
+
+function run_workers_tests {
+  for log_file in ${FIXTURE_LOGS}; do
+    fixture_path=$(dirname $(dirname ${log_file}))
+    output_path=${TEST_OUTPUT_PATH}/$(basename ${fixture_path})
+
+    run_features ${output_path} ${log_file} --workers 2
+    compare_outputs ${fixture_path}/log_output ${output_path} $(basename ${fixture_path})
+  done
+}
@@ -0,0 +1,105 @@
+#!/bin/bash
+
+# Runs the feature tests, the groups given or all of them, e.g. ./run_feature_tests.sh workers mmap. Every test group
+# is a feature_tests/<group>.sh file defining a run_<group>_tests function, which reports every test with report_result.
+
+declare -r color_start="\033["
+declare -r color_red="${color_start}0;31m"
+declare -r color_green="${color_start}0;32m"
+declare -r color_norm="${color_start}0m"
+
+GRADER_ROOT=$(dirname ${BASH_SOURCE})
+
+PROJECT_PATH=${GRADER_ROOT}/..
+
+FEATURE_TESTS_PATH=${GRADER_ROOT}/feature_tests
+
+FIXTURE_LOGS=$(ls ${GRADER_ROOT}/tests/*/log_input/log.txt)
+
+FAIL_CNT=0
+
+# prints the PASS or FAIL line of a test of the current group, and counts the failures
+function report_result {
+  local result=$1
+  local test_name=$2
+
+  if [ "${result}" == "PASS" ]; then
+    echo -e "[${color_green}PASS${color_norm}]: ${TEST_GROUP} (${test_name})"
+  else
+    echo -e "[${color_red}FAIL${color_norm}]: ${TEST_GROUP} (${test_name})"
+    FAIL_CNT=$(($FAIL_CNT+1))
+  fi
+}
+
+# runs a python test script with the modules of src importable, and reports its "PASS|FAIL test_name" lines and a
+# failure if it stopped with an error
+function run_python_tests {
+  local test_results
+  test_results=$(PYTHONPATH=${PROJECT_PATH}/src python "$@")
+  local test_status=$?
+
+  while read -r result test_name; do
+    if [ -n "${result}" ]; then
+      report_result ${result} "${test_name}"
+    fi
+  done <<< "${test_results}"
+
+  if [ "${test_status}" -ne "0" ]; then
+    report_result FAIL "the tests stopped with an error"
+  fi
+}
+
+# processes a log with the single-pass engine and the given options into the output files of the output path
+function run_features {
+  local output_path=$1
+  shift
+  mkdir -p ${output_path}
+  python ${PROJECT_PATH}/src/process_log.py "$@" ${output_path}/hosts.txt ${output_path}/hours.txt \
+    ${output_path}/resources.txt ${output_path}/blocked.txt ${output_path}/bad_records.txt --engine single-pass \
+    > /dev/null 2>&1
+}
+
+# reports whether every output file of the output path is the same as the one of the expected path
+function compare_outputs {
+  local expected_path=$1
+  local output_path=$2
+  local test_name=$3
+
+  for output_file in hosts.txt hours.txt resources.txt blocked.txt; do
+    if [ -f ${output_path}/${output_file} ] && \
+        diff -bB ${expected_path}/${output_file} ${output_path}/${output_file}; then
+      report_result PASS "${test_name} ${output_file}"
+    else
+      report_result FAIL "${test_name} ${output_file}"
+    fi
+  done
+}
+
+function run_feature_tests {
+  TEST_ROOT_PATH=$(mktemp -d)
+  trap "rm -rf ${TEST_ROOT_PATH}" EXIT
+
+  local test_groups="$*"
+  if [ -z "${test_groups}" ]; then
+    test_groups=$(ls ${FEATURE_TESTS_PATH}/*.sh | xargs -n 1 basename | sed 's/\.sh$//')
+  fi
+
+  for TEST_GROUP in ${test_groups}; do
+    if [ ! -f ${FEATURE_TESTS_PATH}/${TEST_GROUP}.sh ]; then
+      report_result FAIL "no such test group"
+      continue
+    fi
+
+    TEST_OUTPUT_PATH=${TEST_ROOT_PATH}/${TEST_GROUP}
+    mkdir -p ${TEST_OUTPUT_PATH}
+
+    source ${FEATURE_TESTS_PATH}/${TEST_GROUP}.sh
+    run_${TEST_GROUP}_tests
+  done
+
+  if [ "${FAIL_CNT}" -ne "0" ]; then
+    exit 1
+  fi
+}
+
+run_feature_tests "$@"
@@ -0,0 +1,57 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+def get_output_file_mode():
+
+    """Gets the permissions of a new output file under the umask of the process, e.g. 0644 for the umask 022.
+
+    The umask can only be read by setting it, so it is read once at import, before any thread writes a file.
+
+    """
+
+    umask = os.umask(0)
+    os.umask(umask)
+
+    return 0o666 & ~umask
+
+
+# permissions of the output files written to a temporary file first, which tempfile.mkstemp creates as 0600
+OUTPUT_FILE_MODE = get_output_file_mode()
+
+
+@contextmanager
+def atomic_write(output_file=None, mode='wb'):
+
+    """Writes the output file through a temporary file in the same directory, renamed to the output file once closed.
+
+    A reader of the output file, e.g. a later run, the query server or a metrics collector, never sees a partially
+    written file, and a failed write leaves the previous output file as it was. The output file gets the permissions
+    of a new file under the umask of the process, OUTPUT_FILE_MODE.
+
+    Args:
+        output_file: the file to write.
+        mode: the mode the temporary file is opened in, 'wb' or 'w'.
+
+    Yields:
+        The temporary file object to write to.
+
+    Raises:
+        IOError: if there is some problem writing the temporary file.
+        OSError: if there is some problem creating or renaming the temporary file.
+
+    """
+
+    temp_file_descriptor, temp_file_name = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(output_file)),
+                                                            suffix='.tmp')
+
+    try:
+        with os.fdopen(temp_file_descriptor, mode) as temp_file:
+            yield temp_file
+        os.chmod(temp_file_name, OUTPUT_FILE_MODE)
+        os.rename(temp_file_name, output_file)
+
+    except BaseException:
+        os.remove(temp_file_name)
+        raise
@@ -0,0 +1,106 @@
+# size of the bad records file buffer in bytes
+BAD_RECORDS_BUFFER_SIZE = 1024 * 1024
+
+
+class BadRecordsWriter(object):
+
+    """Streams the lines not matching the regular expression to the bad records file as they are parsed.
+
+    Used in place of the list of invalid records of the parsers, so the bad records are never all held in memory.
+    The records can be sampled systematically, keeping every (1 / sample_rate)th record, and capped to a maximum
+    number of records. The records are written separated by new line characters, like write_to_file of process_log,
+    and the file is only opened once the first record is written, so it is left untouched if there are none.
+
+    Attributes:
+        output_file: file to write the bad records to, None to only count them.
+        sample_rate: fraction of the bad records written, e.g. 0.1 for every 10th record.
+        max_records: maximum number of bad records written, None for no maximum.
+        append_to_file: whether the records are appended to the existing content of the file instead of replacing
+         it. Can be changed until the first record is written.
+        num_records: number of bad records seen.
+        num_written: number of bad records written.
+        output: the buffered bad records file once opened, None before.
+        separator: the string written before the next record.
+        is_closed: whether the writer was closed, or could not open the file.
+
+    """
+
+    def __init__(self, output_file=None, sample_rate=1.0, max_records=None, append_to_file=False):
+        self.output_file = output_file
+        self.sample_rate = sample_rate
+        self.max_records = max_records
+        self.append_to_file = append_to_file
+        self.num_records = 0
+        self.num_written = 0
+        self.output = None
+        self.separator = ''
+        self.is_closed = output_file is None
+
+    def __len__(self):
+        return self.num_records
+
+    def append(self, line=None):
+
+        """Writes the bad record to the file if it is sampled and the maximum is not reached yet."""
+
+        record_index = self.num_records
+        self.num_records += 1
+
+        if self.is_closed or (self.max_records is not None and self.num_written >= self.max_records):
+            return
+
+        # keep the record if the sampled count steps over an integer at it, e.g. every 4th record for 0.25
+        if int((record_index + 1) * self.sample_rate) == int(record_index * self.sample_rate):
+            return
+
+        if self.output is None and not self.open():
+            return
+
+        self.output.write(self.separator)
+        self.output.write(line)
+        self.separator = '\n'
+        self.num_written += 1
+
+    def extend(self, lines=None):
+
+        """Writes the sampled bad records of the list to the file."""
+
+        for line in lines:
+            self.append(line)
+
+    def open(self):
+
+        """Opens the bad records file in write or append mode.
+
+        Returns:
+            True if the file is opened, False if it could not be opened, in which case the records are only counted.
+
+        """
+
+        try:
+            self.output = open(self.output_file, 'a' if self.append_to_file else 'w', BAD_RECORDS_BUFFER_SIZE)
+
+        except IOError as e:
+            # print the error message if issues in accessing the bad records file
+            print "Error opening the output file!!"
+            print "I/O error({0}): {1}".format(e.errno, e.strerror)
+            self.is_closed = True
+            return False
+
+        # separate the first record from the existing content of the file
+        self.separator = '\n' if self.output.tell() > 0 else ''
+
+        return True
+
+    def close(self):
+
+        """Flushes and closes the bad records file. The records appended afterwards are only counted."""
+
+        if self.output is not None:
+            self.output.close()
+            self.output = None
+
+            print "\nBad records written to {} : {} of {}".format(self.output_file, self.num_written,
+                                                                  self.num_records)
+
+        self.is_closed = True
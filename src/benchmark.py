@@ -0,0 +1,294 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+
+import process_log
+from log_aggregator import LogAggregator
+from log_generator import add_generator_arguments, get_generator_options, write_log_file
+
+# regular expression object to match the line in the server logs and the parameter values of the features 1 to 4,
+# the defaults of process_log
+DEFAULT_CONFIG = process_log.PipelineConfig()
+REGEX = DEFAULT_CONFIG.regular_exp
+NUM_OF_ACTIVE_HOSTS = DEFAULT_CONFIG.num_of_active_hosts
+NUM_OF_TOP_RESOURCES = DEFAULT_CONFIG.num_of_top_resources
+NUM_OF_BUSIEST_PERIODS = DEFAULT_CONFIG.num_of_busiest_periods
+BUSY_PERIOD_WINDOW = DEFAULT_CONFIG.busy_period_window
+BLOCK_WINDOW_MIN = DEFAULT_CONFIG.block_window_min
+LOGIN_FAILURES_LIMIT = DEFAULT_CONFIG.login_failures_limit
+LOGIN_FAILURES_WINDOW_SEC = DEFAULT_CONFIG.login_failures_window_sec
+
+# stages faster than this many seconds in the baseline are not checked for regressions, as they are mostly noise
+MIN_REGRESSION_SECONDS = 0.05
+
+
+def get_peak_rss_kb():
+
+    """Gets the peak resident set size of the benchmark process so far in kilobytes."""
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # macOS reports the peak resident set size in bytes, Linux in kilobytes
+    return peak_rss // 1024 if sys.platform == 'darwin' else peak_rss
+
+
+class StageTimer(object):
+
+    """Times the stages of a benchmark run and records the peak resident set size after each of them.
+
+    The output printed by the timed functions is discarded, so it does not add to the stage times.
+
+    Attributes:
+        stages: list of dictionaries with the stage name, the seconds taken and the peak RSS in kilobytes.
+
+    """
+
+    def __init__(self):
+        self.stages = list()
+
+    def run(self, stage_name=None, function=None, *args, **kwargs):
+
+        """Runs the function as the named stage and records its time.
+
+        Returns:
+            The return value of the function.
+
+        """
+
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+
+        try:
+            start_time = time.time()
+            result = function(*args, **kwargs)
+            seconds = time.time() - start_time
+
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+        self.stages.append({'stage': stage_name, 'seconds': seconds, 'peak_rss_kb': get_peak_rss_kb()})
+
+        return result
+
+
+def write_outputs(output_dir=None, top_active_hosts=None, top_resources=None, top_busy_periods=None,
+                  potential_blocked_entries=None):
+
+    """Writes the four feature outputs to the output directory, like process_log."""
+
+    for file_name, output in (('hosts.txt', top_active_hosts), ('resources.txt', top_resources),
+                              ('hours.txt', top_busy_periods), ('blocked.txt', potential_blocked_entries)):
+        process_log.write_to_file(output_file=os.path.join(output_dir, file_name), input_data=output)
+
+
+def run_pandas_engine(stage_timer=None, log_file=None, output_dir=None):
+
+    """Runs and times the stages of the pandas engine of process_log."""
+
+    log_chunks = stage_timer.run('parse', lambda: list(process_log.parse_log_file_chunks(input_file=log_file,
+                                                                                        regular_exp=REGEX,
+                                                                                        invalid_records=list(),
+                                                                                        keep_log_entries=False)))
+
+    df_log_data = stage_timer.run('data_frame', process_log.get_data_frame, input_chunks=log_chunks)
+    del log_chunks
+
+    top_active_hosts = stage_timer.run('feature_1_hosts', process_log.get_top_n_active_hosts,
+                                       n=NUM_OF_ACTIVE_HOSTS, input_data_frame=df_log_data)
+    top_resources = stage_timer.run('feature_2_resources', process_log.get_top_n_resources_max_bandwidth,
+                                    n=NUM_OF_TOP_RESOURCES, input_data_frame=df_log_data)
+    top_busy_periods = stage_timer.run('feature_3_hours', process_log.get_top_n_busiest_periods,
+                                       n=NUM_OF_BUSIEST_PERIODS, period_in_minutes=BUSY_PERIOD_WINDOW,
+                                       input_data_frame=df_log_data)
+    potential_blocked_entries = stage_timer.run('feature_4_blocked', process_log.get_login_failure_blocked_records,
+                                                blocked_window_time=BLOCK_WINDOW_MIN,
+                                                consecutive_failure_limit=LOGIN_FAILURES_LIMIT,
+                                                login_failure_window=LOGIN_FAILURES_WINDOW_SEC,
+                                                input_data_frame=df_log_data, input_file=log_file)
+
+    stage_timer.run('write_output', write_outputs, output_dir=output_dir, top_active_hosts=top_active_hosts,
+                    top_resources=top_resources, top_busy_periods=top_busy_periods,
+                    potential_blocked_entries=potential_blocked_entries)
+
+
+def run_single_pass_engine(stage_timer=None, log_file=None, output_dir=None):
+
+    """Runs and times the stages of the single-pass engine of process_log."""
+
+    def aggregate_log_file():
+        log_aggregator = LogAggregator(blocked_window_time=BLOCK_WINDOW_MIN,
+                                       consecutive_failure_limit=LOGIN_FAILURES_LIMIT,
+                                       login_failure_window=LOGIN_FAILURES_WINDOW_SEC)
+        for batch in process_log.parse_log_file_chunks(input_file=log_file, regular_exp=REGEX,
+                                                       invalid_records=list(), keep_log_entries=False):
+            log_aggregator.update(batch)
+        process_log.resolve_blocked_records(input_file=log_file, log_aggregator=log_aggregator)
+        return log_aggregator
+
+    log_aggregator = stage_timer.run('parse_aggregate', aggregate_log_file)
+
+    top_active_hosts = stage_timer.run('feature_1_hosts', log_aggregator.get_top_n_active_hosts,
+                                       n=NUM_OF_ACTIVE_HOSTS)
+    top_resources = stage_timer.run('feature_2_resources', log_aggregator.get_top_n_resources_max_bandwidth,
+                                    n=NUM_OF_TOP_RESOURCES)
+    top_busy_periods = stage_timer.run('feature_3_hours', log_aggregator.get_top_n_busiest_periods,
+                                       n=NUM_OF_BUSIEST_PERIODS, period_in_minutes=BUSY_PERIOD_WINDOW)
+    potential_blocked_entries = stage_timer.run('feature_4_blocked', log_aggregator.get_login_failure_blocked_records)
+
+    stage_timer.run('write_output', write_outputs, output_dir=output_dir, top_active_hosts=top_active_hosts,
+                    top_resources=top_resources, top_busy_periods=top_busy_periods,
+                    potential_blocked_entries=potential_blocked_entries)
+
+
+def find_regressions(report=None, baseline=None, tolerance=0.0):
+
+    """Compares the stage times and the peak RSS of a benchmark report with a baseline report.
+
+    Args:
+        report: the benchmark report.
+        baseline: the baseline benchmark report, e.g. of the previous release.
+        tolerance: allowed slowdown or memory growth as a fraction of the baseline. E.g. 0.2 for 20%
+
+    Returns:
+        A list of messages describing every stage slower than the baseline by more than the tolerance, and the peak
+        RSS if it grew by more than the tolerance. Stages faster than MIN_REGRESSION_SECONDS in the baseline are
+        skipped.
+
+    """
+
+    regressions = list()
+    baseline_seconds = dict((stage['stage'], stage['seconds']) for stage in baseline['stages'])
+
+    for stage in report['stages']:
+
+        if baseline_seconds.get(stage['stage'], 0) < MIN_REGRESSION_SECONDS:
+            continue
+
+        if stage['seconds'] > baseline_seconds[stage['stage']] * (1 + tolerance):
+            regressions.append('{}: {:.3f} seconds, baseline {:.3f} seconds'
+                               .format(stage['stage'], stage['seconds'], baseline_seconds[stage['stage']]))
+
+    if report['peak_rss_kb'] > baseline['peak_rss_kb'] * (1 + tolerance):
+        regressions.append('peak RSS: {} KB, baseline {} KB'.format(report['peak_rss_kb'], baseline['peak_rss_kb']))
+
+    return regressions
+
+
+def run_benchmark(log_file=None, engine='pandas', num_repeats=1, generator_options=None):
+
+    """Runs the benchmark of one engine over the log file.
+
+    Every stage is run num_repeats times and the fastest time is reported, the peak RSS is the peak of the whole
+    process after the stage.
+
+    Returns:
+        The benchmark report as a dictionary.
+
+    """
+
+    output_dir = tempfile.mkdtemp(prefix='benchmark_output_')
+    stage_runs = list()
+
+    try:
+        for i in xrange(num_repeats):
+            stage_timer = StageTimer()
+            run_engine = run_pandas_engine if engine == 'pandas' else run_single_pass_engine
+            run_engine(stage_timer=stage_timer, log_file=log_file, output_dir=output_dir)
+            stage_runs.append(stage_timer.stages)
+
+    finally:
+        shutil.rmtree(output_dir)
+
+    stages = [{'stage': runs[0]['stage'],
+               'seconds': min(run['seconds'] for run in runs),
+               'peak_rss_kb': max(run['peak_rss_kb'] for run in runs)} for runs in zip(*stage_runs)]
+
+    return {
+        'engine': engine,
+        'log_file': log_file,
+        'log_file_bytes': os.path.getsize(log_file),
+        'generator_options': generator_options,
+        'repeats': num_repeats,
+        'python_version': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'stages': stages,
+        'total_seconds': sum(stage['seconds'] for stage in stages),
+        'peak_rss_kb': get_peak_rss_kb(),
+    }
+
+
+if __name__ == '__main__':
+
+    # parse the command line arguments for the log file or the shape of the synthetic log and the report options
+    arg_parser = argparse.ArgumentParser(
+        description='Benchmarks the stages of process_log on a synthetic or given NASA web server log file.',
+        epilog='Example Usage : python ./src/benchmark.py --lines 1000000 --report ./benchmark.json')
+    arg_parser.add_argument('--log-file', help='benchmark this log file instead of generating a synthetic one')
+    arg_parser.add_argument('--engine', choices=['pandas', 'single-pass'], default='pandas',
+                            help='process_log engine to benchmark (default: pandas)')
+    arg_parser.add_argument('--repeat', type=int, default=1, metavar='N',
+                            help='number of runs, the fastest time of every stage is reported (default: 1)')
+    arg_parser.add_argument('--report', metavar='FILE', help='write the JSON report to this file instead of stdout')
+    arg_parser.add_argument('--baseline', metavar='FILE',
+                            help='JSON report to compare with, exits with status 1 if any stage regressed')
+    arg_parser.add_argument('--tolerance', type=float, default=0.2, metavar='T',
+                            help='allowed slowdown or peak RSS growth over the baseline as a fraction (default: 0.2)')
+    add_generator_arguments(arg_parser)
+    args = arg_parser.parse_args()
+
+    if args.repeat < 1:
+        arg_parser.error('--repeat must be at least 1')
+
+    log_dir = None
+    generator_options = None
+    benchmark_log_file = args.log_file
+
+    if benchmark_log_file is None:
+
+        # generate the synthetic log file in a temporary directory
+        generator_options = get_generator_options(args)
+        log_dir = tempfile.mkdtemp(prefix='benchmark_log_')
+        benchmark_log_file = os.path.join(log_dir, 'log.txt')
+        print >> sys.stderr, 'Generating the synthetic log file...'
+        write_log_file(output_file=benchmark_log_file, **generator_options)
+
+    try:
+        print >> sys.stderr, 'Benchmarking the {} engine...'.format(args.engine)
+        benchmark_report = run_benchmark(log_file=os.path.abspath(benchmark_log_file), engine=args.engine,
+                                         num_repeats=args.repeat, generator_options=generator_options)
+
+    finally:
+        if log_dir is not None:
+            shutil.rmtree(log_dir)
+
+    report_json = json.dumps(benchmark_report, indent=2, sort_keys=True)
+
+    if args.report is not None:
+        with open(args.report, 'w') as report_file:
+            report_file.write(report_json + '\n')
+    else:
+        print report_json
+
+    for stage in benchmark_report['stages']:
+        print >> sys.stderr, '{:<20} {:>10.3f} s {:>12} KB'.format(stage['stage'], stage['seconds'],
+                                                                   stage['peak_rss_kb'])
+
+    if args.baseline is not None:
+
+        with open(args.baseline) as baseline_file:
+            regressions = find_regressions(report=benchmark_report, baseline=json.load(baseline_file),
+                                           tolerance=args.tolerance)
+
+        for regression in regressions:
+            print >> sys.stderr, 'REGRESSION ' + regression
+
+        if len(regressions) > 0:
+            sys.exit(1)
@@ -0,0 +1,588 @@
+import os
+import sys
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+from atomic_file import atomic_write
+from log_aggregator import format_timestamp
+from log_cache import encode_string_column, decode_string_values
+from rollup_index import decode_batch_columns, reduce_bucket_values
+from timestamp_decoder import TimestampDecoder
+
+# version of the sketch statistics layout, a sketch file with another version is not loaded
+SKETCH_FORMAT_VERSION = 1
+
+# HyperLogLog precisions of the distinct hosts of the whole log, of every hour and of every resource, a precision p
+# keeps 2 ** p one byte registers per key for a standard error of about 1.04 / sqrt(2 ** p)
+DEFAULT_PRECISIONS = {'hosts': 14, 'hours': 12, 'resources': 8}
+
+# relative accuracy of the bytes transferred quantiles of every resource
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+# number of partial bucket counts of record batches kept by a quantile sketch before they are merged
+MAX_PARTIAL_COUNTS = 16
+
+# bucket index of the records of 0 bytes transferred, which have no logarithm
+ZERO_BUCKET = -1
+
+# the queries of the command line
+SKETCH_QUERIES = ['hosts', 'hours', 'resources', 'bytes']
+
+
+def hash_values(values=None):
+
+    """Hashes the values into 64 bit hashes, which are the same for the same value in every run and process.
+
+    Every distinct value of the array is hashed once.
+
+    Returns:
+        An uint64 numpy array with the hash of every value.
+
+    """
+
+    value_codes, distinct_values = pd.factorize(np.asarray(values, dtype=object))
+
+    return pd.util.hash_array(np.asarray(distinct_values, dtype=object))[value_codes]
+
+
+def get_bit_lengths(values=None):
+
+    """Gets the number of bits of every uint64 value without its leading zeros, 0 for the value 0."""
+
+    values = values.copy()
+    bit_lengths = np.zeros(len(values), dtype=np.int64)
+
+    for shift in (32, 16, 8, 4, 2, 1):
+        is_longer = values >= np.uint64(1 << shift)
+        values[is_longer] >>= np.uint64(shift)
+        bit_lengths[is_longer] += shift
+
+    return bit_lengths + (values > 0)
+
+
+def estimate_cardinalities(registers=None):
+
+    """Estimates the number of distinct values of every row of HyperLogLog registers.
+
+    Small cardinalities with empty registers left are estimated by linear counting, the others by the harmonic mean of
+    the registers.
+
+    Args:
+        registers: uint8 numpy array with a row of 2 ** precision registers per key.
+
+    Returns:
+        An int64 numpy array with the estimated cardinality of every row.
+
+    """
+
+    num_registers = registers.shape[1]
+    alpha = 0.7213 / (1 + 1.079 / num_registers)
+
+    raw_estimates = alpha * num_registers ** 2 / np.power(2.0, -registers.astype(np.float64)).sum(axis=1)
+    num_empty_registers = (registers == 0).sum(axis=1)
+
+    with np.errstate(divide='ignore'):
+        linear_estimates = num_registers * np.log(num_registers / np.maximum(num_empty_registers, 1).astype(np.float64))
+
+    is_small = (raw_estimates <= 2.5 * num_registers) & (num_empty_registers > 0)
+
+    return np.round(np.where(is_small, linear_estimates, raw_estimates)).astype(np.int64)
+
+
+class KeyedSketch(object):
+
+    """Base of the sketches keeping one sketch per key, e.g. per hour or per resource, in numpy arrays.
+
+    Attributes:
+        keys: list of the keys in the order of their rows.
+        key_rows: dictionary with the key as key and its row as value.
+
+    """
+
+    def __init__(self):
+        self.keys = list()
+        self.key_rows = dict()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get_rows(self, keys=None):
+
+        """Gets the rows of the keys of a batch, adding the new keys.
+
+        Returns:
+            An int64 numpy array with the row of every key.
+
+        """
+
+        key_codes, distinct_keys = pd.factorize(np.asarray(keys, dtype=object))
+        rows = np.empty(len(distinct_keys), dtype=np.int64)
+
+        for i, key in enumerate(distinct_keys):
+            row = self.key_rows.get(key)
+            if row is None:
+                row = self.key_rows[key] = len(self.keys)
+                self.keys.append(key)
+            rows[i] = row
+
+        self.add_rows(len(self.keys))
+
+        return rows[key_codes]
+
+    def add_rows(self, num_rows=0):
+
+        """Makes room for the sketches of num_rows keys."""
+
+        pass
+
+
+class KeyedHyperLogLog(KeyedSketch):
+
+    """HyperLogLog sketches of the number of distinct values of every key.
+
+    Every key has a row of 2 ** precision one byte registers, whatever the number of distinct values, and the rows of
+    the keys are merged by taking the maximum of every register. The register of a value is given by the first
+    precision bits of its hash and its rank by the number of leading zeros of the other bits.
+
+    Attributes:
+        precision: number of hash bits selecting the register.
+        registers: uint8 numpy array with the registers of every key in its row, with room for more keys.
+
+    """
+
+    def __init__(self, precision=0):
+        super(KeyedHyperLogLog, self).__init__()
+        self.precision = precision
+        self.registers = np.zeros((0, 1 << precision), dtype=np.uint8)
+
+    def add_rows(self, num_rows=0):
+
+        # the capacity is doubled, so the registers are copied a logarithmic number of times
+        if num_rows > len(self.registers):
+            registers = np.zeros((max(num_rows, 2 * len(self.registers)), 1 << self.precision), dtype=np.uint8)
+            registers[:len(self.registers)] = self.registers
+            self.registers = registers
+
+    def update(self, keys=None, hashes=None):
+
+        """Adds the hashed values of a batch to the sketches of their keys.
+
+        Args:
+            keys: sequence of the key of every value.
+            hashes: uint64 numpy array with the hash of every value, see hash_values.
+
+        """
+
+        if len(hashes) == 0:
+            return
+
+        num_rank_bits = 64 - self.precision
+        register_indexes = (hashes >> np.uint64(num_rank_bits)).astype(np.int64)
+        ranks = num_rank_bits + 1 - get_bit_lengths(hashes & np.uint64((1 << num_rank_bits) - 1))
+
+        # keep the maximum rank of every register of the batch, then update each register once
+        flat_indexes = self.get_rows(keys) * (1 << self.precision) + register_indexes
+        sort_order = np.lexsort((ranks, flat_indexes))
+        flat_indexes, ranks = flat_indexes[sort_order], ranks[sort_order]
+        is_last = np.append(flat_indexes[1:] != flat_indexes[:-1], True)
+        flat_indexes, ranks = flat_indexes[is_last], ranks[is_last].astype(np.uint8)
+
+        flat_registers = self.registers.reshape(-1)
+        flat_registers[flat_indexes] = np.maximum(flat_registers[flat_indexes], ranks)
+
+    def merge(self, other=None):
+
+        """Merges the sketches of another KeyedHyperLogLog of the same precision into the sketches.
+
+        Raises:
+            ValueError: if the precisions of the sketches differ.
+
+        """
+
+        if other.precision != self.precision:
+            raise ValueError('can not merge HyperLogLog sketches of precisions {} and {}'.format(self.precision,
+                                                                                                other.precision))
+
+        if len(other) == 0:
+            return
+
+        rows = self.get_rows(other.keys)
+        self.registers[rows] = np.maximum(self.registers[rows], other.registers[:len(other)])
+
+    def get_estimates(self):
+
+        """Gets the list of (key, estimated number of distinct values) tuples of every key."""
+
+        return zip(self.keys, estimate_cardinalities(self.registers[:len(self)]).tolist())
+
+
+class KeyedQuantileSketch(KeyedSketch):
+
+    """Quantile sketches of the values of every key with a relative accuracy (DDSketch).
+
+    A value x of at least 1 is counted in the bucket ceil(log(x) / log(gamma)), with gamma = (1 + a) / (1 - a) for the
+    relative accuracy a, and the values below 1 in the ZERO_BUCKET. Every quantile is then estimated within a relative
+    error of a. The number of buckets of a key only grows with the logarithm of its largest value and the sketches are
+    merged by adding the bucket counts. The bucket counts are kept like the rollups, as (row, bucket, count) arrays
+    merged every MAX_PARTIAL_COUNTS batches.
+
+    Attributes:
+        relative_accuracy: relative accuracy of the quantiles.
+        log_gamma: logarithm of the bucket growth factor.
+        partial_counts: list of the (rows, buckets, counts) numpy array tuples of the bucket counts.
+
+    """
+
+    def __init__(self, relative_accuracy=0.0):
+        super(KeyedQuantileSketch, self).__init__()
+        self.relative_accuracy = relative_accuracy
+        self.log_gamma = np.log((1 + relative_accuracy) / (1 - relative_accuracy))
+        self.partial_counts = list()
+
+    def update(self, keys=None, values=None):
+
+        """Adds the int64 numpy array of the values of a batch to the sketches of their keys."""
+
+        if len(values) == 0:
+            return
+
+        buckets = np.full(len(values), ZERO_BUCKET, dtype=np.int64)
+        is_positive = values >= 1
+        buckets[is_positive] = np.ceil(np.log(values[is_positive]) / self.log_gamma)
+
+        self.add_counts(self.get_rows(keys), buckets.astype(np.int32), np.ones(len(values), dtype=np.int64))
+
+    def add_counts(self, rows=None, buckets=None, counts=None):
+
+        """Adds bucket counts to the partial counts, merging them if there are too many."""
+
+        self.partial_counts.append(reduce_bucket_values(rows, buckets, counts))
+
+        if len(self.partial_counts) >= MAX_PARTIAL_COUNTS:
+            self.partial_counts = [self.get_counts()]
+
+    def get_counts(self):
+
+        """Merges the partial counts into one (rows, buckets, counts) tuple, sorted by row and bucket."""
+
+        if len(self.partial_counts) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int64)
+
+        return reduce_bucket_values(*[np.concatenate(arrays) for arrays in zip(*self.partial_counts)])
+
+    def merge(self, other=None):
+
+        """Merges the sketches of another KeyedQuantileSketch of the same relative accuracy into the sketches.
+
+        Raises:
+            ValueError: if the relative accuracies of the sketches differ.
+
+        """
+
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('can not merge quantile sketches of relative accuracies {} and {}'.format(
+                self.relative_accuracy, other.relative_accuracy))
+
+        if len(other) == 0:
+            return
+
+        rows, buckets, counts = other.get_counts()
+        self.add_counts(self.get_rows(other.keys)[rows], buckets, counts)
+
+    def get_quantiles(self, quantiles=None):
+
+        """Estimates the quantiles of the values of every key.
+
+        Args:
+            quantiles: list of the quantiles in [0, 1]. E.g. [0.5, 0.9, 0.99]
+
+        Returns:
+            A tuple of the int64 numpy array with the number of values of every key and the int64 numpy array with a
+            row of the estimated quantiles per key.
+
+        """
+
+        rows, buckets, counts = self.get_counts()
+        num_values = np.bincount(rows, weights=counts, minlength=len(self)).astype(np.int64)
+
+        # the values of bucket k are estimated by the middle of (gamma ** (k - 1), gamma ** k] in relative error
+        gamma = np.exp(self.log_gamma)
+        bucket_values = np.where(buckets == ZERO_BUCKET, 0.0, 2 * np.power(gamma, buckets) / (gamma + 1))
+
+        # the buckets are sorted by row and bucket, so the quantile is the first bucket of the row above its rank
+        cumulative_counts = np.cumsum(counts)
+        row_starts = np.cumsum(num_values) - num_values
+        quantile_values = np.zeros((len(self), len(quantiles)), dtype=np.int64)
+
+        for i, quantile in enumerate(quantiles):
+            ranks = row_starts + np.floor(quantile * (num_values - 1)).astype(np.int64)
+            bucket_indexes = np.searchsorted(cumulative_counts, ranks, side='right')
+            has_values = num_values > 0
+            quantile_values[has_values, i] = np.round(bucket_values[bucket_indexes[has_values]])
+
+        return num_values, quantile_values
+
+
+class SketchStatistics(object):
+
+    """Approximate distinct host and bytes transferred statistics of the log file, fed with the parsed record batches.
+
+    The distinct hosts of the whole log, of every hour and of every resource are counted with HyperLogLog sketches and
+    the bytes transferred of every resource with quantile sketches, so the memory used does not grow with the number of
+    hosts. The statistics of several log files or runs are merged into the statistics of all of them. The records are
+    preprocessed like the features, see decode_batch_columns.
+
+    Attributes:
+        host_sketch: KeyedHyperLogLog of the distinct hosts of the whole log, with the single key 0.
+        hour_host_sketches: KeyedHyperLogLog of the distinct hosts of every UTC epoch hour.
+        resource_host_sketches: KeyedHyperLogLog of the distinct hosts of every resource.
+        resource_bytes_sketches: KeyedQuantileSketch of the bytes transferred of every resource.
+        timestamp_decoder: the TimestampDecoder converting the record timestamps to UTC epoch seconds.
+        timezone: the timezone of the first record, in which the hours are displayed.
+        num_records: number of records in the statistics.
+
+    """
+
+    def __init__(self, precisions=None, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        precisions = dict(DEFAULT_PRECISIONS, **(precisions or dict()))
+        self.host_sketch = KeyedHyperLogLog(precision=precisions['hosts'])
+        self.hour_host_sketches = KeyedHyperLogLog(precision=precisions['hours'])
+        self.resource_host_sketches = KeyedHyperLogLog(precision=precisions['resources'])
+        self.resource_bytes_sketches = KeyedQuantileSketch(relative_accuracy=relative_accuracy)
+        self.timestamp_decoder = TimestampDecoder()
+        self.timezone = None
+        self.num_records = 0
+
+    def update(self, batch=None):
+
+        """Adds a columnar batch of parsed log records as yielded by parse_log_file_chunks to the sketches.
+
+        Raises:
+            ValueError: if the timestamp or the bytes transferred of a record can not be converted.
+
+        """
+
+        records = decode_batch_columns(batch=batch, timestamp_decoder=self.timestamp_decoder)
+
+        if records is None:
+            return
+
+        if self.timezone is None:
+            self.timezone = records['timezone']
+
+        host_hashes = hash_values(records['host_name'])
+
+        self.host_sketch.update(np.zeros(len(host_hashes), dtype=np.int64), host_hashes)
+        self.hour_host_sketches.update(records['epoch_seconds'] // 3600, host_hashes)
+        self.resource_host_sketches.update(records['uri'], host_hashes)
+        self.resource_bytes_sketches.update(records['uri'], records['bytes_transferred'])
+
+        self.num_records += len(host_hashes)
+
+    def iterate(self, input_chunks=None):
+
+        """Adds every record batch of the iterable to the sketches as it is streamed to the next stage.
+
+        Yields:
+            Every record batch of input_chunks.
+
+        """
+
+        for batch in input_chunks:
+            self.update(batch)
+            yield batch
+
+    def merge(self, other=None):
+
+        """Merges the statistics of other log files or runs into the statistics.
+
+        Raises:
+            ValueError: if the precisions or relative accuracies of the sketches differ.
+
+        """
+
+        self.host_sketch.merge(other.host_sketch)
+        self.hour_host_sketches.merge(other.hour_host_sketches)
+        self.resource_host_sketches.merge(other.resource_host_sketches)
+        self.resource_bytes_sketches.merge(other.resource_bytes_sketches)
+        self.timezone = self.timezone if self.timezone is not None else other.timezone
+        self.num_records += other.num_records
+
+    def get_distinct_hosts(self):
+
+        """Estimates the number of distinct hosts of the log."""
+
+        return dict(self.host_sketch.get_estimates()).get(0, 0)
+
+    def get_distinct_hosts_per_hour(self):
+
+        """Fetches the estimated number of distinct hosts of every hour of the log in time order, separated by a comma
+        from the start of the hour."""
+
+        return [format_timestamp(hour * 3600, self.timezone) + ',' + str(distinct_hosts)
+                for hour, distinct_hosts in sorted(self.hour_host_sketches.get_estimates())]
+
+    def get_top_n_resources_distinct_hosts(self, n=0):
+
+        """Fetches the n resources visited by the most distinct hosts, with the estimated number of distinct hosts
+        separated by a comma. The ties are in lexicographical order."""
+
+        top_resources = sorted(self.resource_host_sketches.get_estimates(),
+                               key=lambda (uri, distinct_hosts): (-distinct_hosts, uri))[:n]
+
+        return [uri + ',' + str(distinct_hosts) for uri, distinct_hosts in top_resources]
+
+    def get_top_n_resources_bytes_quantiles(self, n=0, quantiles=None):
+
+        """Fetches the n most requested resources with their number of requests and the estimated quantiles of their
+        bytes transferred, separated by commas. The ties are in lexicographical order."""
+
+        num_requests, quantile_values = self.resource_bytes_sketches.get_quantiles(quantiles)
+        uris = self.resource_bytes_sketches.keys
+        top_rows = sorted(xrange(len(uris)), key=lambda row: (-num_requests[row], uris[row]))[:n]
+
+        return [','.join([uris[row], str(num_requests[row])] + [str(value) for value in quantile_values[row]])
+                for row in top_rows]
+
+    def save(self, sketch_file=None):
+
+        """Saves the sketch statistics to the sketch file as numpy arrays in one .npz file.
+
+        The file is written to a temporary file first and then renamed, so partially written statistics are never read.
+
+        Raises:
+            IOError: if there is some problem writing the sketch file.
+            OSError: if there is some problem opening or renaming the sketch file.
+
+        """
+
+        arrays = dict()
+
+        arrays['host_registers'] = self.host_sketch.registers[:len(self.host_sketch)]
+        arrays['hours'] = np.array(self.hour_host_sketches.keys, dtype=np.int64)
+        arrays['hour_registers'] = self.hour_host_sketches.registers[:len(self.hour_host_sketches)]
+        arrays['resource_host_uris_blob'], arrays['resource_host_uris_offsets'] = \
+            encode_string_column(self.resource_host_sketches.keys)[1:]
+        arrays['resource_registers'] = self.resource_host_sketches.registers[:len(self.resource_host_sketches)]
+        arrays['resource_bytes_uris_blob'], arrays['resource_bytes_uris_offsets'] = \
+            encode_string_column(self.resource_bytes_sketches.keys)[1:]
+        arrays['resource_bytes_rows'], arrays['resource_bytes_buckets'], arrays['resource_bytes_counts'] = \
+            self.resource_bytes_sketches.get_counts()
+
+        arrays['manifest'] = np.frombuffer(json.dumps({
+            'version': SKETCH_FORMAT_VERSION, 'timezone': self.timezone, 'num_records': self.num_records,
+            'precisions': {'hosts': self.host_sketch.precision, 'hours': self.hour_host_sketches.precision,
+                           'resources': self.resource_host_sketches.precision},
+            'relative_accuracy': self.resource_bytes_sketches.relative_accuracy}), dtype=np.uint8)
+
+        with atomic_write(sketch_file) as output_file:
+            np.savez(output_file, **arrays)
+
+
+def load_sketch_statistics(sketch_file=None):
+
+    """Loads the sketch statistics saved by SketchStatistics.save.
+
+    Raises:
+        IOError: if there is some problem reading the sketch file.
+        ValueError: if the sketch file is not a sketch statistics file of the current version.
+
+    """
+
+    sketch_arrays = np.load(sketch_file, allow_pickle=False)
+
+    try:
+        manifest = json.loads(sketch_arrays['manifest'].tostring())
+
+        if manifest.get('version') != SKETCH_FORMAT_VERSION:
+            raise ValueError('unsupported sketch statistics version: ' + repr(manifest.get('version')))
+
+        sketch_statistics = SketchStatistics(precisions=manifest['precisions'],
+                                             relative_accuracy=manifest['relative_accuracy'])
+        sketch_statistics.timezone = manifest['timezone']
+        sketch_statistics.num_records = manifest['num_records']
+
+        for sketch, keys, registers in [
+                (sketch_statistics.host_sketch, [0] * len(sketch_arrays['host_registers']),
+                 sketch_arrays['host_registers']),
+                (sketch_statistics.hour_host_sketches, sketch_arrays['hours'].tolist(),
+                 sketch_arrays['hour_registers']),
+                (sketch_statistics.resource_host_sketches,
+                 decode_string_values(sketch_arrays['resource_host_uris_blob'],
+                                      sketch_arrays['resource_host_uris_offsets']), sketch_arrays['resource_registers'])]:
+
+            if registers.shape != (len(keys), 1 << sketch.precision):
+                raise ValueError('invalid sketch statistics: registers of shape {} for {} keys'.format(
+                    registers.shape, len(keys)))
+
+            sketch.get_rows(keys)
+            sketch.registers = registers.copy()
+
+        bytes_sketches = sketch_statistics.resource_bytes_sketches
+        bytes_sketches.get_rows(decode_string_values(sketch_arrays['resource_bytes_uris_blob'],
+                                                     sketch_arrays['resource_bytes_uris_offsets']))
+        bytes_sketches.partial_counts = [(sketch_arrays['resource_bytes_rows'], sketch_arrays['resource_bytes_buckets'],
+                                          sketch_arrays['resource_bytes_counts'])]
+
+    except KeyError as e:
+        raise ValueError('invalid sketch statistics: missing ' + str(e))
+
+    finally:
+        sketch_arrays.close()
+
+    return sketch_statistics
+
+
+if __name__ == '__main__':
+
+    # parse the command line arguments for the sketch files to merge and the query
+    arg_parser = argparse.ArgumentParser(
+        description='Answers the approximate distinct host and bytes transferred queries from the sketch statistics '
+                    'built by process_log, merging the statistics of every given file.',
+        epilog='Example Usage : python ./src/cardinality_sketches.py ./log_output/sketches.npz hours')
+    arg_parser.add_argument('sketch_files', nargs='+', metavar='sketch_file',
+                            help='sketch statistics file written by process_log.py --sketch-stats')
+    arg_parser.add_argument('query', choices=SKETCH_QUERIES,
+                            help='distinct hosts of the log, distinct hosts per hour, top resources by distinct hosts '
+                                 'or bytes transferred quantiles of the most requested resources')
+    arg_parser.add_argument('-n', type=int, default=10, help='number of top resources (default: 10)')
+    arg_parser.add_argument('--quantiles', default='0.5,0.9,0.99', metavar='Q',
+                            help='comma separated quantiles of the bytes transferred (default: 0.5,0.9,0.99)')
+    arg_parser.add_argument('--output', metavar='FILE', help='also save the merged sketch statistics to this file')
+    args = arg_parser.parse_args()
+
+    try:
+        query_quantiles = [float(quantile) for quantile in args.quantiles.split(',')]
+    except ValueError:
+        query_quantiles = list()
+
+    if not query_quantiles or min(query_quantiles) < 0 or max(query_quantiles) > 1:
+        arg_parser.error('--quantiles must be a comma separated list of quantiles in [0, 1]')
+
+    try:
+        sketch_statistics = load_sketch_statistics(sketch_file=args.sketch_files[0])
+
+        for file_name in args.sketch_files[1:]:
+            sketch_statistics.merge(load_sketch_statistics(sketch_file=file_name))
+
+        if args.output is not None:
+            sketch_statistics.save(sketch_file=args.output)
+
+    except (IOError, OSError, ValueError) as e:
+        # print the error message if issues in reading, merging or saving the sketch statistics
+        print "Error reading the sketch statistics!!"
+        print "Error Message : " + str(e)
+        sys.exit(1)
+
+    if args.query == 'hosts':
+        query_output = [str(sketch_statistics.get_distinct_hosts())]
+    elif args.query == 'hours':
+        query_output = sketch_statistics.get_distinct_hosts_per_hour()
+    elif args.query == 'resources':
+        query_output = sketch_statistics.get_top_n_resources_distinct_hosts(n=args.n)
+    else:
+        query_output = sketch_statistics.get_top_n_resources_bytes_quantiles(n=args.n, quantiles=query_quantiles)
+
+    print "\n".join(query_output)
@@ -0,0 +1,92 @@
+import heapq
+
+
+class SpaceSavingCounter(object):
+
+    """Approximate counter of the heaviest keys with a bounded memory (Space-Saving algorithm).
+
+    At most capacity keys are counted. When a new key arrives and the counter is full, the key with the minimum count
+    is evicted and the new key takes over its count. The count of every key is therefore overestimated by at most
+    its recorded error, and every key with a true count above total / capacity is guaranteed to be kept. Supports
+    weighted counts, e.g. bytes transferred, through the usual counter[key] += weight idiom.
+
+    Attributes:
+        capacity: maximum number of keys counted.
+        counts: dictionary with the key as key and its estimated count as value.
+        errors: dictionary with the key as key and the maximum overestimation of its count as value.
+        count_heap: min heap of (count, key) tuples, which may contain stale counts of the keys.
+
+    """
+
+    def __init__(self, capacity=0):
+        self.capacity = capacity
+        self.counts = dict()
+        self.errors = dict()
+        self.count_heap = list()
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __contains__(self, key):
+        return key in self.counts
+
+    def __iter__(self):
+        return iter(self.counts)
+
+    def __getitem__(self, key):
+        return self.counts.get(key, 0)
+
+    def __setitem__(self, key, count):
+
+        # a new key in a full counter replaces the key with the minimum count
+        if key not in self.counts and len(self.counts) >= self.capacity:
+            minimum_count, minimum_key = self.pop_minimum()
+            del self.counts[minimum_key]
+            del self.errors[minimum_key]
+            self.errors[key] = minimum_count
+            count += minimum_count
+
+        elif key not in self.counts:
+            self.errors[key] = 0
+
+        self.counts[key] = count
+        heapq.heappush(self.count_heap, (count, key))
+
+        # rebuild the heap without the stale counts once it grows too large
+        if len(self.count_heap) > 4 * self.capacity:
+            self.count_heap = [(key_count, heap_key) for heap_key, key_count in self.counts.iteritems()]
+            heapq.heapify(self.count_heap)
+
+    def pop_minimum(self):
+
+        """Pops the key with the minimum current count from the heap, skipping the stale counts.
+
+        Returns:
+            A (count, key) tuple of the key with the minimum count.
+
+        """
+
+        while True:
+            count, key = heapq.heappop(self.count_heap)
+            if self.counts.get(key) == count:
+                return count, key
+
+    def iteritems(self):
+        return self.counts.iteritems()
+
+    def itervalues(self):
+        return self.counts.itervalues()
+
+    def get_error(self, key=None):
+
+        """Gets the maximum overestimation of the count of a key.
+
+        Args:
+            key: the counted key
+
+        Returns:
+            The maximum overestimation of the count, 0 if the key is not counted.
+
+        """
+
+        return self.errors.get(key, 0)
@@ -0,0 +1,674 @@
+import time
+import heapq
+import calendar
+import numpy as np
+from collections import defaultdict, OrderedDict
+
+from heavy_hitters import SpaceSavingCounter
+from timestamp_decoder import TIMESTAMP_FORMAT, TimestampDecoder, parse_timezone_offset
+
+
+def format_timestamp(epoch_seconds=0, timezone=None):
+
+    """Formats the UTC epoch seconds as the log file timestamp in the timezone followed by the timezone.
+
+    Args:
+        epoch_seconds: the timestamp in UTC epoch seconds, as decoded by TimestampDecoder with the timezone
+        timezone: the timezone string from the log file. E.g. -0400
+
+    Returns:
+        The formatted timestamp. Example:
+
+            01/Jul/1995:00:00:01 -0400
+
+    Raises:
+        ValueError: if the timezone is not a [+-]HHMM offset.
+
+    """
+
+    return time.strftime(TIMESTAMP_FORMAT, time.gmtime(epoch_seconds + parse_timezone_offset(timezone))) + ' ' + \
+        str(timezone)
+
+
+def format_busiest_periods_by_window(busiest_windows_by_length=None, timezone=None):
+
+    """Formats the busiest windows of every window length as busiest periods.
+
+    Args:
+        busiest_windows_by_length: ordered dictionary with the window length in seconds as key and the list of (window
+         start, number of visits) tuples as value, as returned by get_top_n_busiest_windows_by_length.
+        timezone: the timezone string in which the window starts are formatted. E.g. -0400
+
+    Returns:
+        An ordered dictionary with the window length in minutes as key and the list of the window starts with the
+        number of visits separated by a comma as value. Example:
+
+            OrderedDict([(60, ['01/Jul/1995:00:00:01 -0400,100', ...]), ...])
+
+    """
+
+    return OrderedDict((window_seconds // 60, [format_timestamp(window_start, timezone) + ',' + str(num_visits)
+                                               for window_start, num_visits in busiest_windows])
+                       for window_seconds, busiest_windows in busiest_windows_by_length.iteritems())
+
+
+def get_top_n_busiest_windows(n=0, window_seconds=0, timestamp_visit_counts=None, timezone=None):
+
+    """Fetches the n busiest windows of window_seconds from the number of visits per second.
+
+    Every second between the first and the last visit is a window start, whether there was a visit in that second or
+    not. See get_top_n_busiest_windows_by_length.
+
+    Args:
+        n: number of top busiest windows required.
+        window_seconds: the window length in seconds.
+        timestamp_visit_counts: dictionary with the epoch seconds as key and the number of visits as value.
+        timezone: the timezone string in which the window starts are formatted, UTC if None. E.g. -0400
+
+    Returns:
+        A list of (window start, number of visits) tuples of the top n windows in descending order of visits, the
+        ties in lexicographical order of the formatted window start.
+
+    """
+
+    if n == 0 or window_seconds == 0 or not timestamp_visit_counts:
+        return list()
+
+    return get_top_n_busiest_windows_by_length(n=n, window_lengths=[window_seconds],
+                                               timestamp_visit_counts=timestamp_visit_counts,
+                                               timezone=timezone)[window_seconds]
+
+
+def get_top_n_busiest_windows_by_length(n=0, window_lengths=None, timestamp_visit_counts=None, timezone=None):
+
+    """Fetches the n busiest windows of every window length from the number of visits per second.
+
+    Every second between the first and the last visit is a window start, whether there was a visit in that second or
+    not. The number of visits in a window only changes at the starts where a visit enters the window (visit time -
+    window length + 1) or leaves it (visit time + 1), so the window starts are swept as segments of constant visits
+    between these breakpoints. The visit times are sorted and their cumulative visits computed once, and shared by all
+    the window lengths: the visits of every segment are the difference of the cumulative visits at the two ends of its
+    window, found by binary search in the sorted visit times. The cost is therefore proportional to the number of
+    distinct visit times and not to the time span of the log, and several window lengths cost about the same as one.
+
+    Args:
+        n: number of top busiest windows required for every window length.
+        window_lengths: list of the window lengths in seconds. E.g. [60, 300, 3600]
+        timestamp_visit_counts: dictionary with the epoch seconds as key and the number of visits as value.
+        timezone: the timezone string in which the window starts are formatted, UTC if None. E.g. -0400
+
+    Returns:
+        An ordered dictionary with the window length as key, in the order of window_lengths, and the list of (window
+        start, number of visits) tuples of its top n windows as value, in descending order of visits and the ties in
+        lexicographical order of the formatted window start. The lists are empty if n is 0 or there are no visits.
+
+    Raises:
+        ValueError: if the timezone is not a [+-]HHMM offset.
+
+    """
+
+    busiest_windows_by_length = OrderedDict((window_seconds, list()) for window_seconds in window_lengths)
+
+    if n == 0 or not timestamp_visit_counts:
+        return busiest_windows_by_length
+
+    timestamps = np.fromiter(timestamp_visit_counts.iterkeys(), dtype=np.int64, count=len(timestamp_visit_counts))
+    visits = np.fromiter(timestamp_visit_counts.itervalues(), dtype=np.int64, count=len(timestamp_visit_counts))
+    order = np.argsort(timestamps)
+    timestamps = timestamps[order]
+
+    # cumulative visits before every visit time, and the window starts where a visit leaves the window
+    cumulative_visits = np.concatenate(([0], np.cumsum(visits[order])))
+    exit_breakpoints = timestamps[:-1] + 1
+    timezone_offset = parse_timezone_offset(timezone) if timezone is not None else 0
+
+    for window_seconds in busiest_windows_by_length:
+        if window_seconds > 0:
+            busiest_windows_by_length[window_seconds] = sweep_busiest_windows(
+                n=n, window_seconds=window_seconds, timestamps=timestamps, cumulative_visits=cumulative_visits,
+                exit_breakpoints=exit_breakpoints, timezone_offset=timezone_offset)
+
+    return busiest_windows_by_length
+
+
+def get_timestamp_sort_keys(epoch_seconds=None, timezone_offset=0):
+
+    """Gets integer keys of the epoch seconds which sort like their timestamps formatted by format_timestamp.
+
+    The formatted timestamp starts with the day of the month, followed by the abbreviated month name, the year and the
+    time of the day, all of fixed width, so the strings sort like the (day, month name, year, time of the day) tuples,
+    e.g. 01/Aug/1995 before 31/Jul/1995 and Apr before Jan.
+
+    Args:
+        epoch_seconds: numpy array of the timestamps in UTC epoch seconds.
+        timezone_offset: the offset from UTC in seconds of the timezone the timestamps are formatted in.
+
+    Returns:
+        A numpy array of the int64 sort keys.
+
+    """
+
+    local_seconds = (epoch_seconds + timezone_offset).astype('datetime64[s]')
+    days = local_seconds.astype('datetime64[D]')
+    months = local_seconds.astype('datetime64[M]')
+
+    # the rank of every month (0 for January) in the lexicographical order of the month names
+    month_name_ranks = np.argsort(np.argsort(calendar.month_abbr[1:]))
+
+    day_of_month = (days - months).astype(np.int64) + 1
+    month_name_rank = month_name_ranks[months.astype(np.int64) % 12]
+    year = local_seconds.astype('datetime64[Y]').astype(np.int64) + 1970
+    time_of_day = (local_seconds - days).astype(np.int64)
+
+    return ((day_of_month * 12 + month_name_rank) * 10000 + year) * 86400 + time_of_day
+
+
+def sweep_busiest_windows(n=0, window_seconds=0, timestamps=None, cumulative_visits=None, exit_breakpoints=None,
+                          timezone_offset=0):
+
+    """Sweeps the window starts of one window length as segments of constant visits and selects the top n windows.
+
+    The ties are listed in the lexicographical order of the formatted window starts, as the challenge FAQ asks. Within
+    a day the formatted window starts sort chronologically, so the segments are split at the midnights into parts of a
+    single day, and the top n windows are among the first n window starts of the top n parts by visits and formatted
+    part start.
+
+    Args:
+        n: number of top busiest windows required.
+        window_seconds: the window length in seconds.
+        timestamps: numpy array of the sorted distinct visit times.
+        cumulative_visits: numpy array of the cumulative visits before every visit time, and the total visits last.
+        exit_breakpoints: numpy array of the window starts after every visit time but the last, where the visit
+         leaves the window.
+        timezone_offset: the offset from UTC in seconds of the timezone the window starts are formatted in.
+
+    Returns:
+        A list of (window start, number of visits) tuples of the top n windows in descending order of visits, the
+        ties in lexicographical order of the formatted window start.
+
+    """
+
+    first_timestamp, last_timestamp = timestamps[0], timestamps[-1]
+
+    # the segment starts, i.e. the window starts where the number of visits can change, sorted without duplicates
+    entry_breakpoints = timestamps - window_seconds + 1
+    segment_starts = np.unique(np.concatenate(([first_timestamp], exit_breakpoints,
+                                               entry_breakpoints[entry_breakpoints > first_timestamp])))
+    segment_ends = np.append(segment_starts[1:] - 1, last_timestamp)
+
+    # the window [start, start + window_seconds - 1] covers the visit times from left to right - 1
+    left = np.searchsorted(timestamps, segment_starts, side='left')
+    right = np.searchsorted(timestamps, segment_starts + window_seconds - 1, side='right')
+    segment_visits = cumulative_visits[right] - cumulative_visits[left]
+
+    # the nth busiest window has the visits of the segment where the windows of the busiest segments add up to n
+    order = np.argsort(-segment_visits, kind='mergesort')
+    num_windows = np.cumsum(segment_ends[order] - segment_starts[order] + 1)
+    min_visits = segment_visits[order[min(np.searchsorted(num_windows, n), len(order) - 1)]]
+    selected = segment_visits >= min_visits
+    segment_starts, segment_ends, segment_visits = segment_starts[selected], segment_ends[selected], \
+        segment_visits[selected]
+
+    # the parts of the segments within a single day of the timezone
+    first_days = (segment_starts + timezone_offset) // 86400
+    num_days = (segment_ends + timezone_offset) // 86400 - first_days + 1
+    segments = np.repeat(np.arange(len(segment_starts)), num_days)
+    days = first_days[segments] + np.arange(len(segments)) - np.repeat(np.cumsum(num_days) - num_days, num_days)
+    part_starts = np.maximum(segment_starts[segments], days * 86400 - timezone_offset)
+    part_ends = np.minimum(segment_ends[segments], (days + 1) * 86400 - timezone_offset - 1)
+    part_visits = segment_visits[segments]
+
+    # the first n window starts of the top n parts
+    top_parts = np.lexsort((get_timestamp_sort_keys(part_starts, timezone_offset), -part_visits))[:n]
+    window_starts = part_starts[top_parts][:, np.newaxis] + np.arange(n)
+    within_part = window_starts <= part_ends[top_parts][:, np.newaxis]
+    window_visits = np.repeat(part_visits[top_parts], within_part.sum(axis=1))
+    window_starts = window_starts[within_part]
+
+    top_windows = np.lexsort((get_timestamp_sort_keys(window_starts, timezone_offset), -window_visits))[:n]
+
+    return zip(window_starts[top_windows].tolist(), window_visits[top_windows].tolist())
+
+
+class HostLoginState(object):
+
+    """Login failure state of a single host/IP address.
+
+    Attributes:
+        failure_timestamps: timestamps of the trailing consecutive failed login attempts (at most the consecutive
+         failure limit).
+        block_start_time: timestamp of the failed attempt which started the current block, None if not blocked.
+
+    """
+
+    __slots__ = ('failure_timestamps', 'block_start_time')
+
+    def __init__(self):
+        self.failure_timestamps = list()
+        self.block_start_time = None
+
+
+class LoginFailureDetector(object):
+
+    """Online detector for consecutive login failures.
+
+    Processes the requests of every host in chronological order, one request at a time, and decides whether the
+    request would have been blocked. A host is blocked when its last consecutive_failure_limit requests are all
+    failed logins (http status code 401) within login_failure_window seconds. All the following requests of the
+    host within blocked_window_time minutes are blocked. This is the same state machine as the sliding window check
+    in get_login_failure_blocked_records of process_log, but it only keeps the trailing failures of every host.
+
+    Attributes:
+        blocked_window_seconds: blocked window time in seconds after consecutive login failures.
+        consecutive_failure_limit: threshold for number of consecutive login failures. E.g. 3 failures
+        login_failure_window: failure window time in seconds over which the consecutive failures occur.
+        host_states: dictionary with the host name as key and its HostLoginState as value. Only hosts with
+         trailing failures or an active block are kept.
+
+    """
+
+    def __init__(self, blocked_window_time=0, consecutive_failure_limit=0, login_failure_window=0):
+        self.blocked_window_seconds = 60 * blocked_window_time
+        self.consecutive_failure_limit = consecutive_failure_limit
+        self.login_failure_window = login_failure_window
+        self.host_states = dict()
+
+    def update(self, host_name=None, timestamp=0, http_status_code=None):
+
+        """Processes the next request of a host and checks if it would have been blocked.
+
+        Args:
+            host_name: the host/IP address making the request
+            timestamp: the request timestamp in epoch seconds
+            http_status_code: the http status code string of the request. E.g. '401'
+
+        Returns:
+            True if the request falls in the blocked window of the host else False.
+
+        """
+
+        host_state = self.host_states.get(host_name)
+
+        # hosts without any trailing failure are not tracked until their next failed login attempt
+        if host_state is None:
+            if http_status_code != '401':
+                return False
+            host_state = self.host_states[host_name] = HostLoginState()
+
+        # if the host is blocked, then check if the request is within the blocked window else reset the block
+        if host_state.block_start_time is not None:
+            if 0 < timestamp - host_state.block_start_time <= self.blocked_window_seconds:
+                return True
+            host_state.block_start_time = None
+
+        if http_status_code == '401':
+
+            # keep only the trailing consecutive failures up to the failure limit
+            failure_timestamps = host_state.failure_timestamps
+            failure_timestamps.append(timestamp)
+            if len(failure_timestamps) > self.consecutive_failure_limit:
+                del failure_timestamps[0]
+
+            # start blocking the host if the consecutive failures happened within the login failure window
+            if len(failure_timestamps) == self.consecutive_failure_limit and \
+                    0 <= timestamp - failure_timestamps[0] < self.login_failure_window:
+                host_state.block_start_time = timestamp
+                host_state.failure_timestamps = list()
+
+        elif host_state.block_start_time is None:
+            # a successful attempt resets the failures, so the host needs no state till it fails again
+            del self.host_states[host_name]
+
+        return False
+
+    def is_blocked(self, host_name=None, timestamp=0):
+
+        """Checks if a host is blocked at the given time without recording a request.
+
+        Args:
+            host_name: the host/IP address
+            timestamp: the time in epoch seconds
+
+        Returns:
+            True if the host has an active block at the given time else False.
+
+        """
+
+        host_state = self.host_states.get(host_name)
+
+        return host_state is not None and host_state.block_start_time is not None and \
+            0 < timestamp - host_state.block_start_time <= self.blocked_window_seconds
+
+
+class ExpiringLoginFailureDetector(LoginFailureDetector):
+
+    """Login failure detector with a bounded memory for long running processes.
+
+    The state of a host can only affect its next request while the block started by its failures is active or its
+    trailing failures are within the login failure window. The hosts idle for longer than both windows, measured in
+    the log time of the latest request, are evicted. The least recently seen hosts are also evicted once more than
+    max_tracked_hosts hosts are tracked.
+
+    Attributes:
+        max_tracked_hosts: maximum number of hosts for which the login failure state is kept.
+        idle_expiry_seconds: number of seconds after which the state of an idle host is evicted.
+        host_last_seen: ordered dictionary with the host name as key and its latest request timestamp as value, the
+         least recently seen host first.
+        num_evicted_hosts: number of hosts evicted so far.
+
+    """
+
+    def __init__(self, blocked_window_time=0, consecutive_failure_limit=0, login_failure_window=0,
+                 max_tracked_hosts=0):
+        super(ExpiringLoginFailureDetector, self).__init__(blocked_window_time=blocked_window_time,
+                                                           consecutive_failure_limit=consecutive_failure_limit,
+                                                           login_failure_window=login_failure_window)
+        self.max_tracked_hosts = max_tracked_hosts
+        self.idle_expiry_seconds = max(self.blocked_window_seconds, login_failure_window)
+        self.host_last_seen = OrderedDict()
+        self.num_evicted_hosts = 0
+
+    def update(self, host_name=None, timestamp=0, http_status_code=None):
+
+        """Processes the next request of a host, evicting the idle hosts, and checks if it would have been blocked.
+
+        Args:
+            host_name: the host/IP address making the request
+            timestamp: the request timestamp in epoch seconds
+            http_status_code: the http status code string of the request. E.g. '401'
+
+        Returns:
+            True if the request falls in the blocked window of the host else False.
+
+        """
+
+        is_blocked = super(ExpiringLoginFailureDetector, self).update(host_name, timestamp, http_status_code)
+
+        # move the host to the end of the recently seen hosts if it is still tracked
+        self.host_last_seen.pop(host_name, None)
+        if host_name in self.host_states:
+            self.host_last_seen[host_name] = timestamp
+
+        self.evict_hosts(timestamp)
+
+        return is_blocked
+
+    def evict_hosts(self, timestamp=0):
+
+        """Evicts the hosts idle since before the expiry window and the least recently seen hosts over the limit.
+
+        Args:
+            timestamp: the current log time in epoch seconds
+
+        """
+
+        while len(self.host_last_seen) > 0:
+
+            host_name, last_seen = next(self.host_last_seen.iteritems())
+
+            if timestamp - last_seen <= self.idle_expiry_seconds and \
+                    (self.max_tracked_hosts == 0 or len(self.host_last_seen) <= self.max_tracked_hosts):
+                break
+
+            del self.host_last_seen[host_name]
+            self.host_states.pop(host_name, None)
+            self.num_evicted_hosts += 1
+
+
+class LogAggregator(object):
+
+    """Single pass aggregation engine for all the four features.
+
+    Updates the host visit counts, the bandwidth consumed per resource, the per second visit histogram and the
+    login failure state of every host in one pass over the parsed log records, without building a data frame. The
+    records are expected in the chronological order of the log file.
+
+    Attributes:
+        host_visit_counts: dictionary with the host name as key and the number of requests as value.
+        uri_bandwidth: dictionary with the resource uri as key and the bytes transferred as value.
+        timestamp_visit_counts: dictionary with the UTC epoch seconds as key and the number of requests as value.
+        timezone: the timezone of the first record, in which the busiest periods are listed.
+        num_records: number of records aggregated, excluding the ones with an empty http request.
+        host_failure_counts: dictionary with the host name as key and the number of failed login attempts as value.
+        blocked_records: list of (host name, timestamp, sequence number, log entry) tuples of the blocked requests.
+         The log entry is a byte offset tuple until it is read from the log file, if the records had no log entries.
+        login_failure_detector: the LoginFailureDetector deciding the blocked requests, None if the login failures
+         are not to be detected e.g. for the partial aggregates of a parallel worker.
+        timestamp_decoder: the TimestampDecoder converting the record timestamps to UTC epoch seconds.
+        heavy_hitters_capacity: if not 0, the host visit counts and the bandwidth per resource are approximated by
+         SpaceSavingCounter objects keeping at most this many hosts and resources, else they are counted exactly.
+
+    """
+
+    def __init__(self, blocked_window_time=0, consecutive_failure_limit=0, login_failure_window=0,
+                 detect_login_failures=True, heavy_hitters_capacity=0):
+        self.heavy_hitters_capacity = heavy_hitters_capacity
+
+        if heavy_hitters_capacity:
+            self.host_visit_counts = SpaceSavingCounter(capacity=heavy_hitters_capacity)
+            self.uri_bandwidth = SpaceSavingCounter(capacity=heavy_hitters_capacity)
+        else:
+            self.host_visit_counts = defaultdict(int)
+            self.uri_bandwidth = defaultdict(int)
+
+        self.timestamp_visit_counts = defaultdict(int)
+        self.timezone = None
+        self.num_records = 0
+        self.host_failure_counts = defaultdict(int)
+        self.blocked_records = list()
+        self.login_failure_detector = None
+
+        if detect_login_failures:
+            self.login_failure_detector = LoginFailureDetector(blocked_window_time=blocked_window_time,
+                                                               consecutive_failure_limit=consecutive_failure_limit,
+                                                               login_failure_window=login_failure_window)
+
+        # decoder reusing the last timestamp, as consecutive requests very often share the same second
+        self.timestamp_decoder = TimestampDecoder()
+
+    def parse_timestamp(self, timestamp=None, timezone=None):
+
+        """Converts the log file timestamp in the timezone to UTC epoch seconds, reusing the last converted value.
+
+        Args:
+            timestamp: the timestamp string without the timezone. E.g. 01/Jul/1995:00:00:01
+            timezone: the timezone string of the timestamp. E.g. -0400
+
+        Returns:
+            The timestamp in UTC epoch seconds.
+
+        Raises:
+            ValueError: if the timestamp does not match the log file timestamp format or the timezone is invalid.
+
+        """
+
+        return self.timestamp_decoder.decode(timestamp, timezone)
+
+    def update_record(self, host_name=None, timestamp=None, timezone=None, http_request=None, http_status_code=None,
+                      bytes_transferred=None, log_entry=None):
+
+        """Aggregates a single parsed log record.
+
+        Applies the same preprocessing as get_data_frame of process_log: the records with an empty http request
+        are skipped, '-' bytes transferred are counted as 0 and the uri is extracted from the http request.
+
+        Raises:
+            ValueError: if the timestamp or the bytes transferred can not be converted.
+
+        """
+
+        http_request = str(http_request).strip()
+
+        # skip the records with empty http_request field
+        if http_request == '':
+            return
+
+        request_parts = http_request.split()
+        uri = request_parts[1] if len(request_parts) > 1 else request_parts[0]
+
+        epoch_seconds = self.parse_timestamp(timestamp, timezone)
+
+        if self.timezone is None:
+            self.timezone = timezone
+
+        self.host_visit_counts[host_name] += 1
+        self.uri_bandwidth[uri] += 0 if bytes_transferred == '-' else int(bytes_transferred)
+        self.timestamp_visit_counts[epoch_seconds] += 1
+
+        if http_status_code == '401':
+            self.host_failure_counts[host_name] += 1
+
+        if self.login_failure_detector is not None:
+            self.update_login_state(host_name, epoch_seconds, http_status_code, log_entry)
+
+        self.num_records += 1
+
+    def update_login_state(self, host_name=None, epoch_seconds=0, http_status_code=None, log_entry=None):
+
+        """Feeds a record to the login failure detector and records it if it would have been blocked.
+
+        Args:
+            host_name: the host/IP address making the request
+            epoch_seconds: the request timestamp in epoch seconds
+            http_status_code: the http status code string of the request. E.g. '401'
+            log_entry: the complete log line of the request
+
+        """
+
+        if self.login_failure_detector.update(host_name, epoch_seconds, http_status_code):
+            self.blocked_records.append((host_name, epoch_seconds, len(self.blocked_records), log_entry))
+
+    def update(self, batch=None):
+
+        """Aggregates a columnar batch of parsed log records as yielded by parse_log_file_chunks.
+
+        If the batch has no log entries, the log entries of the blocked records are kept as (byte offset, length)
+        tuples, to be read from the log file with resolve_blocked_records of process_log.
+
+        Args:
+            batch: dictionary with the column headers as keys and the list of column values as values.
+
+        """
+
+        if batch is None:
+            return
+
+        log_entries = batch['log_entry'] if 'log_entry' in batch else zip(batch['log_offset'], batch['log_length'])
+
+        for record in zip(batch['host_name'], batch['timestamp'], batch['timezone'], batch['http_request'],
+                          batch['http_status_code'], batch['bytes_transferred'], log_entries):
+            self.update_record(*record)
+
+    def merge(self, other=None):
+
+        """Merges the partial aggregates of another LogAggregator into this one.
+
+        The other aggregator is expected to hold the records following the ones of this aggregator in the log file,
+        e.g. the next byte range of the log file. The blocked records are not merged, as the login failures of a host
+        depend on all of its requests and are detected separately.
+
+        Args:
+            other: the LogAggregator with the partial aggregates to be merged.
+
+        """
+
+        if other is None:
+            return
+
+        for host_name, visit_count in other.host_visit_counts.iteritems():
+            self.host_visit_counts[host_name] += visit_count
+
+        for uri, bandwidth in other.uri_bandwidth.iteritems():
+            self.uri_bandwidth[uri] += bandwidth
+
+        for epoch_seconds, visit_count in other.timestamp_visit_counts.iteritems():
+            self.timestamp_visit_counts[epoch_seconds] += visit_count
+
+        for host_name, failure_count in other.host_failure_counts.iteritems():
+            self.host_failure_counts[host_name] += failure_count
+
+        if self.timezone is None:
+            self.timezone = other.timezone
+
+        self.num_records += other.num_records
+
+    def get_top_n_active_hosts(self, n=0):
+
+        """Fetches the top n active hosts/IP Addresses with the visit counts separated by a comma.
+
+        The hosts are selected with a bounded heap of n entries instead of sorting all of them. Ties are listed in
+        the lexicographical order of the host names.
+
+        """
+
+        if n == 0:
+            return None
+
+        top_hosts = heapq.nsmallest(n, self.host_visit_counts.iteritems(), key=lambda item: (-item[1], item[0]))
+
+        return [str(host_name) + ',' + str(visit_count) for host_name, visit_count in top_hosts]
+
+    def get_top_n_resources_max_bandwidth(self, n=0):
+
+        """Fetches the top n resources based on bandwidth consumed.
+
+        The resources are selected with a bounded heap of n entries instead of sorting all of them. Ties are listed in
+        the lexicographical order of the resources.
+
+        """
+
+        if n == 0:
+            return None
+
+        top_resources = heapq.nsmallest(n, self.uri_bandwidth.iteritems(), key=lambda item: (-item[1], item[0]))
+
+        return [uri for uri, bandwidth in top_resources]
+
+    def get_top_n_busiest_periods(self, n=0, period_in_minutes=0):
+
+        """Fetches the n busiest periods of period_in_minutes with the number of visits separated by a comma.
+
+        Every second between the first and the last request is considered as a window start. Ties are listed in
+        the lexicographical order of the formatted window start.
+
+        """
+
+        if n == 0 or period_in_minutes == 0 or len(self.timestamp_visit_counts) == 0:
+            return None
+
+        busiest_periods = get_top_n_busiest_windows(n=n, window_seconds=period_in_minutes * 60,
+                                                    timestamp_visit_counts=self.timestamp_visit_counts,
+                                                    timezone=self.timezone)
+
+        return [format_timestamp(window_start, self.timezone) + ',' + str(num_visits_in_window)
+                for window_start, num_visits_in_window in busiest_periods]
+
+    def get_top_n_busiest_periods_by_window(self, n=0, periods_in_minutes=None):
+
+        """Fetches the n busiest periods of every period length in minutes in one sweep of the visits per second.
+
+        Returns:
+            An ordered dictionary with the period in minutes as key and the list of the n busiest periods with the
+            number of visits separated by a comma as value, like get_top_n_busiest_periods. None if there are no
+            records.
+
+        """
+
+        if len(self.timestamp_visit_counts) == 0:
+            return None
+
+        return format_busiest_periods_by_window(
+            get_top_n_busiest_windows_by_length(n=n, window_lengths=[period * 60 for period in periods_in_minutes],
+                                                timestamp_visit_counts=self.timestamp_visit_counts,
+                                                timezone=self.timezone),
+            timezone=self.timezone)
+
+    def get_login_failure_blocked_records(self):
+
+        """Retrieves the log entries of the requests blocked after consecutive login failures.
+
+        The blocked entries are grouped by host name, in the chronological order of every host.
+
+        """
+
+        return [log_entry for host_name, epoch_seconds, sequence_number, log_entry in sorted(self.blocked_records)]
@@ -0,0 +1,234 @@
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+
+from atomic_file import atomic_write
+
+# version of the cache file layout and of the data frame preprocessing, changing it invalidates all the cache files
+CACHE_FORMAT_VERSION = 4
+
+
+def get_cache_key(input_file=None, regular_exp=None):
+
+    """Gets the cache key of the parsed log file.
+
+    The key changes whenever the log file is modified (path, size or modification time) or it is parsed with a
+    different regular expression. It starts with a digest of the path of the log file, shared by all its keys, so the
+    cache files of the earlier versions of the log file are found and removed when a new one is saved.
+
+    Args:
+        input_file: NASA web server log file.
+        regular_exp: the regular expression to extract the relevant groups from every
+         line in the log file.
+
+    Returns:
+        The hexadecimal sha1 digests of the path and of the parsed log file, separated by a -.
+
+    Raises:
+        OSError: if the log file is missing at the given location.
+
+    """
+
+    file_stat = os.stat(input_file)
+    input_path = os.path.abspath(input_file)
+
+    key_fields = [input_path, file_stat.st_size, file_stat.st_mtime, regular_exp.pattern, regular_exp.flags,
+                  CACHE_FORMAT_VERSION]
+
+    return hashlib.sha1(input_path).hexdigest() + '-' + hashlib.sha1(json.dumps(key_fields)).hexdigest()
+
+
+def get_cache_file(cache_dir=None, cache_key=None):
+
+    """Gets the path of the cache file for the cache key in the cache directory."""
+
+    return os.path.join(cache_dir, cache_key + '.npz')
+
+
+def remove_superseded_cache_files(cache_dir=None, cache_key=None):
+
+    """Removes the cache files of the same log file path with other cache keys, e.g. of the log file before lines
+    were appended to it, so the cache directory does not grow with every change of the log file."""
+
+    path_prefix = cache_key.partition('-')[0] + '-'
+
+    for file_name in os.listdir(cache_dir):
+        if file_name.startswith(path_prefix) and file_name.endswith('.npz') and file_name != cache_key + '.npz':
+            try:
+                os.remove(os.path.join(cache_dir, file_name))
+            except OSError:
+                # the file may be removed concurrently by another run
+                pass
+
+
+def encode_string_column(values=None):
+
+    """Dictionary encodes a column of strings into numpy arrays.
+
+    Args:
+        values: sequence of strings
+
+    Returns:
+        A tuple of the int32 codes of the values, the uint8 array with the distinct values concatenated and the
+        int64 offsets of the distinct values in it.
+
+    """
+
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+
+    offsets = np.zeros(len(uniques) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in uniques], out=offsets[1:])
+
+    return codes.astype(np.int32), np.frombuffer(''.join(uniques), dtype=np.uint8), offsets
+
+
+def decode_string_values(blob=None, offsets=None):
+
+    """Decodes the distinct values of a dictionary encoded column of strings.
+
+    Args:
+        blob: uint8 array with the distinct values concatenated
+        offsets: int64 offsets of the distinct values in the blob
+
+    Returns:
+        A numpy object array with the distinct string values.
+
+    """
+
+    blob = blob.tostring()
+    offsets = offsets.tolist()
+
+    uniques = np.empty(len(offsets) - 1, dtype=object)
+    uniques[:] = [blob[offsets[i]:offsets[i + 1]] for i in xrange(len(offsets) - 1)]
+
+    return uniques
+
+
+def decode_string_column(codes=None, blob=None, offsets=None):
+
+    """Decodes a dictionary encoded column of strings.
+
+    Args:
+        codes: int32 codes of the values
+        blob: uint8 array with the distinct values concatenated
+        offsets: int64 offsets of the distinct values in the blob
+
+    Returns:
+        A numpy object array with the string values.
+
+    """
+
+    return decode_string_values(blob, offsets)[codes]
+
+
+def save_data_frame(cache_dir=None, cache_key=None, input_data_frame=None, bad_records=None):
+
+    """Saves the preprocessed log data frame and the bad records to the cache directory.
+
+    The columns are stored as separate numpy arrays in one uncompressed .npz file: the timestamps as int64
+    nanoseconds, the numeric columns as they are, the categorical columns as their codes and categories and the
+    string columns dictionary encoded. The file is written to a
+    temporary file first and then renamed, so a partially written cache file is never read. The cache files of the
+    earlier versions of the log file are removed afterwards.
+
+    Args:
+        cache_dir: the directory with the cache files.
+        cache_key: the cache key of the parsed log file.
+        input_data_frame: the preprocessed data frame returned by get_data_frame.
+        bad_records: list of the lines which did not match the regular expression.
+
+    Raises:
+        IOError: if there is some problem writing the cache file.
+
+    """
+
+    if cache_dir is None or cache_key is None or input_data_frame is None:
+        return
+
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+
+    arrays = dict()
+    column_types = list()
+
+    for i, column in enumerate(input_data_frame.columns):
+
+        values = input_data_frame[column].values
+
+        if isinstance(values, pd.Categorical):
+            arrays['codes_%d' % i] = values.codes
+            arrays['categories_%d' % i], arrays['offsets_%d' % i] = encode_string_column(values.categories)[1:]
+            column_types.append((column, 'category'))
+        elif values.dtype == object:
+            arrays['codes_%d' % i], arrays['blob_%d' % i], arrays['offsets_%d' % i] = encode_string_column(values)
+            column_types.append((column, 'string'))
+        elif values.dtype.kind == 'M':
+            arrays['values_%d' % i] = values.astype('int64')
+            column_types.append((column, str(values.dtype)))
+        else:
+            arrays['values_%d' % i] = values
+            column_types.append((column, str(values.dtype)))
+
+    arrays['bad_codes'], arrays['bad_blob'], arrays['bad_offsets'] = encode_string_column(bad_records or list())
+    arrays['manifest'] = np.frombuffer(json.dumps(column_types), dtype=np.uint8)
+
+    with atomic_write(get_cache_file(cache_dir, cache_key)) as output_file:
+        np.savez(output_file, **arrays)
+
+    remove_superseded_cache_files(cache_dir=cache_dir, cache_key=cache_key)
+
+
+def load_data_frame(cache_dir=None, cache_key=None):
+
+    """Loads the preprocessed log data frame and the bad records from the cache directory.
+
+    Args:
+        cache_dir: the directory with the cache files.
+        cache_key: the cache key of the parsed log file.
+
+    Returns:
+        A tuple of the preprocessed data frame and the list of bad records, None if there is no cache file for the key.
+
+    Raises:
+        IOError: if there is some problem reading the cache file.
+
+    """
+
+    if cache_dir is None or cache_key is None:
+        return None
+
+    cache_file = get_cache_file(cache_dir, cache_key)
+
+    if not os.path.isfile(cache_file):
+        return None
+
+    cached_arrays = np.load(cache_file, allow_pickle=False)
+
+    try:
+        column_types = json.loads(cached_arrays['manifest'].tostring())
+
+        columns = list()
+
+        for i, (column, column_type) in enumerate(column_types):
+
+            if column_type == 'category':
+                columns.append(pd.Categorical.from_codes(cached_arrays['codes_%d' % i], decode_string_values(
+                    cached_arrays['categories_%d' % i], cached_arrays['offsets_%d' % i])))
+            elif column_type == 'string':
+                columns.append(decode_string_column(cached_arrays['codes_%d' % i], cached_arrays['blob_%d' % i],
+                                                    cached_arrays['offsets_%d' % i]))
+            else:
+                columns.append(cached_arrays['values_%d' % i].astype(column_type))
+
+        df_data = pd.DataFrame(dict((column, values) for (column, column_type), values in zip(column_types, columns)),
+                               columns=[column for column, column_type in column_types])
+
+        bad_records = decode_string_column(cached_arrays['bad_codes'], cached_arrays['bad_blob'],
+                                           cached_arrays['bad_offsets']).tolist()
+
+    finally:
+        cached_arrays.close()
+
+    return df_data, bad_records
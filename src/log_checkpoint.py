@@ -0,0 +1,165 @@
+import os
+import hashlib
+import cPickle as pickle
+
+from atomic_file import atomic_write
+
+# version of the checkpoint layout and of the aggregated state, changing it invalidates all the checkpoints
+CHECKPOINT_FORMAT_VERSION = 2
+
+# number of bytes at the start of the log file used to recognize it after a rotation
+FINGERPRINT_SIZE = 4096
+
+
+def get_file_fingerprint(input_file=None, num_bytes=FINGERPRINT_SIZE):
+
+    """Gets the sha1 digest of the first bytes of the log file.
+
+    The log file is append only, so its first bytes never change. A different fingerprint means the log file was
+    rotated or rewritten since the checkpoint.
+
+    Args:
+        input_file: NASA web server log file.
+        num_bytes: number of bytes at the start of the log file to be hashed.
+
+    Returns:
+        A hexadecimal sha1 digest of the first num_bytes bytes of the log file.
+
+    Raises:
+        IOError: if the log file is missing at the given location or there is some problem
+        opening the log file.
+
+    """
+
+    with open(input_file, 'rb') as log_file:
+        return hashlib.sha1(log_file.read(num_bytes)).hexdigest()
+
+
+def get_complete_lines_end(input_file=None, start_offset=0):
+
+    """Gets the byte offset after the last complete line of the log file.
+
+    A partially written last line, without its new line character yet, is left for the next incremental run.
+
+    Args:
+        input_file: NASA web server log file.
+        start_offset: byte offset from where the log file is to be parsed.
+
+    Returns:
+        The byte offset after the new line character of the last line, start_offset if there is no complete line
+        after it.
+
+    Raises:
+        IOError: if the log file is missing at the given location or there is some problem
+        opening the log file.
+
+    """
+
+    with open(input_file, 'rb') as log_file:
+
+        log_file.seek(0, os.SEEK_END)
+        end_offset = log_file.tell()
+
+        # read the file backwards block by block until a new line character is found
+        while end_offset > start_offset:
+
+            block_start = max(start_offset, end_offset - 64 * 1024)
+            log_file.seek(block_start)
+            new_line_index = log_file.read(end_offset - block_start).rfind('\n')
+
+            if new_line_index != -1:
+                return block_start + new_line_index + 1
+
+            end_offset = block_start
+
+    return start_offset
+
+
+def save_checkpoint(state_file=None, input_file=None, byte_offset=0, parameters=None, log_aggregator=None):
+
+    """Saves the byte offset parsed up to and the running aggregates of the log file to the state file.
+
+    The state file is written to a temporary file first and then renamed, so a partially written state file is
+    never read.
+
+    Args:
+        state_file: file to which the checkpoint is written.
+        input_file: NASA web server log file.
+        byte_offset: byte offset after the last line aggregated.
+        parameters: tuple of the settings the aggregates depend on, e.g. the regular expression and the login
+         failure limits. A checkpoint saved with different parameters is not resumed.
+        log_aggregator: the LogAggregator with all the lines up to byte_offset aggregated.
+
+    Raises:
+        IOError: if there is some problem writing the state file.
+        OSError: if there is some problem opening or renaming the state file.
+
+    """
+
+    if state_file is None or input_file is None or log_aggregator is None:
+        return
+
+    checkpoint = {
+        'version': CHECKPOINT_FORMAT_VERSION,
+        'log_file': os.path.abspath(input_file),
+        'fingerprint': get_file_fingerprint(input_file, min(byte_offset, FINGERPRINT_SIZE)),
+        'byte_offset': byte_offset,
+        'parameters': parameters,
+        'log_aggregator': log_aggregator,
+    }
+
+    state_dir = os.path.dirname(os.path.abspath(state_file))
+
+    if not os.path.isdir(state_dir):
+        os.makedirs(state_dir)
+
+    with atomic_write(state_file) as output_file:
+        pickle.dump(checkpoint, output_file, pickle.HIGHEST_PROTOCOL)
+
+
+def load_checkpoint(state_file=None, input_file=None, parameters=None):
+
+    """Loads the checkpoint of the log file from the state file.
+
+    The checkpoint is only resumed if it was saved for the same log file and parameters, and the log file still
+    starts with the same bytes and is not shorter than the checkpointed byte offset, i.e. it was only appended to.
+
+    Args:
+        state_file: file from which the checkpoint is read.
+        input_file: NASA web server log file.
+        parameters: tuple of the settings the aggregates depend on, as given to save_checkpoint.
+
+    Returns:
+        A tuple of the byte offset to resume parsing from and the LogAggregator with the aggregates up to it, None if
+        there is no checkpoint to resume and the log file is to be parsed from the start.
+
+    Raises:
+        IOError: if there is some problem reading the state file or the log file.
+        ValueError: if the state file is not a valid checkpoint.
+
+    """
+
+    if state_file is None or input_file is None or not os.path.isfile(state_file):
+        return None
+
+    with open(state_file, 'rb') as state:
+        try:
+            checkpoint = pickle.load(state)
+        except (EOFError, AttributeError, ImportError, IndexError, pickle.UnpicklingError) as e:
+            raise ValueError('invalid state file: ' + str(e))
+
+    if not isinstance(checkpoint, dict):
+        raise ValueError('invalid state file: ' + state_file)
+
+    if checkpoint.get('version') != CHECKPOINT_FORMAT_VERSION or \
+            checkpoint['log_file'] != os.path.abspath(input_file) or checkpoint['parameters'] != parameters:
+        return None
+
+    byte_offset = checkpoint['byte_offset']
+
+    # the log file was truncated or rotated since the checkpoint
+    if os.path.getsize(input_file) < byte_offset or \
+            get_file_fingerprint(input_file, min(byte_offset, FINGERPRINT_SIZE)) != checkpoint['fingerprint']:
+        return None
+
+    return byte_offset, checkpoint['log_aggregator']
@@ -0,0 +1,176 @@
+import os
+import sys
+import time
+
+from log_aggregator import ExpiringLoginFailureDetector
+from timestamp_decoder import TimestampDecoder
+from log_tokenizer import get_line_parser
+
+# number of seconds to wait before checking the log file again for appended lines
+FOLLOW_POLL_INTERVAL = 0.2
+
+# maximum number of hosts for which the login failure state is kept in follow mode
+MAX_TRACKED_HOSTS = 100000
+
+
+def follow_log_file(input_file=None, poll_interval=FOLLOW_POLL_INTERVAL, from_start=False):
+
+    """Follows a live log file and yields the lines as they are appended, like tail -f.
+
+    Only complete lines are yielded, a partially written line is kept until its new line character is appended. If
+    the log file is rotated (replaced by a new file) or truncated, the new file is followed from its start.
+
+    Args:
+        input_file: NASA web server log file.
+        poll_interval: number of seconds to wait before checking the log file again when no new line is available.
+        from_start: if True, the existing lines of the log file are yielded first, else only the appended ones.
+
+    Yields:
+        Every appended line without the new line character.
+
+    Raises:
+        IOError: if the log file is missing at the given location or there is some problem
+        opening the log file.
+
+    """
+
+    log_file = open(input_file, 'rb')
+
+    try:
+        if not from_start:
+            log_file.seek(0, os.SEEK_END)
+
+        partial_line = ''
+
+        while True:
+
+            line = log_file.readline()
+
+            if line:
+                # wait for the rest of a partially written line
+                if not line.endswith('\n'):
+                    partial_line += line
+                    continue
+
+                yield (partial_line + line).strip('\n')
+                partial_line = ''
+                continue
+
+            # check if the log file was rotated or truncated while there was nothing new to read
+            try:
+                file_stat = os.stat(input_file)
+            except OSError:
+                file_stat = None
+
+            if file_stat is not None and (file_stat.st_ino != os.fstat(log_file.fileno()).st_ino or
+                                          file_stat.st_size < log_file.tell()):
+                log_file.close()
+                log_file = open(input_file, 'rb')
+                partial_line = ''
+                continue
+
+            time.sleep(poll_interval)
+
+    finally:
+        log_file.close()
+
+
+def run_follow_mode(input_file=None, regular_exp=None, blocked_file=None, bad_records_file=None,
+                    blocked_window_time=0, consecutive_failure_limit=0, login_failure_window=0,
+                    max_tracked_hosts=MAX_TRACKED_HOSTS, from_start=False):
+
+    """Tails a live log file and writes the blocked attempts as soon as they happen.
+
+    Every appended line is parsed with the regular expression and fed to an ExpiringLoginFailureDetector, which
+    decides if the request would have been blocked after consecutive login failures. The blocked log entries are
+    appended and flushed to the blocked file one by one and the unparsed lines to the bad records file. The memory
+    stays bounded as the idle hosts are evicted. Runs until interrupted with Ctrl+C.
+
+    Args:
+        input_file: NASA web server log file.
+        regular_exp: the regular expression to extract the relevant groups from every
+         line in the log file.
+        blocked_file: file to which the blocked log entries are appended.
+        bad_records_file: file to which the lines not matching the regular expression are appended.
+        blocked_window_time: blocked window time in minutes after consecutive login failures. E.g. 5 min attempts block
+        consecutive_failure_limit: threshold for number of consecutive login failures. E.g. 3 failures
+        login_failure_window: failure window time in seconds over which the consecutive failures occur. E.g. 20 seconds
+        max_tracked_hosts: maximum number of hosts for which the login failure state is kept.
+        from_start: if True, the existing lines of the log file are processed first, else only the appended ones.
+
+    """
+
+    # checks for the missing arguments
+    if input_file is None or regular_exp is None or blocked_file is None or bad_records_file is None:
+        return
+
+    login_failure_detector = ExpiringLoginFailureDetector(blocked_window_time=blocked_window_time,
+                                                          consecutive_failure_limit=consecutive_failure_limit,
+                                                          login_failure_window=login_failure_window,
+                                                          max_tracked_hosts=max_tracked_hosts)
+
+    num_records = 0
+    num_blocked_records = 0
+    timestamp_decoder = TimestampDecoder()
+    parse_log_line = get_line_parser(regular_exp)
+
+    try:
+        blocked_output = open(blocked_file, 'a')
+        bad_records_output = open(bad_records_file, 'a')
+
+    except IOError as e:
+        # print the error message if issues in accessing output file
+        print "Error opening the output file!!"
+        print "I/O error({0}): {1}".format(e.errno, e.strerror)
+        sys.exit()
+
+    print "\nFollowing the log file " + input_file + " (press Ctrl+C to stop)..."
+
+    try:
+        for line in follow_log_file(input_file=input_file, from_start=from_start):
+
+            num_records += 1
+
+            # extracting the groups of the regular expression from each line
+            groups = parse_log_line(line)
+
+            if not groups:
+                bad_records_output.write(line + '\n')
+                bad_records_output.flush()
+                continue
+
+            host_name, timestamp, timezone, http_request, http_status_code, bytes_transferred = groups
+
+            # skip the records with empty http_request field, like the batch features
+            if str(http_request).strip() == '':
+                continue
+
+            try:
+                # consecutive requests very often share the same second, so the decoder reuses the last timestamp
+                epoch_seconds = timestamp_decoder.decode(timestamp, timezone)
+            except ValueError:
+                bad_records_output.write(line + '\n')
+                bad_records_output.flush()
+                continue
+
+            if login_failure_detector.update(host_name, epoch_seconds, http_status_code):
+                blocked_output.write(line + '\n')
+                blocked_output.flush()
+                num_blocked_records += 1
+
+    except IOError as e:
+        # print the error message if issues in accessing log file
+        print "Error reading the log file!!"
+        print "I/O error({0}): {1}".format(e.errno, e.strerror)
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        blocked_output.close()
+        bad_records_output.close()
+
+    print "\nStopped following the log file."
+    print 'Total records : {} | Blocked records : {} | Tracked hosts : {} | Evicted hosts : {}' \
+        .format(num_records, num_blocked_records, len(login_failure_detector.host_states),
+                login_failure_detector.num_evicted_hosts)
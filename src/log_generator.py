@@ -0,0 +1,213 @@
+import sys
+import time
+import argparse
+import calendar
+import numpy as np
+
+# timestamp of the first generated request, the start of the NASA log
+DEFAULT_START_TIME = calendar.timegm((1995, 7, 1, 0, 0, 0))
+
+# http status codes of the regular requests and their probabilities
+STATUS_CODES = ['200', '304', '302', '404']
+STATUS_CODE_PROBABILITIES = [0.85, 0.09, 0.03, 0.03]
+
+
+def get_zipf_probabilities(num_values=0, skew=0.0):
+
+    """Gets the probabilities of a Zipf like distribution over num_values ranked values.
+
+    Args:
+        num_values: number of distinct values.
+        skew: the Zipf exponent, 0 for a uniform distribution. The larger the skew, the more the top ranked values
+         are chosen.
+
+    Returns:
+        A numpy float64 array with the probability of every rank.
+
+    """
+
+    weights = 1.0 / np.arange(1, num_values + 1) ** skew
+
+    return weights / weights.sum()
+
+
+def generate_log_lines(num_lines=0, num_hosts=1000, num_uris=1000, host_skew=1.0, uri_skew=1.0, span_days=1.0,
+                       num_attack_bursts=0, invalid_rate=0.0, timezone='-0400', start_time=DEFAULT_START_TIME,
+                       seed=0):
+
+    """Generates the lines of a synthetic NASA web server log.
+
+    The requests are spread evenly over the time span in chronological order, so many consecutive requests share the
+    same second when the log is dense. Hosts and uris are drawn from Zipf like distributions. Every attack burst is a
+    run of failed logins (status 401) of one host a few seconds apart, followed by more requests of the same host
+    within the following minutes, so that the host is blocked by feature 4.
+
+    Args:
+        num_lines: approximate number of log lines, the attack bursts add their own lines.
+        num_hosts: number of distinct hosts.
+        num_uris: number of distinct uris.
+        host_skew: Zipf exponent of the host distribution.
+        uri_skew: Zipf exponent of the uri distribution.
+        span_days: number of days between the first and the last request.
+        num_attack_bursts: number of failed login bursts.
+        invalid_rate: fraction of the lines which do not match the log format.
+        timezone: timezone of the timestamps.
+        start_time: epoch seconds of the first request.
+        seed: seed of the random generator, the same seed generates the same log.
+
+    Yields:
+        Every log line without the new line character.
+
+    """
+
+    random_state = np.random.RandomState(seed)
+
+    hosts = ['host%d.example.com' % i if i % 3 else '10.%d.%d.%d' % (i >> 16 & 255, i >> 8 & 255, i & 255)
+             for i in xrange(num_hosts)]
+    uris = ['/images/image%d.gif' % i if i % 2 else '/shuttle/page%d.html' % i for i in xrange(num_uris)]
+
+    host_indices = random_state.choice(num_hosts, size=num_lines, p=get_zipf_probabilities(num_hosts, host_skew))
+    uri_indices = random_state.choice(num_uris, size=num_lines, p=get_zipf_probabilities(num_uris, uri_skew))
+    status_codes = random_state.choice(len(STATUS_CODES), size=num_lines, p=STATUS_CODE_PROBABILITIES)
+    bytes_transferred = random_state.randint(0, 100000, size=num_lines)
+    invalid_lines = random_state.random_sample(num_lines) < invalid_rate
+    epoch_seconds = start_time + (np.arange(num_lines) * (span_days * 86400.0) / max(num_lines, 1)).astype(np.int64)
+
+    # the lines after which an attack burst starts
+    burst_lines = set(random_state.choice(num_lines, size=min(num_attack_bursts, num_lines), replace=False).tolist()) \
+        if num_lines > 0 else set()
+
+    last_second, last_timestamp = None, None
+
+    for i in xrange(num_lines):
+
+        second = int(epoch_seconds[i])
+
+        # format every second once, as consecutive requests very often share the same second
+        if second != last_second:
+            last_second = second
+            last_timestamp = time.strftime('%d/%b/%Y:%H:%M:%S', time.gmtime(second)) + ' ' + timezone
+
+        if invalid_lines[i]:
+            yield 'invalid log line %d' % i
+        else:
+            yield '%s - - [%s] "GET %s HTTP/1.0" %s %d' % (hosts[host_indices[i]], last_timestamp,
+                                                           uris[uri_indices[i]], STATUS_CODES[status_codes[i]],
+                                                           bytes_transferred[i])
+
+        if i in burst_lines:
+            for line in generate_attack_burst(random_state, 'attacker%d.example.net' % i, second, timezone):
+                yield line
+
+
+def generate_attack_burst(random_state=None, host_name=None, start_time=0, timezone='-0400'):
+
+    """Generates the lines of one failed login burst of a host.
+
+    Args:
+        random_state: the numpy RandomState to draw the gaps and the number of requests from.
+        host_name: the attacking host.
+        start_time: epoch seconds of the first failed login.
+        timezone: timezone of the timestamps.
+
+    Yields:
+        Three to five failed logins a few seconds apart followed by up to ten requests in the next ten minutes.
+
+    """
+
+    second = start_time
+
+    for i in xrange(random_state.randint(3, 6)):
+        second += random_state.randint(0, 6)
+        yield '%s - - [%s %s] "POST /login HTTP/1.0" 401 1420' % (
+            host_name, time.strftime('%d/%b/%Y:%H:%M:%S', time.gmtime(second)), timezone)
+
+    for i in xrange(random_state.randint(0, 11)):
+        second += random_state.randint(0, 60)
+        yield '%s - - [%s %s] "GET /login HTTP/1.0" %s 1420' % (
+            host_name, time.strftime('%d/%b/%Y:%H:%M:%S', time.gmtime(second)), timezone,
+            random_state.choice(['200', '401']))
+
+
+def write_log_file(output_file=None, **generator_options):
+
+    """Writes a synthetic NASA web server log file.
+
+    Args:
+        output_file: file to which the log lines are written.
+        generator_options: the keyword arguments of generate_log_lines.
+
+    Returns:
+        The number of lines written.
+
+    Raises:
+        IOError: if there is some problem writing the log file.
+
+    """
+
+    num_lines = 0
+
+    with open(output_file, 'w') as log_file:
+        for line in generate_log_lines(**generator_options):
+            log_file.write(line + '\n')
+            num_lines += 1
+
+    return num_lines
+
+
+def add_generator_arguments(arg_parser=None):
+
+    """Adds the options of the synthetic log to the command line argument parser."""
+
+    arg_parser.add_argument('--lines', type=int, default=100000, metavar='N',
+                            help='approximate number of log lines (default: 100000)')
+    arg_parser.add_argument('--hosts', type=int, default=10000, metavar='N',
+                            help='number of distinct hosts (default: 10000)')
+    arg_parser.add_argument('--uris', type=int, default=5000, metavar='N',
+                            help='number of distinct uris (default: 5000)')
+    arg_parser.add_argument('--host-skew', type=float, default=1.0, metavar='S',
+                            help='Zipf exponent of the host distribution, 0 is uniform (default: 1.0)')
+    arg_parser.add_argument('--uri-skew', type=float, default=1.0, metavar='S',
+                            help='Zipf exponent of the uri distribution, 0 is uniform (default: 1.0)')
+    arg_parser.add_argument('--span-days', type=float, default=1.0, metavar='D',
+                            help='number of days between the first and the last request (default: 1.0)')
+    arg_parser.add_argument('--attack-bursts', type=int, default=100, metavar='N',
+                            help='number of failed login bursts, blocked by feature 4 (default: 100)')
+    arg_parser.add_argument('--invalid-rate', type=float, default=0.001, metavar='R',
+                            help='fraction of the lines not matching the log format (default: 0.001)')
+    arg_parser.add_argument('--seed', type=int, default=0, help='seed of the random generator (default: 0)')
+
+
+def get_generator_options(args=None):
+
+    """Gets the keyword arguments of generate_log_lines from the parsed command line arguments."""
+
+    return dict(num_lines=args.lines, num_hosts=args.hosts, num_uris=args.uris, host_skew=args.host_skew,
+                uri_skew=args.uri_skew, span_days=args.span_days, num_attack_bursts=args.attack_bursts,
+                invalid_rate=args.invalid_rate, seed=args.seed)
+
+
+if __name__ == '__main__':
+
+    # parse the command line arguments for the output log file and the shape of the synthetic log
+    arg_parser = argparse.ArgumentParser(
+        description='Generates a synthetic NASA web server log file.',
+        epilog='Example Usage : python ./src/log_generator.py ./log_input/synthetic.txt --lines 1000000')
+    arg_parser.add_argument('log_file', help='output log file')
+    add_generator_arguments(arg_parser)
+    args = arg_parser.parse_args()
+
+    if args.lines < 0 or args.hosts < 1 or args.uris < 1 or args.attack_bursts < 0 or args.span_days < 0:
+        arg_parser.error('--lines and --attack-bursts must not be negative, --hosts and --uris must be at least 1 '
+                         'and --span-days must not be negative')
+
+    try:
+        num_log_lines = write_log_file(output_file=args.log_file, **get_generator_options(args))
+
+    except IOError as e:
+        # print the error message if issues in writing the log file
+        print "Error writing the log file!!"
+        print "I/O error({0}): {1}".format(e.errno, e.strerror)
+        sys.exit()
+
+    print "Generated {} log lines in {}".format(num_log_lines, args.log_file)
@@ -0,0 +1,359 @@
+import os
+import re
+import bz2
+import glob
+import gzip
+import zlib
+import errno
+import Queue
+import threading
+import tempfile
+import subprocess
+from distutils.spawn import find_executable
+
+# magic numbers at the start of the compressed log files
+COMPRESSION_MAGIC_NUMBERS = [('gzip', '\x1f\x8b'), ('bz2', 'BZh'), ('xz', '\xfd7zXZ\x00')]
+
+# file name extensions of the compressed log files, ignored when ordering the rotated log files
+COMPRESSION_EXTENSIONS = ('.gz', '.bz2', '.xz')
+
+# external commands decompressing a file to stdout, run in their own process alongside the parsing
+DECOMPRESSOR_COMMANDS = {'gzip': ['gzip', '-dc'], 'bz2': ['bzip2', '-dc'], 'xz': ['xz', '-dc']}
+
+# number of chunks of lines read ahead of the parsing
+MAX_PREFETCHED_CHUNKS = 4
+
+# size of the pipe buffer of the external decompressors in bytes
+PIPE_BUFFER_SIZE = 1024 * 1024
+
+# maximum number of bytes of the error messages of a failed decompressor command kept in its IOError
+MAX_ERROR_MESSAGE_BYTES = 4096
+
+
+def expand_input_files(input_patterns=None):
+
+    """Expands the log file paths and glob patterns into the list of log files to be parsed as one log.
+
+    The files matched by a glob pattern are ordered oldest first by their rotation suffix, e.g. access.log.2.gz,
+    access.log.1.gz, access.log for numbered rotations and access.log-20170401.gz, access.log-20170402.gz, access.log
+    for dated ones. Paths without glob characters are kept as they are.
+
+    Args:
+        input_patterns: a log file path or glob pattern, or a list of them.
+
+    Returns:
+        A list with the paths of the log files in the order they are to be parsed.
+
+    Raises:
+        IOError: if a glob pattern does not match any file.
+
+    """
+
+    if isinstance(input_patterns, basestring):
+        input_patterns = [input_patterns]
+
+    input_files = list()
+
+    for input_pattern in input_patterns:
+
+        if not glob.has_magic(input_pattern):
+            input_files.append(input_pattern)
+            continue
+
+        matched_files = sorted(set(glob.glob(input_pattern)), key=get_rotation_sort_key)
+
+        if len(matched_files) == 0:
+            raise IOError(errno.ENOENT, 'No log file matches the pattern', input_pattern)
+
+        input_files.extend(matched_files)
+
+    return input_files
+
+
+def get_rotation_sort_key(input_file=None):
+
+    """Gets the key ordering the rotated log files oldest first.
+
+    Small numeric suffixes are logrotate counters, the larger the older. Suffixes of 8 or more digits are dates, the
+    larger the newer. The file without a suffix is the live one and comes last.
+
+    """
+
+    file_name = os.path.basename(input_file)
+
+    for extension in COMPRESSION_EXTENSIONS:
+        if file_name.endswith(extension):
+            file_name = file_name[:-len(extension)]
+            break
+
+    match_object = re.match(r'^(.*?)[.-](\d+)$', file_name)
+
+    if match_object is None:
+        return os.path.dirname(input_file), file_name, 1, 0
+
+    rotation_number = int(match_object.group(2))
+
+    return (os.path.dirname(input_file), match_object.group(1), 0,
+            rotation_number if len(match_object.group(2)) >= 8 else -rotation_number)
+
+
+def get_compression(input_file=None):
+
+    """Gets the compression of the log file from its magic number.
+
+    Returns:
+        gzip, bz2 or xz, None if the log file is not compressed.
+
+    Raises:
+        IOError: if the log file is missing at the given location or there is some problem
+        opening the log file.
+
+    """
+
+    with open(input_file, 'rb') as log_file:
+        file_header = log_file.read(6)
+
+    for compression, magic_number in COMPRESSION_MAGIC_NUMBERS:
+        if file_header.startswith(magic_number):
+            return compression
+
+    return None
+
+
+def is_single_plain_file(input_files=None):
+
+    """Checks if the log files are one uncompressed file, which can be seeked, memory-mapped and split by byte ranges.
+
+    A missing log file is considered uncompressed, so that the error is reported by the parser.
+
+    Raises:
+        IOError: if there is some problem opening the log file.
+
+    """
+
+    return len(input_files) == 1 and (not os.path.isfile(input_files[0]) or get_compression(input_files[0]) is None)
+
+
+class DecompressorPipe(object):
+
+    """Lines of a compressed log file decompressed by an external command in its own process.
+
+    The decompression runs in parallel to the parsing of the lines read from the pipe, and is typically several times
+    faster than the gzip and bz2 modules of Python 2.
+
+    Attributes:
+        input_file: the compressed log file.
+        error_file: temporary file with the error messages of the decompressor command. It is not a pipe, so the
+         command never blocks on its error messages while the decompressed lines are read.
+        process: the subprocess.Popen of the decompressor command.
+
+    """
+
+    def __init__(self, command=None, input_file=None):
+        self.input_file = input_file
+        self.error_file = tempfile.TemporaryFile()
+
+        try:
+            self.process = subprocess.Popen(command + [input_file], stdout=subprocess.PIPE, stderr=self.error_file,
+                                            bufsize=PIPE_BUFFER_SIZE)
+        except OSError:
+            self.error_file.close()
+            raise
+
+    def readlines(self, sizehint=0):
+
+        """Reads the complete decompressed lines up to approximately sizehint bytes.
+
+        Raises:
+            IOError: if the decompressor command failed, e.g. on a corrupt or truncated file.
+
+        """
+
+        lines = self.process.stdout.readlines(sizehint)
+
+        if not lines and self.process.wait() != 0:
+            # the last error messages of the command tell why it failed
+            self.error_file.seek(0, os.SEEK_END)
+            self.error_file.seek(max(0, self.error_file.tell() - MAX_ERROR_MESSAGE_BYTES))
+            error_message = self.error_file.read().strip()
+            raise IOError(errno.EIO, error_message or 'Error decompressing the log file', self.input_file)
+
+        return lines
+
+    def close(self):
+
+        """Closes the pipe, stopping the decompressor command if the file was not read to its end."""
+
+        if self.process.poll() is None:
+            self.process.kill()
+
+        self.process.stdout.close()
+        self.process.wait()
+        self.error_file.close()
+
+
+class DecompressedFile(object):
+
+    """Reads the lines of a compressed log file with the gzip or bz2 module, when the decompressor command is missing.
+
+    The decompression errors of the modules, e.g. zlib.error on a corrupt file or EOFError and an IOError without an
+    errno on a truncated one, are raised as an IOError with an errno, a message and the log file, like the ones of the
+    DecompressorPipe.
+
+    Attributes:
+        input_file: the compressed log file.
+        compressed_file: the gzip.GzipFile or bz2.BZ2File of the log file.
+
+    """
+
+    def __init__(self, compressed_file=None, input_file=None):
+        self.input_file = input_file
+        self.compressed_file = compressed_file
+
+    def readlines(self, sizehint=0):
+
+        """Reads the complete decompressed lines up to approximately sizehint bytes.
+
+        Raises:
+            IOError: if there is some problem reading the log file, or it can not be decompressed.
+
+        """
+
+        try:
+            return self.compressed_file.readlines(sizehint)
+
+        except (IOError, EOFError, zlib.error) as e:
+            if isinstance(e, IOError) and e.errno is not None:
+                raise
+            raise IOError(errno.EIO, 'Error decompressing the log file: ' + (str(e) or type(e).__name__),
+                          self.input_file)
+
+    def close(self):
+
+        """Closes the compressed file."""
+
+        self.compressed_file.close()
+
+
+def open_log_file(input_file=None):
+
+    """Opens the plain or compressed log file to read its lines.
+
+    Compressed log files are decompressed by the external gzip, bzip2 or xz command if available, else by the gzip
+    and bz2 modules. There is no xz module in Python 2, so the xz command is required for xz compressed log files.
+
+    Returns:
+        A file like object with readlines and close methods.
+
+    Raises:
+        IOError: if the log file is missing at the given location, there is some problem opening the log file or
+        it can not be decompressed.
+
+    """
+
+    compression = get_compression(input_file)
+
+    if compression is None:
+        return open(input_file, 'r')
+
+    if find_executable(DECOMPRESSOR_COMMANDS[compression][0]) is not None:
+        try:
+            return DecompressorPipe(command=DECOMPRESSOR_COMMANDS[compression], input_file=input_file)
+        except OSError as e:
+            raise IOError(e.errno, e.strerror, input_file)
+
+    if compression == 'gzip':
+        return DecompressedFile(compressed_file=gzip.open(input_file, 'rb'), input_file=input_file)
+
+    if compression == 'bz2':
+        return DecompressedFile(compressed_file=bz2.BZ2File(input_file, 'rb'), input_file=input_file)
+
+    raise IOError(errno.ENOENT, 'The xz command is required to read the xz compressed log file', input_file)
+
+
+def iter_line_chunks(input_files=None, chunk_size=32 * 1024 * 1024):
+
+    """Reads the lines of the log files one after the other in chunks, in a background thread.
+
+    The thread decompresses and reads up to MAX_PREFETCHED_CHUNKS chunks ahead while the previous ones are parsed.
+    Reading from the decompressor pipes, zlib and bz2 release the GIL, so the decompression overlaps with the
+    parsing.
+
+    Args:
+        input_files: list of the plain or compressed log files, in the order they are to be read.
+        chunk_size: approximate number of bytes of lines in every chunk.
+
+    Yields:
+        A tuple of the log file and a list with the complete lines of the next chunk of it.
+
+    Raises:
+        IOError: if there is some problem opening, reading or decompressing a log file.
+
+    """
+
+    prefetched_chunks = Queue.Queue(maxsize=MAX_PREFETCHED_CHUNKS)
+    stop_event = threading.Event()
+
+    def put_chunk(item=None):
+
+        # wait for room in the queue, unless the reading was stopped
+        while not stop_event.is_set():
+            try:
+                prefetched_chunks.put(item, timeout=0.1)
+                return
+            except Queue.Full:
+                continue
+
+    def read_chunks():
+
+        try:
+            for input_file in input_files:
+
+                log_file = open_log_file(input_file)
+
+                try:
+                    while not stop_event.is_set():
+
+                        lines = log_file.readlines(chunk_size)
+
+                        if not lines:
+                            break
+
+                        put_chunk((input_file, lines))
+
+                finally:
+                    log_file.close()
+
+        except Exception as e:
+            # hand any error over to the reading generator, which raises it, so the reading never waits for a chunk
+            # of a dead thread
+            put_chunk(e)
+
+        else:
+            # end of the last log file
+            put_chunk(None)
+
+    reader_thread = threading.Thread(target=read_chunks, name='log-reader')
+    reader_thread.daemon = True
+    reader_thread.start()
+
+    try:
+        while True:
+
+            # wait with a timeout, so the wait can be interrupted with Ctrl+C
+            try:
+                item = prefetched_chunks.get(timeout=0.1)
+            except Queue.Empty:
+                continue
+
+            if item is None:
+                return
+
+            if isinstance(item, Exception):
+                raise item
+
+            yield item
+
+    finally:
+        stop_event.set()
+        reader_thread.join()
@@ -0,0 +1,179 @@
+import re
+import sys
+import argparse
+
+# regular expression pattern of a line in the NASA web server log, extracting the host, timestamp, timezone, http
+# request, http status code and bytes transferred
+LOG_LINE_PATTERN = r"([^\s]+).*?\[(.*)?\s(.*)?\][\s]+\"(.*)?\"[\s]+([^\s]+)[\s]+([^\s]+)"
+
+# regular expression object of the log line pattern, the fallback of the tokenizer
+LOG_LINE_REGEX = re.compile(LOG_LINE_PATTERN)
+
+# whitespace characters matched by \s other than the space and the new line character, the lines with any of them are
+# left to the regular expression
+OTHER_WHITESPACE_CHARACTERS = ('\t', '\r', '\x0b', '\x0c')
+
+
+def tokenize_log_line(line=None):
+
+    """Splits a Common Log Format line into the groups of LOG_LINE_REGEX without the regular expression.
+
+    The line is split in one left to right scan on its fixed delimiters: the first space after the host, the [ and ]
+    around the timestamp and timezone, the " around the http request and the spaces before the status code and the
+    bytes transferred. The lazy and optional groups of the regular expression backtrack over the whole line for every
+    group, while the tokenizer only searches for the delimiters.
+
+    The tokenizer only accepts the lines for which it can tell the groups are exactly the ones of the regular
+    expression: one ] after the timestamp, a single space between it and the ", the last " of the line closing the
+    http request and no whitespace other than spaces. The other lines, e.g. the invalid ones or the ones with a ] or
+    a tab in the request, are rejected and are to be matched with the regular expression.
+
+    Args:
+        line: the log line without the new line character.
+
+    Returns:
+        The tuple of the host name, timestamp, timezone, http request, http status code and bytes transferred strings,
+        like the groups of LOG_LINE_REGEX, None if the line is rejected.
+
+    """
+
+    for whitespace in OTHER_WHITESPACE_CHARACTERS:
+        if whitespace in line:
+            return None
+
+    host_end = line.find(' ')
+
+    if host_end <= 0:
+        return None
+
+    # the timestamp and timezone are between the first [ after the host and the only ] after it
+    timestamp_start = line.find('[', host_end)
+    timestamp_end = line.find(']', timestamp_start + 1) if timestamp_start >= 0 else -1
+
+    if timestamp_end < 0 or line.find(']', timestamp_end + 1) >= 0:
+        return None
+
+    timezone_start = line.rfind(' ', timestamp_start + 1, timestamp_end)
+
+    if timezone_start < 0 or line[timestamp_end + 1:timestamp_end + 3] != ' "':
+        return None
+
+    # the http request ends at the last " of the line, followed by the status code and the bytes transferred
+    request_end = line.rfind('"')
+
+    if request_end <= timestamp_end + 2 or line[request_end + 1:request_end + 2] != ' ':
+        return None
+
+    status_and_bytes = line[request_end + 1:].split(None, 2)
+
+    if len(status_and_bytes) < 2:
+        return None
+
+    return (line[:host_end], line[timestamp_start + 1:timezone_start], line[timezone_start + 1:timestamp_end],
+            line[timestamp_end + 3:request_end], status_and_bytes[0], status_and_bytes[1])
+
+
+def get_line_parser(regular_exp=None):
+
+    """Gets the function extracting the groups of the regular expression from a log line.
+
+    For LOG_LINE_REGEX the lines are split by tokenize_log_line, and only the lines it rejects are matched with the
+    regular expression. Every line is matched with any other regular expression.
+
+    Args:
+        regular_exp: the regular expression object to extract the relevant groups from every line in the log file.
+
+    Returns:
+        A function taking a log line and returning the tuple of its groups, None if the line does not match.
+
+    """
+
+    match = regular_exp.match
+
+    def match_log_line(line):
+        match_object = match(line)
+        return match_object.groups() if match_object else None
+
+    if regular_exp.pattern != LOG_LINE_PATTERN or regular_exp.flags != LOG_LINE_REGEX.flags:
+        return match_log_line
+
+    def parse_log_line(line):
+        return tokenize_log_line(line) or match_log_line(line)
+
+    return parse_log_line
+
+
+def compare_log_file(input_file=None, regular_exp=LOG_LINE_REGEX):
+
+    """Compares the tokenizer with the regular expression on every line of the log file.
+
+    Args:
+        input_file: NASA web server log file.
+        regular_exp: the regular expression the tokenizer replaces.
+
+    Returns:
+        A tuple of the number of lines, the number of lines accepted by the tokenizer, the number of lines matched by
+        the regular expression and the list of (line number, line) tuples of the lines accepted by the tokenizer with
+        other groups than the regular expression, or accepted or rejected differently by the line parser.
+
+    Raises:
+        IOError: if the log file is missing at the given location or there is some problem
+        reading the log file.
+
+    """
+
+    parse_log_line = get_line_parser(regular_exp)
+    num_lines, num_tokenized, num_matched = 0, 0, 0
+    mismatched_lines = list()
+
+    with open(input_file, 'r') as log_file:
+        for line_number, line in enumerate(log_file, 1):
+
+            line = line.strip('\n')
+            match_object = regular_exp.match(line)
+            regex_groups = match_object.groups() if match_object else None
+            tokens = tokenize_log_line(line)
+
+            num_lines += 1
+            num_tokenized += tokens is not None
+            num_matched += regex_groups is not None
+
+            if (tokens is not None and tokens != regex_groups) or parse_log_line(line) != regex_groups:
+                mismatched_lines.append((line_number, line))
+
+    return num_lines, num_tokenized, num_matched, mismatched_lines
+
+
+if __name__ == '__main__':
+
+    # parse the command line arguments for the log files to compare the tokenizer and the regular expression on
+    arg_parser = argparse.ArgumentParser(
+        description='Checks that the log line tokenizer accepts and rejects exactly the same lines as the regular '
+                    'expression, with the same groups.',
+        epilog='Example Usage : python ./src/log_tokenizer.py ./log_input/log.txt')
+    arg_parser.add_argument('log_files', nargs='+', metavar='log_file', help='NASA web server log file')
+    args = arg_parser.parse_args()
+
+    num_mismatched_lines = 0
+
+    for log_file_name in args.log_files:
+
+        try:
+            num_log_lines, num_tokenized_lines, num_matched_lines, log_mismatched_lines = compare_log_file(
+                input_file=log_file_name)
+
+        except IOError as e:
+            # print the error message if issues in reading the log file
+            print "Error reading the log file!!"
+            print "I/O error({0}): {1}: {2}".format(e.errno, e.strerror, e.filename)
+            sys.exit(1)
+
+        print "{} : {} lines | tokenized : {} | matched by the regular expression : {} | mismatched : {}".format(
+            log_file_name, num_log_lines, num_tokenized_lines, num_matched_lines, len(log_mismatched_lines))
+
+        for line_number, log_line in log_mismatched_lines:
+            print "  line {}: {!r}".format(line_number, log_line)
+
+        num_mismatched_lines += len(log_mismatched_lines)
+
+    sys.exit(1 if num_mismatched_lines > 0 else 0)
@@ -0,0 +1,172 @@
+import os
+import mmap
+
+
+def open_mapped_file(input_file=None):
+
+    """Memory-maps the log file for reading.
+
+    Args:
+        input_file: NASA web server log file.
+
+    Returns:
+        A read only mmap object of the log file, None if the log file is empty as an empty file can not be mapped.
+
+    Raises:
+        IOError: if the log file is missing at the given location or there is some problem
+        opening the log file.
+
+    """
+
+    if os.path.getsize(input_file) == 0:
+        return None
+
+    with open(input_file, 'rb') as log_file:
+        # the mapping stays valid after the file object is closed
+        return mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def iter_mapped_lines(mapped_file=None, start=0, end=None):
+
+    """Finds the lines of the memory-mapped log file without copying them.
+
+    Args:
+        mapped_file: the memory-mapped log file.
+        start: byte offset of the first line to be scanned.
+        end: byte offset after the last line to be scanned, the end of the file by default.
+
+    Yields:
+        A (line start, line end) byte offset tuple for every line, the line end excluding the new line character.
+
+    """
+
+    if end is None:
+        end = len(mapped_file)
+
+    line_start = start
+
+    while line_start < end:
+
+        line_end = mapped_file.find('\n', line_start, end)
+
+        if line_end == -1:
+            line_end = end
+
+        yield line_start, line_end
+
+        line_start = line_end + 1
+
+
+def aggregate_mapped_lines(mapped_file=None, regular_exp=None, log_aggregator=None, start=0, end=None,
+                           invalid_records=None):
+
+    """Scans the memory-mapped log file and aggregates the matched records.
+
+    The regular expression is matched directly against the mapped bytes of every line, so the line itself is never
+    copied into a new string. Only the matched groups are materialized and the log entry of every record is kept as
+    a (line start, line end) byte offset tuple into the mapped file.
+
+    Args:
+        mapped_file: the memory-mapped log file.
+        regular_exp: the regular expression to extract the relevant groups from every
+         line in the log file.
+        log_aggregator: the LogAggregator to which the matched records are fed.
+        start: byte offset of the first line to be scanned.
+        end: byte offset after the last line to be scanned, the end of the file by default.
+        invalid_records: optional list to which the lines not matching the regular expression are appended.
+
+    Returns:
+        A tuple of the number of lines which matched and did not match the regular expression.
+
+    Raises:
+        ValueError : if the timestamp or bytes transferred of a record can not be converted
+
+    """
+
+    num_valid_records = 0
+    num_invalid_records = 0
+
+    for line_start, line_end in iter_mapped_lines(mapped_file, start, end):
+
+        # match the regular expression against the line in the mapped file
+        match_object = regular_exp.match(mapped_file, line_start, line_end)
+
+        # If match is found, then aggregating the groups along with the log entry offsets else adding to invalid list
+        if match_object:
+            log_aggregator.update_record(*(match_object.groups() + ((line_start, line_end),)))
+            num_valid_records += 1
+        else:
+            if invalid_records is not None:
+                invalid_records.append(mapped_file[line_start:line_end])
+            num_invalid_records += 1
+
+    return num_valid_records, num_invalid_records
+
+
+def resolve_blocked_records(mapped_file=None, log_aggregator=None):
+
+    """Replaces the log entry offsets of the blocked records with the log entries read from the mapped file.
+
+    Args:
+        mapped_file: the memory-mapped log file.
+        log_aggregator: the LogAggregator with the log entries of the blocked records as byte offset tuples.
+
+    """
+
+    log_aggregator.blocked_records = [(host_name, epoch_seconds, sequence_number, mapped_file[line_start:line_end])
+                                      for host_name, epoch_seconds, sequence_number, (line_start, line_end)
+                                      in log_aggregator.blocked_records]
+
+
+def parse_log_file_mapped(input_file=None, regular_exp=None, log_aggregator=None, invalid_records=None):
+
+    """Parses and aggregates the memory-mapped NASA web server log file.
+
+    Args:
+        input_file: NASA web server log file.
+        regular_exp: the regular expression to extract the relevant groups from every
+         line in the log file.
+        log_aggregator: the LogAggregator to which the matched records are fed.
+        invalid_records: optional list to which the lines not matching the regular expression are appended.
+
+    Returns:
+        The log_aggregator with all the records of the log file aggregated, None if any one of the arguments are
+        missing.
+
+    Raises:
+        IOError: if the log file is missing at the given location or there is some problem
+        opening the log file.
+        ValueError : if the timestamp or bytes transferred of a record can not be converted
+
+    """
+
+    print "\nParsing the memory-mapped log file..."
+
+    # checks for the missing arguments
+    if input_file is None or regular_exp is None or log_aggregator is None:
+        return None
+
+    # an IOError or OSError opening or mapping the log file is left to the caller
+    mapped_file = open_mapped_file(input_file)
+
+    num_valid_records, num_invalid_records = 0, 0
+
+    if mapped_file is not None:
+
+        try:
+            num_valid_records, num_invalid_records = aggregate_mapped_lines(mapped_file, regular_exp, log_aggregator,
+                                                                            invalid_records=invalid_records)
+
+            # only the blocked log entries are copied out of the mapped file
+            resolve_blocked_records(mapped_file, log_aggregator)
+
+        finally:
+            mapped_file.close()
+
+    print "Log file parsing completed!!"
+
+    # printing the total number of records parsed, valid and invalid
+    print 'Total records : {} | Valid records  : {} | Invalid records : {}' \
+        .format((num_valid_records + num_invalid_records), num_valid_records, num_invalid_records)
+
+    return log_aggregator
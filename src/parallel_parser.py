@@ -0,0 +1,282 @@
+import os
+import multiprocessing
+
+from log_aggregator import LogAggregator
+from mmap_scanner import open_mapped_file, aggregate_mapped_lines
+from log_tokenizer import get_line_parser
+
+# number of byte ranges created for every worker process, so that the faster workers pick up the remaining ranges
+RANGES_PER_WORKER = 4
+
+
+def get_byte_ranges(input_file=None, num_ranges=0):
+
+    """Splits the log file into newline aligned byte ranges.
+
+    The file is first split into num_ranges ranges of equal size. The end of every range is then moved forward to
+    the end of the line it falls in, so that every line belongs to exactly one range.
+
+    Args:
+        input_file: NASA web server log file.
+        num_ranges: number of byte ranges required.
+
+    Returns:
+        A list of (start, end) byte offset tuples covering the complete file. Empty ranges are skipped.
+
+    Raises:
+        IOError: if the log file is missing at the given location or there is some problem
+        opening the log file.
+
+    """
+
+    if input_file is None or num_ranges == 0:
+        return None
+
+    file_size = os.path.getsize(input_file)
+    byte_ranges = list()
+
+    with open(input_file, 'rb') as log_file:
+
+        start = 0
+
+        for i in range(1, num_ranges + 1):
+
+            end = file_size * i / num_ranges
+
+            # move the end of the range to the end of the line it falls in
+            if 0 < end < file_size:
+                log_file.seek(end - 1)
+                log_file.readline()
+                end = log_file.tell()
+
+            if end > start:
+                byte_ranges.append((start, end))
+                start = end
+
+    return byte_ranges
+
+
+def iter_byte_range_lines(input_file=None, start=0, end=0):
+
+    """Reads the lines of the log file in the given newline aligned byte range.
+
+    Args:
+        input_file: NASA web server log file.
+        start: byte offset of the first line in the range.
+        end: byte offset after the last line in the range.
+
+    Yields:
+        Every line in the byte range without the new line character.
+
+    """
+
+    with open(input_file, 'rb') as log_file:
+
+        log_file.seek(start)
+        position = start
+
+        while position < end:
+
+            line = log_file.readline()
+
+            if not line:
+                break
+
+            position += len(line)
+
+            # removing the new line character from each line
+            yield line.strip('\n')
+
+
+def aggregate_byte_range(task=None):
+
+    """Parses one byte range of the log file and aggregates the matched records.
+
+    Runs in a worker process. The login failures are not detected here, as they depend on all the requests of a
+    host, but the failed login attempts of every host are counted to find the hosts to be checked later.
+
+    Args:
+        task: tuple of the log file, start and end byte offsets of the range, the regular expression, whether the
+         log file is to be memory-mapped instead of read line by line and the heavy hitters capacity of the
+         LogAggregator.
+
+    Returns:
+        A tuple of the LogAggregator with the partial aggregates of the byte range, the number of lines which matched
+        the regular expression and the list of lines which did not match it.
+
+    """
+
+    input_file, start, end, regular_exp, use_mmap, heavy_hitters_capacity = task
+
+    log_aggregator = LogAggregator(detect_login_failures=False, heavy_hitters_capacity=heavy_hitters_capacity)
+    num_valid_records = 0
+    invalid_records = list()
+
+    if use_mmap:
+
+        # every worker maps the complete file, the pages are shared through the page cache
+        mapped_file = open_mapped_file(input_file)
+
+        try:
+            num_valid_records, num_invalid_records = aggregate_mapped_lines(mapped_file, regular_exp, log_aggregator,
+                                                                            start=start, end=end,
+                                                                            invalid_records=invalid_records)
+        finally:
+            mapped_file.close()
+
+        return log_aggregator, num_valid_records, invalid_records
+
+    parse_log_line = get_line_parser(regular_exp)
+
+    for line in iter_byte_range_lines(input_file, start, end):
+
+        # extracting the groups of the regular expression from each line
+        groups = parse_log_line(line)
+
+        # If match is found, then aggregating the groups along with the log entry else adding to invalid list
+        if groups:
+            log_aggregator.update_record(*(groups + (line,)))
+            num_valid_records += 1
+        else:
+            invalid_records.append(line)
+
+    return log_aggregator, num_valid_records, invalid_records
+
+
+def collect_login_records(task=None):
+
+    """Collects the parsed records of the given hosts in one byte range of the log file.
+
+    Runs in a worker process. Only the lines starting with one of the host names are matched with the regular
+    expression, so the byte range is scanned much faster than in aggregate_byte_range.
+
+    Args:
+        task: tuple of the log file, start and end byte offsets of the range, the regular expression and the set of
+         host names to collect the records for.
+
+    Returns:
+        A list of (host name, timestamp, timezone, http request, http status code, log entry) tuples in the log file
+        order.
+
+    """
+
+    input_file, start, end, regular_exp, host_names = task
+
+    login_records = list()
+    parse_log_line = get_line_parser(regular_exp)
+
+    for line in iter_byte_range_lines(input_file, start, end):
+
+        # the host name is everything before the first space, skip the lines of all the other hosts
+        line_parts = line.split(None, 1)
+        if len(line_parts) == 0 or line_parts[0] not in host_names:
+            continue
+
+        groups = parse_log_line(line)
+
+        if groups:
+            host_name, timestamp, timezone, http_request, http_status_code, bytes_transferred = groups
+            login_records.append((host_name, timestamp, timezone, http_request, http_status_code, line))
+
+    return login_records
+
+
+def parse_log_file_parallel(input_file=None, regular_exp=None, num_workers=0, blocked_window_time=0,
+                            consecutive_failure_limit=0, login_failure_window=0, invalid_records=None,
+                            use_mmap=False, heavy_hitters_capacity=0):
+
+    """Parses and aggregates the NASA web server log file using a pool of worker processes.
+
+    The log file is split into newline aligned byte ranges, which are parsed by the worker processes into partial
+    aggregates (host visit counts, bandwidth per resource, per second visit histogram and failed login counts). The
+    partial aggregates are merged in the log file order. Only the hosts with at least consecutive_failure_limit failed
+    login attempts can be blocked, so their records are collected from all the byte ranges in a second parallel scan
+    and fed to the login failure detector in the log file order. The result is identical to aggregating the whole file
+    with a single LogAggregator.
+
+    Args:
+        input_file: NASA web server log file.
+        regular_exp: the regular expression to extract the relevant groups from every
+         line in the log file.
+        num_workers: number of worker processes.
+        blocked_window_time: blocked window time in minutes after consecutive login failures. E.g. 5 min attempts block
+        consecutive_failure_limit: threshold for number of consecutive login failures. E.g. 3 failures
+        login_failure_window: failure window time in seconds over which the consecutive failures occur. E.g. 20 seconds
+        invalid_records: optional list to which the lines not matching the regular expression are appended.
+        use_mmap: if True, the workers scan the memory-mapped log file instead of reading it line by line.
+        heavy_hitters_capacity: if not 0, the hosts and resources are approximately counted with at most this many
+         keys, see LogAggregator.
+
+    Returns:
+        The LogAggregator with all the records of the log file aggregated, None if any one of the arguments are
+        missing.
+
+    Raises:
+        IOError: if the log file is missing at the given location or there is some problem
+        opening the log file.
+        ValueError : if the timestamp or bytes transferred of a record can not be converted
+
+    """
+
+    print "\nParsing the log file with {} worker processes...".format(num_workers)
+
+    # checks for the missing arguments
+    if input_file is None or regular_exp is None or num_workers == 0:
+        return None
+
+    # an IOError or OSError opening the log file is left to the caller
+    byte_ranges = get_byte_ranges(input_file=input_file, num_ranges=num_workers * RANGES_PER_WORKER)
+
+    log_aggregator = LogAggregator(blocked_window_time=blocked_window_time,
+                                   consecutive_failure_limit=consecutive_failure_limit,
+                                   login_failure_window=login_failure_window,
+                                   heavy_hitters_capacity=heavy_hitters_capacity)
+    num_valid_records = 0
+    num_invalid_records = 0
+
+    pool = multiprocessing.Pool(processes=num_workers)
+
+    try:
+        # merge the partial aggregates of the byte ranges in the log file order
+        for partial_aggregator, partial_num_valid_records, partial_invalid_records in pool.imap(
+                aggregate_byte_range, [(input_file, start, end, regular_exp, use_mmap, heavy_hitters_capacity)
+                                       for start, end in byte_ranges]):
+
+            log_aggregator.merge(partial_aggregator)
+            num_valid_records += partial_num_valid_records
+            num_invalid_records += len(partial_invalid_records)
+
+            if invalid_records is not None:
+                invalid_records.extend(partial_invalid_records)
+
+        # hosts with at least the consecutive failure limit failed attempts, not necessarily in failure limit window
+        filtered_hosts = set(host_name for host_name, failure_count in log_aggregator.host_failure_counts.iteritems()
+                             if failure_count >= consecutive_failure_limit)
+
+        if len(filtered_hosts) > 0:
+
+            # feed all the records of the filtered hosts to the login failure detector in the log file order
+            for login_records in pool.imap(
+                    collect_login_records,
+                    [(input_file, start, end, regular_exp, filtered_hosts) for start, end in byte_ranges]):
+
+                for host_name, timestamp, timezone, http_request, http_status_code, log_entry in login_records:
+
+                    # skip the records with empty http_request field, like the other features
+                    if str(http_request).strip() == '':
+                        continue
+
+                    log_aggregator.update_login_state(host_name, log_aggregator.parse_timestamp(timestamp, timezone),
+                                                      http_status_code, log_entry)
+
+    finally:
+        pool.close()
+        pool.join()
+
+    print "Log file parsing completed!!"
+
+    # printing the total number of records parsed, valid and invalid
+    print 'Total records : {} | Valid records  : {} | Invalid records : {}' \
+        .format((num_valid_records + num_invalid_records), num_valid_records, num_invalid_records)
+
+    return log_aggregator
@@ -1,8 +1,47 @@
-import re
 import os
 import sys
 import time
+import cProfile
+import argparse
+import numpy as np
 import pandas as pd
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+from pandas.api.types import union_categoricals
+
+from log_aggregator import LogAggregator, LoginFailureDetector, get_top_n_busiest_windows, \
+    get_top_n_busiest_windows_by_length, format_timestamp, format_busiest_periods_by_window
+from parallel_parser import parse_log_file_parallel
+from mmap_scanner import parse_log_file_mapped
+from log_follower import run_follow_mode
+from log_cache import get_cache_key, load_data_frame, save_data_frame
+from log_checkpoint import get_complete_lines_end, load_checkpoint, save_checkpoint
+from log_input import expand_input_files, is_single_plain_file, iter_line_chunks
+from timestamp_decoder import TimestampDecoder
+from stage_metrics import StageMetrics
+from rollup_index import RollupIndexBuilder
+from cardinality_sketches import SketchStatistics
+from bad_records import BadRecordsWriter
+from shard_aggregates import ShardAggregator, save_partial_aggregates, merge_partial_aggregates
+from log_tokenizer import LOG_LINE_REGEX, get_line_parser
+
+# approximate number of bytes read from the log file for every streamed chunk
+DEFAULT_CHUNK_SIZE = 32 * 1024 * 1024
+
+# number of records joined and written to the output file at a time, and the size of the output file buffer in bytes
+WRITE_BATCH_LINES = 8192
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# column headers of the records extracted by the regular expression followed by the complete log entry
+COLUMN_HEADERS = ['host_name', 'timestamp', 'timezone', 'http_request', 'http_status_code',
+                  'bytes_transferred', 'log_entry']
+
+# column headers of the record batches yielded by parse_log_file_chunks, with the byte offset and length of every log
+# entry
+BATCH_COLUMN_HEADERS = COLUMN_HEADERS + ['log_offset', 'log_length']
+
+# columns of the preprocessed data frame stored as categorical codes into their sorted distinct values
+CATEGORICAL_COLUMNS = ['host_name', 'timezone', 'http_status_code', 'http_method', 'uri']
 
 
 def parse_log_file(input_file=None, regular_exp=None):
@@ -39,65 +78,401 @@ def parse_log_file(input_file=None, regular_exp=None):
     valid_records = list()
     invalid_records = list()
 
-    try:
-        # open the log file in read mode
-        log_file = open(input_file, 'r')
+    # the tokenizer of the default regular expression, falling back to the regular expression
+    parse_log_line = get_line_parser(regular_exp)
+
+    # open the log file in read mode, an IOError opening or reading it is left to the caller
+    with open(input_file, 'r') as log_file:
 
-        # reading log file line by line
-        for line in log_file.readlines():
+        # reading log file line by line without loading the complete file in memory
+        for line in log_file:
 
             # removing the new line character from each line
             line = line.strip('\n')
 
-            # creating a match object for each line using the regular expression
-            match_object = re.match(regular_exp, line)
+            # extracting the groups of the regular expression from each line
+            groups = parse_log_line(line)
 
             # If match is found, then adding to valid list else invalid list
-            if match_object:
+            if groups:
                 # adding the found groups along with the log entry in the matched groups tuple
-                valid_records.append(match_object.groups() + (line,))
+                valid_records.append(groups + (line,))
             else:
                 invalid_records.append(line)
 
-    except IOError as e:
+    print "Log file parsing completed!!"
 
-        # print the error message if issues in accessing log file and terminate the program.
-        print "Error opening the log file!!"
-        print "I/O error({0}): {1}".format(e.errno, e.strerror)
-        sys.exit()
+    # printing the total number of records parsed, valid and invalid
+    print 'Total records : {} | Valid records  : {} | Invalid records : {}' \
+        .format((len(valid_records) + len(invalid_records)),
+                len(valid_records), len(invalid_records))
 
-    else:
+    # returning the two lists
+    return valid_records, invalid_records
+
+
+def parse_log_file_chunks(input_file=None, regular_exp=None, chunk_size=DEFAULT_CHUNK_SIZE, invalid_records=None,
+                          start_offset=0, end_offset=None, keep_log_entries=True):
+
+    """Parses the NASA web server log file in bounded size chunks.
+
+    Streams the input file in chunks of approximately chunk_size bytes (always ending on a line boundary) and
+    yields the parsed lines of every chunk as a columnar batch. Only one chunk of raw lines is held in memory at
+    a time, so the memory used for parsing stays flat irrespective of the size of the log file.
+
+    Args:
+        input_file: NASA web server log file.
+        regular_exp: the regular expression to extract the relevant groups from every
+         line in the log file.
+        chunk_size: approximate number of bytes to be read from the log file for every batch.
+        invalid_records: optional list to which the lines not matching the regular expression are appended, or a
+         BadRecordsWriter streaming them to the bad records file.
+        start_offset: byte offset of the first line to be parsed, the start of the file by default.
+        end_offset: byte offset after the last line to be parsed, the end of the file by default.
+        keep_log_entries: whether the batches keep the complete log entries, else only their byte offsets and
+         lengths, from which they can be read again with read_log_entries.
+
+    Yields:
+        A dictionary with the column headers as keys and the list of values of the matched lines in the chunk
+        as values, plus the byte offsets and lengths of the matched lines in the log file as 'log_offset' and
+        'log_length'. Example:
+
+            {'host_name': ['199.72.81.55', ...], 'timestamp': ['01/Jul/1995:00:00:01', ...], ...}
+
+    Raises:
+        IOError: if the log file is missing at the given location or there is some problem
+        opening the log file.
+
+    """
+
+    print "\nParsing the log file..."
+
+    # checks for the missing arguments
+    if input_file is None or regular_exp is None:
+        return
+
+    num_valid_records = 0
+    num_invalid_records = 0
+
+    # the tokenizer of the default regular expression, falling back to the regular expression
+    parse_log_line = get_line_parser(regular_exp)
+
+    # open the log file in read mode, an IOError opening or reading it is left to the caller
+    log_file = open(input_file, 'r')
+
+    try:
+        log_file.seek(start_offset)
+        position = start_offset
+
+        while end_offset is None or position < end_offset:
+
+            # read the complete lines up to approximately chunk_size bytes
+            lines = log_file.readlines(chunk_size)
+
+            if not lines:
+                break
+
+            # one list per column of the parsed records in the current chunk, along with the byte offset and length
+            # of every line
+            batch = dict((column, list()) for column in BATCH_COLUMN_HEADERS
+                         if keep_log_entries or column != 'log_entry')
+
+            for line in lines:
+
+                # drop the lines beyond the end offset, e.g. the lines appended to the file while parsing it
+                if end_offset is not None and position >= end_offset:
+                    break
+
+                line_offset = position
+                position += len(line)
+
+                # removing the new line character from each line
+                line = line.strip('\n')
+
+                # extracting the groups of the regular expression from each line
+                groups = parse_log_line(line)
+
+                # If match is found, then adding the groups to the batch columns else to invalid records
+                if groups:
+                    for column, value in zip(COLUMN_HEADERS, groups):
+                        batch[column].append(value)
+                    if keep_log_entries:
+                        batch['log_entry'].append(line)
+                    batch['log_offset'].append(line_offset)
+                    batch['log_length'].append(len(line))
+                    num_valid_records += 1
+                else:
+                    if invalid_records is not None:
+                        invalid_records.append(line)
+                    num_invalid_records += 1
+
+            # release the raw lines of the chunk before handing over the batch
+            del lines
+
+            yield batch
+
+    finally:
         # close the log file after parsing is completed.
         log_file.close()
 
-        print "Log file parsing completed!!"
+    print "Log file parsing completed!!"
+
+    # printing the total number of records parsed, valid and invalid
+    print 'Total records : {} | Valid records  : {} | Invalid records : {}' \
+        .format((num_valid_records + num_invalid_records), num_valid_records, num_invalid_records)
+
+
+def parse_log_files_chunks(input_files=None, regular_exp=None, chunk_size=DEFAULT_CHUNK_SIZE, invalid_records=None):
+
+    """Parses the plain or compressed log files one after the other in bounded size chunks, as one log.
+
+    Works like parse_log_file_chunks, but the lines are read and decompressed ahead of the parsing by a background
+    thread (see iter_line_chunks), and the batches keep the complete log entries instead of their byte offsets, as
+    the compressed log files can not be read at an offset.
+
+    Args:
+        input_files: list of the plain or gzip, bz2 or xz compressed log files, oldest first.
+        regular_exp: the regular expression to extract the relevant groups from every
+         line in the log file.
+        chunk_size: approximate number of bytes of lines to be parsed for every batch.
+        invalid_records: optional list to which the lines not matching the regular expression are appended, or a
+         BadRecordsWriter streaming them to the bad records file.
+
+    Yields:
+        A dictionary with the column headers as keys and the list of values of the matched lines in the chunk
+        as values.
+
+    Raises:
+        IOError: if a log file is missing or there is some problem reading or decompressing it.
+
+    """
+
+    # checks for the missing arguments
+    if input_files is None or regular_exp is None:
+        return
+
+    print "\nParsing {} log files...".format(len(input_files))
+
+    num_valid_records = 0
+    num_invalid_records = 0
+
+    # the tokenizer of the default regular expression, falling back to the regular expression
+    parse_log_line = get_line_parser(regular_exp)
+
+    # an IOError reading or decompressing a log file is left to the caller
+    for input_file, lines in iter_line_chunks(input_files=input_files, chunk_size=chunk_size):
+
+        # one list per column of the parsed records in the current chunk
+        batch = dict((column, list()) for column in COLUMN_HEADERS)
+
+        for line in lines:
+
+            # removing the new line character from each line
+            line = line.strip('\n')
+
+            # extracting the groups of the regular expression from each line
+            groups = parse_log_line(line)
+
+            # If match is found, then adding the groups to the batch columns else to invalid records
+            if groups:
+                for column, value in zip(COLUMN_HEADERS, groups + (line,)):
+                    batch[column].append(value)
+                num_valid_records += 1
+            else:
+                if invalid_records is not None:
+                    invalid_records.append(line)
+                num_invalid_records += 1
+
+        # release the raw lines of the chunk before handing over the batch
+        del lines
+
+        yield batch
+
+    print "Log file parsing completed!!"
+
+    # printing the total number of records parsed, valid and invalid
+    print 'Total records : {} | Valid records  : {} | Invalid records : {}' \
+        .format((num_valid_records + num_invalid_records), num_valid_records, num_invalid_records)
+
+
+def decode_timestamp_column(timestamps=None, timezones=None):
+
+    """Converts the timestamp and timezone columns of the parsed log records to UTC epoch seconds.
+
+    The distinct timestamps and timezones are found with pandas factorize and only those are decoded by a
+    TimestampDecoder, the decoded values are then spread back to all the records with numpy indexing.
+
+    Args:
+        timestamps: sequence of the timestamp strings without the timezone. E.g. 01/Jul/1995:00:00:01
+        timezones: sequence of the timezone strings of the timestamps. E.g. -0400
+
+    Returns:
+        A numpy int64 array with the UTC epoch seconds of the timestamps.
+
+    Raises:
+        ValueError: if a timestamp does not match the log file timestamp format or a timezone is invalid.
+
+    """
+
+    timestamp_decoder = TimestampDecoder()
+
+    timestamp_codes, distinct_timestamps = pd.factorize(np.asarray(timestamps, dtype=object))
+    timezone_codes, distinct_timezones = pd.factorize(np.asarray(timezones, dtype=object))
+
+    # the missing values are factorized as -1 and can not be decoded
+    if len(timestamp_codes) > 0 and (timestamp_codes.min() < 0 or timezone_codes.min() < 0):
+        raise ValueError('missing timestamp or timezone')
+
+    local_epoch_seconds = np.array([timestamp_decoder.decode_local(timestamp) for timestamp in distinct_timestamps],
+                                   dtype=np.int64)
+    timezone_offsets = np.array([timestamp_decoder.get_timezone_offset(timezone) for timezone in distinct_timezones],
+                                dtype=np.int64)
+
+    return local_epoch_seconds[timestamp_codes] - timezone_offsets[timezone_codes]
+
+
+def split_request_column(http_requests=None):
+
+    """Splits the http request column into the http method and uri categorical columns.
+
+    The same requests repeat a lot in the log file, so the distinct requests are found with pandas factorize and
+    only those are split, once each. The http method and uri of every distinct request are encoded into sorted
+    categories and spread back to all the records with numpy indexing.
+
+    Args:
+        http_requests: sequence of the http request strings. E.g. GET /history/apollo/ HTTP/1.0
+
+    Returns:
+        A tuple of the boolean numpy array marking the non empty requests, and the http method and uri pandas
+        Categorical objects of the non empty requests. The http method is empty if the request has a single part,
+        which is taken as the uri.
+
+    """
+
+    request_codes, distinct_requests = pd.factorize(np.asarray(http_requests, dtype=object))
+
+    distinct_methods, distinct_uris = list(), list()
+
+    for http_request in distinct_requests:
+        request_parts = str(http_request).split()
+        distinct_methods.append(request_parts[0] if len(request_parts) > 1 else '')
+        distinct_uris.append(request_parts[1] if len(request_parts) > 1 else
+                             request_parts[0] if len(request_parts) == 1 else None)
+
+    # the requests with only whitespace have no parts
+    non_empty_requests = np.array([uri is not None for uri in distinct_uris], dtype=bool)[request_codes]
+    request_codes = request_codes[non_empty_requests]
+
+    request_columns = list()
+
+    for distinct_values in distinct_methods, distinct_uris:
+        value_codes, categories = pd.factorize(np.asarray(distinct_values, dtype=object), sort=True)
+        request_columns.append(pd.Categorical.from_codes(value_codes[request_codes], categories))
+
+    return non_empty_requests, request_columns[0], request_columns[1]
+
+
+def preprocess_data_frame(df_data=None):
+
+    """Preprocesses the data frame created from the parsed log records.
+
+    Updates the missing values, assign data types to columns and formats the column values. It also generates
+    additional columns from existing columns which will be required for analysis.
+
+    The columns are stored compactly: the host names, timezones, status codes, http methods and uris as categorical
+    codes into their sorted distinct values, the bytes transferred as int64 and the timestamps as datetime64. If the
+    byte offsets of the log entries are given, the log entries are kept only as the byte offset and length of their
+    line in the log file. The http request column is dropped once the http method and uri are extracted.
+
+    Args:
+        df_data: the data frame with the parsed log records and the column headers assigned.
+
+    Returns:
+        The preprocessed data frame with all the required columns.
+
+    """
+
+    # updating the '-' bytes transferred to 0 and changing column type to int64
+    df_data['bytes_transferred'].replace('-', '0', inplace=True)
+    df_data['bytes_transferred'] = df_data['bytes_transferred'].astype('int64')
+
+    # change the timestamp to datetime format, as the UTC instant of the timestamp in its timezone
+    df_data['timestamp'] = pd.to_datetime(decode_timestamp_column(df_data['timestamp'], df_data['timezone']), unit='s')
+
+    # split every distinct http request once into the http method and uri columns
+    non_empty_requests, http_methods, uris = split_request_column(df_data['http_request'])
+
+    # remove all the rows with empty http_request field
+    df_data = df_data[non_empty_requests].copy()
+    del df_data['http_request']
+
+    df_data['http_method'] = http_methods
+    df_data['uri'] = uris
+
+    # keep the log entries only as the byte offsets and lengths of their lines in the log file
+    if 'log_offset' in df_data.columns:
+        df_data['log_offset'] = df_data['log_offset'].astype('int64')
+        df_data['log_length'] = df_data['log_length'].astype('int32')
+        if 'log_entry' in df_data.columns:
+            del df_data['log_entry']
+
+    # dictionary encode the repetitive string columns
+    for column in CATEGORICAL_COLUMNS:
+        df_data[column] = pd.Categorical(df_data[column])
+
+    return df_data
+
+
+def concat_data_frames(df_chunks=None):
 
-        # printing the total number of records parsed, valid and invalid
-        print 'Total records : {} | Valid records  : {} | Invalid records : {}' \
-            .format((len(valid_records) + len(invalid_records)),
-                    len(valid_records), len(invalid_records))
+    """Concatenates the preprocessed data frames of the streamed record batches.
 
-        # returning the two lists
-        return valid_records, invalid_records
+    The categorical columns of the data frames have different categories, which pd.concat would turn back into
+    object columns. Their categories are therefore merged with union_categoricals and kept sorted.
 
+    Args:
+        df_chunks: non empty list of the data frames returned by preprocess_data_frame.
+
+    Returns:
+        The data frame with the rows of all the data frames in order.
+
+    """
+
+    columns = df_chunks[0].columns
+    df_columns = dict()
+
+    for column in columns:
+        if column in CATEGORICAL_COLUMNS:
+            df_columns[column] = union_categoricals([df_chunk[column] for df_chunk in df_chunks], sort_categories=True)
+        else:
+            df_columns[column] = np.concatenate([df_chunk[column].values for df_chunk in df_chunks])
+
+    return pd.DataFrame(df_columns, columns=columns)
 
-def get_data_frame(input_records=None):
 
-    """Creates a pandas data frame from the input records list.
+def get_data_frame(input_records=None, input_chunks=None):
+
+    """Creates a pandas data frame from the input records list or the streamed record batches.
 
     Returns the pandas data frame for the list of successfully parsed log records.
     Assigns the column headers, updates the missing values, assign data types to
     columns and formats the column values. It also generates additional columns from
     existing columns which will be required for analysis.
 
+    If the record batches from parse_log_file_chunks are passed instead of the records list, every batch is
+    preprocessed on its own as it is streamed and the resulting frames are concatenated, so the raw lines are
+    never held in memory all at once.
+
     Args:
         input_records: a list of all the successfully parsed log records from the NASA web
         server log file.
+        input_chunks: an iterable of columnar record batches as yielded by parse_log_file_chunks.
 
     Returns:
         A pandas data frame with all the required columns from the parsed log records.
 
     Raises:
+        IOError: if there is some problem reading the log file while the record batches are streamed.
         ValueError : if the column data type conversion is not a valid operation
         AssertionError : if the number of columns passed is different than the number of columns
         in the log data
@@ -105,28 +480,28 @@ def get_data_frame(input_records=None):
 
     """
 
-    # define the column headers for pandas data frame
-    column_headers = ['host_name', 'timestamp', 'timezone', 'http_request', 'http_status_code',
-                      'bytes_transferred', 'log_entry']
     try:
 
-        # create the data frame from the input records with assigned column headers
-        df_data = pd.DataFrame(input_records, columns=column_headers)
+        if input_chunks is not None:
+
+            # create and preprocess a data frame for every streamed batch and combine them once all are consumed
+            df_chunks = [preprocess_data_frame(pd.DataFrame(batch, columns=[column for column in BATCH_COLUMN_HEADERS
+                                                                            if column in batch]))
+                         for batch in input_chunks]
+
+            if len(df_chunks) == 0:
+                df_chunks = [preprocess_data_frame(pd.DataFrame(columns=BATCH_COLUMN_HEADERS))]
 
-        # updating the '-' bytes transferred to 0 and changing column type to float
-        df_data['bytes_transferred'].replace('-', '0', inplace=True)
-        df_data['bytes_transferred'] = df_data['bytes_transferred'].astype('float64')
+            df_data = concat_data_frames(df_chunks)
 
-        # change the timestamp to datetime format
-        df_data['timestamp'] = pd.to_datetime(df_data['timestamp'], format='%d/%b/%Y:%H:%M:%S')
+        else:
 
-        # remove all the rows with empty http_request field
-        df_data['http_request'] = [str(x).strip() for x in df_data['http_request']]
-        df_data = df_data[df_data['http_request'] != '']
+            # create the data frame from the input records with assigned column headers
+            df_data = preprocess_data_frame(pd.DataFrame(input_records, columns=COLUMN_HEADERS))
 
-        # create http method and uri columns from the http request column
-        df_data['http_method'] = [x.split()[0] if len(x.split()) > 1 else '' for x in df_data['http_request']]
-        df_data['uri'] = [x.split()[1] if len(x.split()) > 1 else x.split()[0] for x in df_data['http_request']]
+    except IOError:
+        # the error reading the log file while the batches are streamed is left to the caller
+        raise
 
     except ValueError:
         # print error message if the column data type conversion is invalid and exit the program
@@ -148,12 +523,44 @@ def get_data_frame(input_records=None):
         return df_data
 
 
+def get_top_n_values(n=0, input_series=None):
+
+    """Selects the top n values of a series along with their index labels.
+
+    Uses numpy partial selection to find the n-th largest value and keeps only the values greater than or equal to
+    it, so only the selected values (including the ones tied with the n-th largest) are sorted instead of the
+    complete series.
+
+    Args:
+        n: number of top values required.
+        input_series: the pandas series with the keys as index and the values to be compared
+
+    Returns:
+        A list of at most n (index label, value) tuples in descending order of the values. Ties are listed in the
+        lexicographical order of the index labels.
+
+    """
+
+    # check if input parameters are valid
+    if n == 0 or input_series is None:
+        return list()
+
+    values = input_series.values
+
+    # keep only the values greater than or equal to the n-th largest value
+    if len(values) > n:
+        nth_largest_value = np.partition(values, len(values) - n)[len(values) - n]
+        input_series = input_series[values >= nth_largest_value]
+
+    return sorted(zip(input_series.index, input_series.values), key=lambda item: (-item[1], item[0]))[:n]
+
+
 def get_top_n_active_hosts(n=0, input_data_frame=None):
 
     """Fetches the top n active hosts/IP Addresses.
 
     Fetches the top n most active hosts/IP addresses in descending order and how many times they
-    have accessed any part of the site.
+    have accessed any part of the site. Ties are listed in the lexicographical order of the hosts.
 
     Args:
         n: number of top active hosts required.
@@ -173,17 +580,13 @@ def get_top_n_active_hosts(n=0, input_data_frame=None):
     if n == 0 or input_data_frame is None:
         return None
 
-    # get the data frame with host name as index and value counts i.e. group by host names and get frequency count
-    host_visit_counts = input_data_frame['host_name'].value_counts(dropna=True)
+    # get the series with host name as index and value counts i.e. group by host names and get frequency count,
+    # without sorting all the distinct hosts
+    host_visit_counts = input_data_frame['host_name'].value_counts(sort=False, dropna=True)
 
-    # if the number of distinct hosts available is less than given n then
-    # update n to the number of distinct hosts
-    if len(host_visit_counts) < n:
-        n = len(host_visit_counts)
-
-    # iterate through the top n entries of the data frame to get top n active hosts and append
-    # results to a list.
-    top_n_active_hosts = [str(host_visit_counts.index[i]) + ',' + str(host_visit_counts[i]) for i in range(n)]
+    # iterate through the top n entries to get top n active hosts and append results to a list.
+    top_n_active_hosts = [str(host_name) + ',' + str(visit_count)
+                          for host_name, visit_count in get_top_n_values(n=n, input_series=host_visit_counts)]
 
     # return the list with top n active hosts
     return top_n_active_hosts
@@ -195,7 +598,8 @@ def get_top_n_resources_max_bandwidth(n=0, input_data_frame=None):
 
     Fetches the top n resources from the log records data frame based on the
     bandwidth consumption. Bandwidth consumption is extrapolated from bytes sent
-    over the network and the frequency by which they were accessed.
+    over the network and the frequency by which they were accessed. Ties are listed
+    in the lexicographical order of the resources.
 
     Args:
         n: number of top resources based on bandwidth consumed.
@@ -216,16 +620,11 @@ def get_top_n_resources_max_bandwidth(n=0, input_data_frame=None):
         return
 
     # create a grouped object based on uri as key and summing over the values in the bytes transferred column to get
-    # the total bandwidth consumed.
-    grouped_object = input_data_frame.groupby(['uri'], as_index=True)['bytes_transferred'].sum()
-
-    # get the data frame with uri and total bandwidth consumed as columns sorted in descending order by bandwidth
-    df_resources_bandwidth = pd.DataFrame({'uri': grouped_object.index,
-                                           'bandwidth_used': grouped_object.values}).sort_values(['bandwidth_used'],
-                                                                                                 ascending=False)
+    # the total bandwidth consumed, without sorting the group keys.
+    grouped_object = input_data_frame.groupby(['uri'], as_index=True, sort=False)['bytes_transferred'].sum()
 
-    # return the top n rows of the uri column of the data frame
-    return df_resources_bandwidth['uri'][0:n]
+    # return the top n resources by bandwidth consumed
+    return [uri for uri, bandwidth_used in get_top_n_values(n=n, input_series=grouped_object)]
 
 
 def get_top_n_busiest_periods(n=0, period_in_minutes=0, input_data_frame=None):
@@ -235,10 +634,9 @@ def get_top_n_busiest_periods(n=0, period_in_minutes=0, input_data_frame=None):
     Fetches the top n busiest (i.e. most frequently visited) from the log records data frame.
     The period window starts from any time and not when an event occurs.
 
-    Used pandas dataframe, rolling window sum function to get the number of visits during that window.
-    Shift function allows to move the rolling sum to start of the window instead of end (by default). The shift function
-    moves up all the records by the sliding window size resulting in NaN values for the last records outside the
-    sliding window size. Updated all the resulting NaN values with their respective sums in a separate loop.
+    The number of visits per second are counted with pandas value_counts and the window starts are swept by
+    get_top_n_busiest_windows, which works on the sorted distinct visit times only. Ties are listed in the
+    lexicographical order of the formatted window start.
 
     Args:
         n: number of top busiest periods required.
@@ -262,58 +660,63 @@ def get_top_n_busiest_periods(n=0, period_in_minutes=0, input_data_frame=None):
     if n == 0 or period_in_minutes == 0 or input_data_frame is None:
         return
 
-    # get the data frame with host names and value counts i.e. group by host names and get frequency count
-    df_timestamp_visit_count = input_data_frame['timestamp'].value_counts().to_frame(name='num_visits')
+    # get the number of visits for every distinct timestamp in epoch seconds
+    timestamp_visit_counts = input_data_frame['timestamp'].value_counts()
+    timestamp_visit_counts = dict(zip((timestamp_visit_counts.index.values.astype('int64') // 10 ** 9).tolist(),
+                                      timestamp_visit_counts.values.tolist()))
+
+    # the busiest periods are listed in the timezone of the first record
+    timezone = input_data_frame['timezone'].iloc[0]
 
-    # get the minimum timestamp and maximum timestamp of the log entries and generate a index range to reindex the data
-    # frame to get the window start times other than the event occurrences and make it continuous.
-    min_timestamp_value = df_timestamp_visit_count.index.min(axis=0)
-    max_timestamp_value = df_timestamp_visit_count.index.max(axis=0)
+    # get the top n window starts along with the number of visits in the window
+    busiest_windows = get_top_n_busiest_windows(n=n, window_seconds=period_in_minutes * 60,
+                                                timestamp_visit_counts=timestamp_visit_counts, timezone=timezone)
 
-    new_index_range = pd.date_range(start=min_timestamp_value, end=max_timestamp_value, freq='S')
+    # list of top n busiest periods
+    busiest_periods = [format_timestamp(window_start, timezone) + ',' + str(num_visits_in_window)
+                       for window_start, num_visits_in_window in busiest_windows]
 
-    # reindex the dataframe based on new index range and fill the default number of visits value for missing
-    # timestamps as zero.
-    df_timestamp_visit_count = df_timestamp_visit_count.reindex(new_index_range, fill_value=0)
+    # returns the top busiest periods in descending order
+    return busiest_periods
 
-    # get the sliding window size in seconds
-    sliding_window_size = period_in_minutes * 60
 
-    # if the range of timestamps is greater than sliding window then update the sliding window size to
-    # the maximum range length.
-    if len(new_index_range) < sliding_window_size:
-        sliding_window_size = len(new_index_range)
+def get_top_n_busiest_periods_by_window(n=0, periods_in_minutes=None, input_data_frame=None):
 
-    # get the rolling sum for the sliding window period and add it as new column to the existing dataframe.
-    df_timestamp_visit_count['num_visits_in_window'] = df_timestamp_visit_count.rolling(
-        window=sliding_window_size).sum().shift(-(sliding_window_size - 1))
+    """Fetches the n busiest periods of every period window in one sweep.
 
-    # Update the records with NaN values due to shift operation.
-    for i in range(1, sliding_window_size):
-        df_timestamp_visit_count.set_value(df_timestamp_visit_count.index[len(df_timestamp_visit_count) + i -
-                                                                          sliding_window_size], 'num_visits_in_window',
-                                           sum(df_timestamp_visit_count['num_visits'][i - sliding_window_size:]))
+    The number of visits per second are counted once, and the window starts of all the period windows are swept by
+    get_top_n_busiest_windows_by_length over the same sorted visit times and cumulative visits, so several period
+    windows cost about the same as one.
 
-    # changing the data type of number of visits column to integer type
-    df_timestamp_visit_count['num_visits_in_window'] = df_timestamp_visit_count['num_visits_in_window'].astype('int64')
+    Args:
+        n: number of top busiest periods required for every period window.
+        periods_in_minutes: list of the period windows in minutes. E.g. [1, 5, 60]
+        input_data_frame: the data frame with the server log data
 
-    # extracting the timezone from the timezone column. Assuming all logs are from same timezone
-    timezone = list(set(input_data_frame['timezone']))[0]
+    Returns:
+        An ordered dictionary with the period window in minutes as key and the list of its top n busiest periods as
+        value, like get_top_n_busiest_periods. Example:
 
-    # sorting the dataframe in descending order based on the number of visits in the period window.
-    df_timestamp_visit_count.sort_values('num_visits_in_window', ascending=False, inplace=True)
+            OrderedDict([(1, ['01/Jul/1995:00:00:01 -0400,12', ...]), (5, [...]), (60, [...])])
 
-    # if the number of timestamps in the dataframe is less than n, update the n to length of dataframe.
-    if len(df_timestamp_visit_count) < n:
-        n = len(df_timestamp_visit_count)
+    """
 
-    # list of top n busiest periods
-    busiest_periods = [pd.to_datetime(df_timestamp_visit_count.index[i]).strftime('%d/%b/%Y:%H:%M:%S') +
-                       ' ' + str(timezone) + ',' +
-                       str(df_timestamp_visit_count['num_visits_in_window'][i]) for i in range(n)]
+    # check if input parameters are valid
+    if input_data_frame is None or len(input_data_frame) == 0:
+        return
 
-    # returns the top busiest periods in descending order
-    return busiest_periods
+    # get the number of visits for every distinct timestamp in epoch seconds
+    timestamp_visit_counts = input_data_frame['timestamp'].value_counts()
+    timestamp_visit_counts = dict(zip((timestamp_visit_counts.index.values.astype('int64') // 10 ** 9).tolist(),
+                                      timestamp_visit_counts.values.tolist()))
+
+    # get the top n window starts of every period window, listed in the timezone of the first record
+    timezone = input_data_frame['timezone'].iloc[0]
+    busiest_windows_by_length = get_top_n_busiest_windows_by_length(
+        n=n, window_lengths=[period * 60 for period in periods_in_minutes],
+        timestamp_visit_counts=timestamp_visit_counts, timezone=timezone)
+
+    return format_busiest_periods_by_window(busiest_windows_by_length, timezone=timezone)
 
 
 def get_host_with_n_login_failures(n=0, input_data_frame=None):
@@ -349,48 +752,69 @@ def get_host_with_n_login_failures(n=0, input_data_frame=None):
     return hosts
 
 
-def check_consecutive_login_failures(input_data_frame=None, consecutive_failure_limit=0, login_failure_window=0):
-
-    """Checks for consecutive login failure attempts
+def read_log_entries(input_file=None, log_offsets=None, log_lengths=None):
 
-    Takes a sliced dataframe of size equal to consecutive_failure_limit and checks if the rows in dataframe meets all
-    the consecutive login failure attempts condition. If yes, then returns True else False
+    """Reads the log entries at the given byte offsets of the log file.
 
     Args:
-        consecutive_failure_limit: threshold for number of consecutive login failures. E.g. 3 failures
-        login_failure_window: failure window time in seconds over which the consecutive failures occur. E.g. 20 seconds
-        input_data_frame: the sliced data frame with number of rows = consecutive_failure_limit i.e. 3
+        input_file: NASA web server log file.
+        log_offsets: byte offsets of the log entries in the log file.
+        log_lengths: lengths of the log entries in bytes, without the new line character.
 
     Returns:
-        True, if all the consecutive login failure conditions are met else False.
+        A list with the log entries in the order of the byte offsets given.
+
+    Raises:
+        IOError: if the log file is missing at the given location or there is some problem
+        reading the log file.
 
     """
 
-    # check if length of input dataframe is not equal to consecutive_failure_limit
-    if len(input_data_frame) != consecutive_failure_limit:
-        return False
+    log_entries = list()
+
+    with open(input_file, 'rb') as log_file:
+        for log_offset, log_length in zip(log_offsets, log_lengths):
+            log_file.seek(log_offset)
+            log_entries.append(log_file.read(log_length))
+
+    return log_entries
+
+
+def resolve_blocked_records(input_file=None, log_aggregator=None):
+
+    """Replaces the log entry offsets of the blocked records of the aggregator with the log entries read from the log
+    file.
+
+    The log entries of the records aggregated from batches without them are (byte offset, length) tuples, only the
+    blocked ones are read from the log file. The log entries already read, e.g. the ones of a checkpoint, are kept.
+
+    Args:
+        input_file: NASA web server log file.
+        log_aggregator: the LogAggregator with the blocked records.
 
-    # check if any of the record is not with http status code 401
-    df_failed_attempts = input_data_frame[input_data_frame['http_status_code'] == '401']
+    Raises:
+        IOError: if the log file is missing at the given location or there is some problem
+        reading the log file.
 
-    if len(df_failed_attempts) < consecutive_failure_limit:
-        return False
+    """
 
-    # get the time window for 3 failure attempts and check if within login_failure_window.
-    # If yes, continue else return false
-    lower_bound = df_failed_attempts['timestamp'].iloc[0]
-    upper_bound = df_failed_attempts['timestamp'].iloc[consecutive_failure_limit-1]
+    unresolved_rows = [row for row, blocked_record in enumerate(log_aggregator.blocked_records)
+                       if isinstance(blocked_record[3], tuple)]
 
-    window_gap = pd.Timedelta(upper_bound - lower_bound).seconds
+    if len(unresolved_rows) == 0:
+        return
 
-    if window_gap < 0 or window_gap >= login_failure_window:
-        return False
+    log_entries = read_log_entries(input_file=input_file,
+                                   log_offsets=[log_aggregator.blocked_records[row][3][0] for row in unresolved_rows],
+                                   log_lengths=[log_aggregator.blocked_records[row][3][1] for row in unresolved_rows])
 
-    return True
+    for row, log_entry in zip(unresolved_rows, log_entries):
+        host_name, epoch_seconds, sequence_number, log_offset = log_aggregator.blocked_records[row]
+        log_aggregator.blocked_records[row] = (host_name, epoch_seconds, sequence_number, log_entry)
 
 
 def get_login_failure_blocked_records(blocked_window_time=0, consecutive_failure_limit=0,
-                                      login_failure_window=0, input_data_frame=None):
+                                      login_failure_window=0, input_data_frame=None, input_file=None):
 
     """Retrieves the potential blocked records in case of consecutive login failures
 
@@ -399,11 +823,17 @@ def get_login_failure_blocked_records(blocked_window_time=0, consecutive_failure
     same host/IP Address within defined blocked window time (in minutes) is recorded. If a login attempt succeeds
     during login failure window then the failed login counter and login failure window gets reset.
 
+    The attempts are sorted once by host name and timestamp. The windows of consecutive failures are found with
+    vectorized numpy operations to skip the hosts which are never blocked, and the attempts of the remaining hosts
+    are checked in one linear pass of the LoginFailureDetector state machine.
+
     Args:
         blocked_window_time: blocked window time in minutes after consecutive login failures. E.g. 5 min attempts block
         consecutive_failure_limit: threshold for number of consecutive login failures. E.g. 3 failures
         login_failure_window: failure window time in seconds over which the consecutive failures occur. E.g. 20 seconds
         input_data_frame: the data frame with the server log data
+        input_file: NASA web server log file, from which the log entries are read if the data frame has only their
+         byte offsets.
 
     Returns:
         A list with original log entries of all the potential blocked attempts within the blocked window made after the
@@ -427,75 +857,67 @@ def get_login_failure_blocked_records(blocked_window_time=0, consecutive_failure
     # create a smaller dataframe with rows containing the attempts from the filtered hosts
     df_hosts_failed_attempts = input_data_frame[input_data_frame['host_name'].isin(filtered_hosts)]
 
-    # sort the failed login attempts dataframe by hostname and timestamp
-    df_hosts_failed_attempts = df_hosts_failed_attempts.sort_values(['host_name', 'timestamp'], ascending=[True, True])
-
-    blocked_records = list()
-
-    # iterate through each host attempts and look for consecutive failures and potential blocked attempts.
-    for host in df_hosts_failed_attempts['host_name'].unique():
-
-        # dataframe with records of particular host with failed attempts greater or equal to consecutive failures limit
-        df_host_records = df_hosts_failed_attempts[df_hosts_failed_attempts['host_name'] == host]
+    # sort the failed login attempts dataframe once by hostname and timestamp, keeping the log file order for ties
+    df_hosts_failed_attempts = df_hosts_failed_attempts.sort_values(['host_name', 'timestamp'], ascending=[True, True],
+                                                                    kind='mergesort')
 
-        i = 0
+    # get the host codes, timestamps in epoch seconds and failed attempt flags as numpy arrays
+    host_codes = pd.factorize(df_hosts_failed_attempts['host_name'])[0]
+    timestamps = df_hosts_failed_attempts['timestamp'].values.astype('int64') // 10 ** 9
+    failed_attempts = (df_hosts_failed_attempts['http_status_code'] == '401').values
 
-        # Iterate through all attempts to check if there are consecutive failures and are in login failure window.
-        # If yes, then record all the attempts from last failure till the blocked period time window.
-        while i < len(df_host_records) - consecutive_failure_limit + 1:
+    # Find all the windows of consecutive_failure_limit rows of the same host which are all failed attempts within the
+    # login failure window. Only the hosts with at least one such window can ever be blocked.
+    num_windows = len(host_codes) - consecutive_failure_limit + 1
 
-            # slice the dataframe in groups of size equal to consecutive_failure_limit
-            df_sliced_records = df_host_records[i:i+consecutive_failure_limit]
+    if num_windows <= 0:
+        return list()
 
-            # check if all consecutive login failure conditions are met
-            consecutive_failure_check = check_consecutive_login_failures(df_sliced_records, consecutive_failure_limit,
-                                                                         login_failure_window)
+    failed_attempts_cumsum = np.concatenate(([0], np.cumsum(failed_attempts)))
+    window_failures = failed_attempts_cumsum[consecutive_failure_limit:] - failed_attempts_cumsum[:num_windows]
+    window_gaps = timestamps[consecutive_failure_limit - 1:] - timestamps[:num_windows]
 
-            # if all conditions met, then block attempts for next 5 minutes.
-            if consecutive_failure_check:
+    consecutive_failure_windows = (window_failures == consecutive_failure_limit) & \
+                                  (host_codes[consecutive_failure_limit - 1:] == host_codes[:num_windows]) & \
+                                  (window_gaps < login_failure_window)
 
-                # increment i to last failed consecutive attempt
-                i = i + consecutive_failure_limit - 1
+    blocked_hosts = np.unique(host_codes[:num_windows][consecutive_failure_windows])
+    blocked_host_rows = np.in1d(host_codes, blocked_hosts)
 
-                # get the last failed consecutive attempt timestamp
-                block_start_time = df_host_records['timestamp'].iloc[i]
+    # run the login failure state machine over the attempts of the blocked hosts in a single linear pass. As the rows
+    # are sorted by host name and timestamp, the blocked records are in the same order.
+    login_failure_detector = LoginFailureDetector(blocked_window_time=blocked_window_time,
+                                                  consecutive_failure_limit=consecutive_failure_limit,
+                                                  login_failure_window=login_failure_window)
 
-                # iterate until the time difference is less than blocked time window or all the records are iterated
-                while True:
+    df_blocked_host_attempts = df_hosts_failed_attempts[blocked_host_rows]
 
-                    i += 1
+    blocked_rows = [row for row, (host_code, timestamp, http_status_code) in
+                    enumerate(zip(host_codes[blocked_host_rows].tolist(), timestamps[blocked_host_rows].tolist(),
+                                  np.asarray(df_blocked_host_attempts['http_status_code']).tolist()))
+                    if login_failure_detector.update(host_code, timestamp, http_status_code)]
 
-                    if i == len(df_host_records):
-                        break
+    if 'log_entry' in df_blocked_host_attempts.columns:
+        return df_blocked_host_attempts['log_entry'].values[blocked_rows].tolist()
 
-                    # get next timestamp and compute the time difference. if time difference is within blocked window
-                    # time i.e. 5 minutes in this case, then add attempt to the list else reset the counters and move
-                    # the iterator back to current row.
-                    next_timestamp = pd.to_datetime(df_host_records['timestamp'].iloc[i])
+    # read the blocked log entries from the log file at their byte offsets
+    return read_log_entries(input_file=input_file,
+                            log_offsets=df_blocked_host_attempts['log_offset'].values[blocked_rows].tolist(),
+                            log_lengths=df_blocked_host_attempts['log_length'].values[blocked_rows].tolist())
 
-                    if 0 < pd.Timedelta(next_timestamp - block_start_time).seconds <= 60 * blocked_window_time:
-                        # add to potential blocked attempts list
-                        blocked_records.append(df_host_records['log_entry'].iloc[i])
-                    else:
-                        # if exceeded the 5 minute window then revert the iterator to previous row
-                        i -= 1
-                        break
 
-            i += 1
-
-    return blocked_records
-
-
-def write_to_file(output_file=None, input_data=None):
+def write_to_file(output_file=None, input_data=None, append=False):
 
     """Writes the list value to the output file.
 
     Reads the values from the list line and line and writes it to the specified output
-    file. Each record is separated by new line character.
+    file. Each record is separated by new line character. The records are written to the buffered output file in
+    batches of WRITE_BATCH_LINES, so the whole list is never joined into one string.
 
     Args:
         output_file: Output file to which the output has to be written
         input_data: the list with records to be written in the file
+        append: if True, the records are appended to the existing content of the output file
 
     Raises:
         IOError: if the output file is missing at the given location or there is some problem
@@ -507,8 +929,8 @@ def write_to_file(output_file=None, input_data=None):
         return
 
     try:
-        # open the output file in write mode
-        out_file = open(output_file, 'w')
+        # open the output file in write or append mode
+        out_file = open(output_file, 'a' if append else 'w', WRITE_BUFFER_SIZE)
 
     except IOError as e:
         # print the error message if issues in accessing output file
@@ -518,117 +940,1232 @@ def write_to_file(output_file=None, input_data=None):
     else:
         print ("\nWriting output to " + output_file)
 
-        # write the list content to output file separated by new line character.
-        out_file.write("\n".join(input_data))
+        # separate the appended records from the last record already in the output file
+        if append and out_file.tell() > 0:
+            out_file.write("\n")
+
+        # write the list content to output file separated by new line character, one batch of records at a time.
+        for batch_start in xrange(0, len(input_data), WRITE_BATCH_LINES):
+            if batch_start > 0:
+                out_file.write("\n")
+            out_file.write("\n".join(input_data[batch_start:batch_start + WRITE_BATCH_LINES]))
+
         out_file.close()
 
         print ("Output written successfully!!")
 
 
+class PipelineConfig(object):
+
+    """Settings of a LogPipeline.
+
+    Attributes:
+        num_of_active_hosts: number of top active hosts of feature 1. E.g. 10
+        num_of_top_resources: number of top bandwidth-intensive resources of feature 2. E.g. 10
+        num_of_busiest_periods: number of busiest periods of feature 3. E.g. 10
+        busy_period_window: length of the busiest periods in minutes. E.g. 60
+        busy_period_windows: list of the period lengths in minutes of the busy periods feature, swept together. E.g.
+         [1, 5, 60]. See get_busy_periods_feature_stage.
+        block_window_min: blocked window time in minutes after consecutive login failures. E.g. 5
+        login_failures_limit: threshold for number of consecutive login failures. E.g. 3
+        login_failures_window_sec: failure window time in seconds over which the consecutive failures occur. E.g. 20
+        regular_exp: the regular expression object to extract the relevant groups from every line in the log file.
+        engine: pandas to compute the features on a data frame, single-pass to aggregate them in one pass.
+        num_of_workers: number of worker processes parsing the log file in parallel, single-pass engine only.
+        use_mmap: whether to scan the memory-mapped log file, single-pass engine only.
+        heavy_hitters_capacity: number of Space-Saving counters of the top hosts and resources, 0 for the exact
+         counts, single-pass engine only.
+        state_file: file with the checkpoint of the incremental runs, None to always parse the log file from the
+         start. Single-pass engine only.
+        cache_dir: directory of the parsed log cache, None to not cache the parsed log. Pandas engine only.
+        chunk_size: approximate number of bytes of the log file parsed into every record batch.
+        num_of_threads: number of threads computing the features and writing the outputs concurrently, 1 to compute
+         and write them one after the other.
+        rollup_file: file to save the per minute and per hour rollup index of the log file to, None to not build it.
+         See rollup_index.
+        bad_records_sample_rate: fraction of the bad records written to the bad records file, e.g. 0.01 for every
+         100th bad record.
+        max_bad_records: maximum number of bad records written to the bad records file, None for no maximum.
+        sketch_file: file to save the approximate distinct host and bytes transferred sketch statistics of the log
+         file to, None to not build them. See cardinality_sketches.
+
+    """
+
+    def __init__(self, num_of_active_hosts=10, num_of_top_resources=10, num_of_busiest_periods=10,
+                 busy_period_window=60, block_window_min=5, login_failures_limit=3, login_failures_window_sec=20,
+                 regular_exp=LOG_LINE_REGEX, engine='pandas', num_of_workers=1, use_mmap=False,
+                 heavy_hitters_capacity=0, state_file=None, cache_dir=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                 num_of_threads=1, rollup_file=None, bad_records_sample_rate=1.0, max_bad_records=None,
+                 busy_period_windows=(1, 5, 60), sketch_file=None):
+        self.num_of_active_hosts = num_of_active_hosts
+        self.num_of_top_resources = num_of_top_resources
+        self.num_of_busiest_periods = num_of_busiest_periods
+        self.busy_period_window = busy_period_window
+        self.block_window_min = block_window_min
+        self.login_failures_limit = login_failures_limit
+        self.login_failures_window_sec = login_failures_window_sec
+        self.regular_exp = regular_exp
+        self.engine = engine
+        self.num_of_workers = num_of_workers
+        self.use_mmap = use_mmap
+        self.heavy_hitters_capacity = heavy_hitters_capacity
+        self.state_file = os.path.abspath(state_file) if state_file is not None else None
+        self.cache_dir = os.path.abspath(cache_dir) if cache_dir is not None else None
+        self.chunk_size = chunk_size
+        self.num_of_threads = num_of_threads
+        self.rollup_file = os.path.abspath(rollup_file) if rollup_file is not None else None
+        self.bad_records_sample_rate = bad_records_sample_rate
+        self.max_bad_records = max_bad_records
+        self.busy_period_windows = list(busy_period_windows)
+        self.sketch_file = os.path.abspath(sketch_file) if sketch_file is not None else None
+
+    def validate(self):
+
+        """Checks the settings are valid and can be combined.
+
+        Raises:
+            ValueError: if a setting is invalid or not supported by the engine.
+
+        """
+
+        if self.engine not in ('pandas', 'single-pass'):
+            raise ValueError('engine must be pandas or single-pass: ' + repr(self.engine))
+
+        if self.num_of_workers < 1 or self.num_of_threads < 1 or self.heavy_hitters_capacity < 0 or \
+                self.chunk_size < 1:
+            raise ValueError('num_of_workers, num_of_threads and chunk_size must be at least 1 and '
+                             'heavy_hitters_capacity must not be negative')
+
+        if not 0 < self.bad_records_sample_rate <= 1 or (self.max_bad_records is not None and self.max_bad_records < 0):
+            raise ValueError('bad_records_sample_rate must be in (0, 1] and max_bad_records must not be negative')
+
+        if not self.busy_period_windows or min(self.busy_period_windows) < 1:
+            raise ValueError('busy_period_windows must not be empty and every period must be at least 1 minute')
+
+        if self.engine != 'single-pass' and (self.num_of_workers > 1 or self.use_mmap or self.heavy_hitters_capacity or
+                                             self.state_file is not None):
+            raise ValueError('num_of_workers, use_mmap, heavy_hitters_capacity and state_file require the single-pass '
+                             'engine')
+
+        if self.state_file is not None and (self.num_of_workers > 1 or self.use_mmap):
+            raise ValueError('state_file can not be combined with num_of_workers or use_mmap')
+
+        if self.cache_dir is not None and self.engine != 'pandas':
+            raise ValueError('cache_dir requires the pandas engine')
+
+        # the rollup index is built from the records streamed by the parser, which are split or skipped otherwise
+        if self.rollup_file is not None and (self.num_of_workers > 1 or self.use_mmap or self.state_file is not None or
+                                             self.cache_dir is not None):
+            raise ValueError('rollup_file can not be combined with num_of_workers, use_mmap, state_file or cache_dir')
+
+        if self.sketch_file is not None and (self.num_of_workers > 1 or self.use_mmap or self.state_file is not None or
+                                             self.cache_dir is not None):
+            raise ValueError('sketch_file can not be combined with num_of_workers, use_mmap, state_file or cache_dir')
+
+
+class FeatureStage(object):
+
+    """A feature computed by the LogPipeline from the parsed log file.
+
+    The feature functions return the list of output lines of the feature, None if it can not be computed.
+
+    Attributes:
+        name: name of the feature, the key of its output and output file. E.g. hosts
+        stage_name: name of the stage in the metrics. E.g. feature_1_hosts
+        data_frame_function: function computing the feature with the pandas engine, called with the PipelineConfig,
+         the preprocessed data frame and the log file as keyword arguments config, input_data_frame and input_file.
+         None if the feature is not supported by the pandas engine.
+        aggregator_function: function computing the feature with the single-pass engine, called with the
+         PipelineConfig and the LogAggregator as keyword arguments config and log_aggregator. None if the feature is
+         not supported by the single-pass engine.
+
+    """
+
+    def __init__(self, name=None, stage_name=None, data_frame_function=None, aggregator_function=None):
+        self.name = name
+        self.stage_name = stage_name if stage_name is not None else 'feature_' + name
+        self.data_frame_function = data_frame_function
+        self.aggregator_function = aggregator_function
+
+
+def get_default_feature_stages():
+
+    """Gets the FeatureStage of the features 1 to 4, in the order their outputs are written."""
+
+    return [
+        FeatureStage(name='hosts', stage_name='feature_1_hosts',
+                     data_frame_function=lambda config, input_data_frame, input_file: get_top_n_active_hosts(
+                         n=config.num_of_active_hosts, input_data_frame=input_data_frame),
+                     aggregator_function=lambda config, log_aggregator: log_aggregator.get_top_n_active_hosts(
+                         n=config.num_of_active_hosts)),
+        FeatureStage(name='resources', stage_name='feature_2_resources',
+                     data_frame_function=lambda config, input_data_frame, input_file: get_top_n_resources_max_bandwidth(
+                         n=config.num_of_top_resources, input_data_frame=input_data_frame),
+                     aggregator_function=lambda config, log_aggregator:
+                     log_aggregator.get_top_n_resources_max_bandwidth(n=config.num_of_top_resources)),
+        FeatureStage(name='hours', stage_name='feature_3_hours',
+                     data_frame_function=lambda config, input_data_frame, input_file: get_top_n_busiest_periods(
+                         n=config.num_of_busiest_periods, period_in_minutes=config.busy_period_window,
+                         input_data_frame=input_data_frame),
+                     aggregator_function=lambda config, log_aggregator: log_aggregator.get_top_n_busiest_periods(
+                         n=config.num_of_busiest_periods, period_in_minutes=config.busy_period_window)),
+        FeatureStage(name='blocked', stage_name='feature_4_blocked',
+                     data_frame_function=lambda config, input_data_frame, input_file:
+                     get_login_failure_blocked_records(blocked_window_time=config.block_window_min,
+                                                       consecutive_failure_limit=config.login_failures_limit,
+                                                       login_failure_window=config.login_failures_window_sec,
+                                                       input_data_frame=input_data_frame, input_file=input_file),
+                     aggregator_function=lambda config, log_aggregator:
+                     log_aggregator.get_login_failure_blocked_records()),
+    ]
+
+
+def get_busy_periods_feature_stage():
+
+    """Gets the FeatureStage of the busiest periods of every period length of busy_period_windows.
+
+    All the period lengths are swept at once from the same visits per second, see
+    get_top_n_busiest_periods_by_window. Every output line is the period length in minutes followed by a busiest
+    period of that length, e.g. 5,01/Jul/1995:00:00:01 -0400,100, grouped by period length in the order of
+    busy_period_windows.
+
+    """
+
+    return FeatureStage(name='busy_periods', stage_name='feature_3_busy_periods',
+                        data_frame_function=lambda config, input_data_frame, input_file: get_busy_periods_lines(
+                            get_top_n_busiest_periods_by_window(n=config.num_of_busiest_periods,
+                                                                periods_in_minutes=config.busy_period_windows,
+                                                                input_data_frame=input_data_frame)),
+                        aggregator_function=lambda config, log_aggregator: get_busy_periods_lines(
+                            log_aggregator.get_top_n_busiest_periods_by_window(
+                                n=config.num_of_busiest_periods, periods_in_minutes=config.busy_period_windows)))
+
+
+def get_busy_periods_lines(busiest_periods_by_window=None):
+
+    """Flattens the busiest periods of every period length into output lines prefixed with the period length, None
+    if there are no busiest periods."""
+
+    if busiest_periods_by_window is None:
+        return None
+
+    return [str(period_in_minutes) + ',' + busiest_period
+            for period_in_minutes, busiest_periods in busiest_periods_by_window.iteritems()
+            for busiest_period in busiest_periods]
+
+
+class LogPipeline(object):
+
+    """Reusable pipeline extracting the features from NASA web server log files.
+
+    Holds the settings and the feature stages, so one warm process can process many log files one after the other
+    without paying the imports and setup again, e.g. a resident worker. The log file is parsed in chunks and either
+    a pandas data frame is created and preprocessed batch by batch (pandas engine), or the streamed batches are
+    aggregated by a LogAggregator without creating a data frame (single-pass engine). Every feature stage is then
+    computed from the data frame or the aggregates.
+
+    With the single-pass engine, byte ranges of the log file can be parsed and aggregated in parallel worker
+    processes, the log file can be memory-mapped and scanned as bytes, and with a state file the aggregates are
+    checkpointed so the later runs only parse the lines appended to the log file since. With the pandas engine and a
+    cache directory, the preprocessed data frame is saved and loaded by the later runs on the unchanged log file.
+
+    With more than one thread, the feature stages are computed and their outputs written concurrently in a thread
+    pool once the data frame or the aggregates are ready, along with the bad records. The feature functions only
+    read the shared data frame or aggregates.
+
+    Attributes:
+        config: the PipelineConfig.
+        feature_stages: list of the FeatureStage computed for every log file, in the order of their outputs.
+        metrics: StageMetrics with the wall time, CPU time, rows and memory delta of every stage of the last run.
+        thread_pool: the ThreadPool running the feature stages and the output writes, None with a single thread.
+        pending_tasks: list of the AsyncResult of the tasks of the current run started in the thread pool.
+
+    Example:
+
+        pipeline = LogPipeline(PipelineConfig(engine='single-pass', num_of_active_hosts=20))
+        for log_file in log_files:
+            feature_outputs = pipeline.process(input_file=log_file)
+
+    """
+
+    def __init__(self, config=None, feature_stages=None):
+
+        """Creates the pipeline.
+
+        Args:
+            config: the PipelineConfig, the default settings if None.
+            feature_stages: list of the FeatureStage to compute, the features 1 to 4 if None.
+
+        Raises:
+            ValueError: if the settings are invalid or a feature stage is not supported by the engine.
+
+        """
+
+        self.config = config if config is not None else PipelineConfig()
+        self.config.validate()
+        self.feature_stages = list()
+        self.metrics = StageMetrics()
+        self.thread_pool = ThreadPool(processes=self.config.num_of_threads) if self.config.num_of_threads > 1 else None
+        self.pending_tasks = list()
+
+        for feature_stage in (feature_stages if feature_stages is not None else get_default_feature_stages()):
+            self.add_feature_stage(feature_stage)
+
+    def add_feature_stage(self, feature_stage=None):
+
+        """Adds a feature stage, computed after the ones added before.
+
+        Raises:
+            ValueError: if the feature stage is not supported by the engine or its name is already used.
+
+        """
+
+        if (feature_stage.data_frame_function if self.config.engine == 'pandas' else
+                feature_stage.aggregator_function) is None:
+            raise ValueError('feature {} is not supported by the {} engine'.format(feature_stage.name,
+                                                                                   self.config.engine))
+
+        if feature_stage.name in [stage.name for stage in self.feature_stages]:
+            raise ValueError('duplicate feature name: ' + feature_stage.name)
+
+        self.feature_stages.append(feature_stage)
+
+    def process(self, input_file=None, output_files=None, bad_records_file=None):
+
+        """Extracts the features from the log file and writes them to their output files.
+
+        The metrics of the stages of the run are recorded in a new StageMetrics.
+
+        Args:
+            input_file: NASA web server log file, a glob pattern of rotated log files or a list of log files, plain
+             or gzip, bz2 or xz compressed. More than one log file is parsed as one log, oldest first.
+            output_files: optional dictionary with the feature name as key and the file to write its output to as
+             value. E.g. {'hosts': './log_output/hosts.txt'}
+            bad_records_file: optional file to write the records not parsed by the regular expression to. They are
+             streamed to it as they are parsed, sampled and capped as set by the config.
+
+        Returns:
+            An ordered dictionary with the feature name as key and the list of output lines of the feature as value,
+            None if there are no records in the log file.
+
+        Raises:
+            IOError: if a glob pattern matches no log file, or there is some problem reading or decompressing a log
+            file. Raised once all the tasks of the run in the thread pool are done.
+            ValueError: if the workers, memory-mapping, state file or cache directory are used with more than one or
+            a compressed log file.
+
+        """
+
+        self.metrics = StageMetrics()
+        input_files = [os.path.abspath(log_file) for log_file in expand_input_files(input_file)]
+        self.check_input_files(input_files)
+
+        # the bad records are written as they are parsed, unless they are cached along with the data frame
+        if self.config.cache_dir is not None:
+            bad_records = list()
+        else:
+            bad_records = self.get_bad_records_writer(bad_records_file=bad_records_file)
+
+        if is_single_plain_file(input_files):
+
+            # stream the log file in chunks of parsed records, keeping only the byte offsets of the log entries. The
+            # time spent parsing is recorded as the parse stage, even when the chunks are consumed by the next stage.
+            input_file = input_files[0]
+            log_chunks = parse_log_file_chunks(input_file=input_file, regular_exp=self.config.regular_exp,
+                                               chunk_size=self.config.chunk_size, invalid_records=bad_records,
+                                               keep_log_entries=False)
+
+        else:
+
+            # stream the log files one after the other as one log, decompressing them ahead of the parsing
+            input_file = None
+            log_chunks = parse_log_files_chunks(input_files=input_files, regular_exp=self.config.regular_exp,
+                                                chunk_size=self.config.chunk_size, invalid_records=bad_records)
+
+        log_chunks = self.metrics.iterate('parse', log_chunks, count_rows=lambda batch: len(batch['host_name']))
+
+        if self.config.rollup_file is not None:
+            # roll up every record batch on its way to the engine
+            rollup_index_builder = RollupIndexBuilder()
+            log_chunks = self.metrics.iterate('rollup_update', rollup_index_builder.iterate(log_chunks))
+
+        if self.config.sketch_file is not None:
+            # add every record batch to the sketches on its way to the engine
+            sketch_statistics = SketchStatistics()
+            log_chunks = self.metrics.iterate('sketch_update', sketch_statistics.iterate(log_chunks))
+
+        try:
+            if self.config.engine == 'single-pass':
+                feature_outputs = self.process_single_pass(input_file=input_file, log_chunks=log_chunks,
+                                                           bad_records=bad_records, bad_records_file=bad_records_file,
+                                                           output_files=output_files)
+            else:
+                feature_outputs = self.process_pandas(input_file=input_file, log_chunks=log_chunks,
+                                                      bad_records=bad_records, bad_records_file=bad_records_file,
+                                                      output_files=output_files)
+
+        except BaseException:
+            # let the tasks already started finish before handing over the error
+            self.wait_for_tasks(raise_errors=False)
+            if isinstance(bad_records, BadRecordsWriter):
+                bad_records.close()
+            raise
+
+        if self.config.rollup_file is not None:
+            self.run_task(self.save_rollup_index, rollup_index_builder)
+
+        if self.config.sketch_file is not None:
+            self.run_task(self.save_sketch_statistics, sketch_statistics)
+
+        # wait for the features computed and the outputs written in the thread pool
+        self.wait_for_tasks()
+
+        if feature_outputs is None:
+            print "\nNo records present in the log file for analysis."
+            return None
+
+        return feature_outputs
+
+    def close(self):
+
+        """Stops the threads of the thread pool, if any. The pipeline can not process log files afterwards."""
+
+        if self.thread_pool is not None:
+            self.thread_pool.close()
+            self.thread_pool.join()
+            self.thread_pool = None
+
+    def run_task(self, function=None, *args):
+
+        """Runs the function in the thread pool of the pipeline, or right away if it has no thread pool."""
+
+        if self.thread_pool is None:
+            function(*args)
+        else:
+            self.pending_tasks.append(self.thread_pool.apply_async(function, args))
+
+    def wait_for_tasks(self, raise_errors=True):
+
+        """Waits for the tasks of the current run started in the thread pool to finish.
+
+        Args:
+            raise_errors: whether to raise the first exception raised by a task.
+
+        """
+
+        pending_tasks, self.pending_tasks = self.pending_tasks, list()
+        task_error = None
+
+        for task in pending_tasks:
+
+            # wait with a timeout, so the wait can be interrupted with Ctrl+C
+            while not task.ready():
+                task.wait(0.1)
+
+            try:
+                task.get()
+            except Exception as e:
+                task_error = task_error or e
+
+        if task_error is not None and raise_errors:
+            raise task_error
+
+    def save_rollup_index(self, rollup_index_builder=None):
+
+        """Builds the rollup index of the log file and saves it to the rollup file.
+
+        Raises:
+            IOError: if there is some problem writing the rollup file.
+            OSError: if there is some problem opening or renaming the rollup file.
+
+        """
+
+        with self.metrics.stage('rollup_save', rows_in=rollup_index_builder.num_records):
+            rollup_index_builder.build().save(index_file=self.config.rollup_file)
+
+    def save_sketch_statistics(self, sketch_statistics=None):
+
+        """Saves the sketch statistics of the log file to the sketch file.
+
+        Raises:
+            IOError: if there is some problem writing the sketch file.
+            OSError: if there is some problem opening or renaming the sketch file.
+
+        """
+
+        with self.metrics.stage('sketch_save', rows_in=sketch_statistics.num_records):
+            sketch_statistics.save(sketch_file=self.config.sketch_file)
+
+    def follow(self, input_file=None, blocked_file=None, bad_records_file=None):
+
+        """Tails the live log file and appends the blocked attempts (feature 4) to the blocked file as they happen.
+
+        Runs until interrupted with Ctrl+C, see run_follow_mode.
+
+        """
+
+        run_follow_mode(input_file=input_file, regular_exp=self.config.regular_exp, blocked_file=blocked_file,
+                        bad_records_file=bad_records_file, blocked_window_time=self.config.block_window_min,
+                        consecutive_failure_limit=self.config.login_failures_limit,
+                        login_failure_window=self.config.login_failures_window_sec)
+
+    def map_shard(self, input_file=None, partial_file=None, bad_records_file=None):
+
+        """Aggregates one shard of the log into mergeable partial aggregates and saves them to the partial file.
+
+        The map step of the sharded mode: the shards, e.g. the daily log files of a month, are mapped independently,
+        on one or more machines, and the partial aggregates files are merged into the features by reduce_shards. The
+        partial aggregates are the host visit counts, the bandwidth per resource, the per second visit histogram and
+        the login failures of the hosts, see ShardAggregator. The bad records of the shard are written to the bad
+        records file.
+
+        Args:
+            input_file: NASA web server log file, a glob pattern of rotated log files or a list of log files, plain
+             or gzip, bz2 or xz compressed, parsed as one shard.
+            partial_file: file to write the partial aggregates of the shard to.
+            bad_records_file: optional file to write the records not parsed by the regular expression to.
+
+        Raises:
+            IOError: if a glob pattern matches no log file, or there is some problem writing the partial file.
+            OSError: if there is some problem opening or renaming the partial file.
+            ValueError: if the settings of the pipeline can not be used for the partial aggregates.
+
+        """
+
+        self.check_sharded_settings()
+        self.metrics = StageMetrics()
+        input_files = [os.path.abspath(log_file) for log_file in expand_input_files(input_file)]
+        bad_records = self.get_bad_records_writer(bad_records_file=bad_records_file)
+
+        # the log entries are kept with the records, as the ones needed by the reduce step are saved with the shard
+        if is_single_plain_file(input_files):
+            log_chunks = parse_log_file_chunks(input_file=input_files[0], regular_exp=self.config.regular_exp,
+                                               chunk_size=self.config.chunk_size, invalid_records=bad_records)
+        else:
+            log_chunks = parse_log_files_chunks(input_files=input_files, regular_exp=self.config.regular_exp,
+                                                chunk_size=self.config.chunk_size, invalid_records=bad_records)
+
+        log_chunks = self.metrics.iterate('parse', log_chunks, count_rows=lambda batch: len(batch['host_name']))
+
+        try:
+            with self.metrics.stage('map_aggregate') as stage:
+                shard_aggregator = self.get_log_aggregator(input_chunks=log_chunks, log_aggregator=ShardAggregator(
+                    blocked_window_time=self.config.block_window_min,
+                    consecutive_failure_limit=self.config.login_failures_limit,
+                    login_failure_window=self.config.login_failures_window_sec))
+                stage.add_rows(rows_out=shard_aggregator.num_records)
+
+        except BaseException:
+            bad_records.close()
+            raise
+
+        self.write_bad_records(bad_records, bad_records_file)
+
+        with self.metrics.stage('map_save', rows_in=shard_aggregator.num_records):
+            header, partial_aggregates = shard_aggregator.get_partial_aggregates(
+                num_valid_records=self.metrics.get_stage('parse').rows_out or 0, num_invalid_records=len(bad_records))
+            save_partial_aggregates(partial_file=partial_file, parameters=self.get_checkpoint_parameters(),
+                                    header=header, partial_aggregates=partial_aggregates)
+
+        print "\nPartial aggregates of {} records written to {}".format(shard_aggregator.num_records, partial_file)
+
+    def reduce_shards(self, partial_files=None, output_files=None):
+
+        """Merges the partial aggregates files of the shards and computes the features from them.
+
+        The reduce step of the sharded mode, see map_shard. The shards are merged in the order of their first
+        timestamp, so the files can be given in any order. The features are computed with the single-pass engine
+        functions, and the outputs are the same as the ones of a single run over all the shards as one log. The bad
+        records are left in the bad records files of the map steps.
+
+        Args:
+            partial_files: partial aggregates file, a glob pattern of them or a list of them.
+            output_files: optional dictionary with the feature name as key and the file to write its output to as
+             value. E.g. {'hosts': './log_output/hosts.txt'}
+
+        Returns:
+            An ordered dictionary with the feature name as key and the list of output lines of the feature as value,
+            None if there are no records in the shards.
+
+        Raises:
+            IOError: if a glob pattern matches no file, or there is some problem reading a partial file. Raised once
+            all the tasks of the run in the thread pool are done.
+            ValueError: if a file is not a partial aggregates file, was saved with other settings than the ones of
+            the pipeline, or the settings of the pipeline can not be used for the partial aggregates.
+
+        """
+
+        self.check_sharded_settings()
+        self.metrics = StageMetrics()
+        partial_files = expand_input_files(partial_files)
+
+        with self.metrics.stage('reduce_merge', rows_in=len(partial_files)) as stage:
+            log_aggregator, num_valid_records, num_invalid_records = merge_partial_aggregates(
+                partial_files=partial_files, parameters=self.get_checkpoint_parameters(),
+                blocked_window_time=self.config.block_window_min,
+                consecutive_failure_limit=self.config.login_failures_limit,
+                login_failure_window=self.config.login_failures_window_sec)
+            stage.add_rows(rows_out=log_aggregator.num_records)
+
+        # printing the total number of records of the shards, valid and invalid
+        print 'Shards : {} | Total records : {} | Valid records  : {} | Invalid records : {}'.format(
+            len(partial_files), num_valid_records + num_invalid_records, num_valid_records, num_invalid_records)
+
+        if log_aggregator.num_records == 0:
+            print "\nNo records present in the log file for analysis."
+            return None
+
+        feature_outputs = self.compute_features(num_records=log_aggregator.num_records, output_files=output_files,
+                                                config=self.config, log_aggregator=log_aggregator)
+
+        # wait for the features computed and the outputs written in the thread pool
+        self.wait_for_tasks()
+
+        return feature_outputs
+
+    def check_input_files(self, input_files=None):
+
+        """Checks the settings of the pipeline can be used with the log files.
+
+        Raises:
+            ValueError: if the workers, memory-mapping, state file or cache directory are used with more than one or
+            a compressed log file.
+
+        """
+
+        if not is_single_plain_file(input_files) and (self.config.num_of_workers > 1 or self.config.use_mmap or
+                                                      self.config.state_file is not None or
+                                                      self.config.cache_dir is not None):
+            raise ValueError('num_of_workers, use_mmap, state_file and cache_dir require a single uncompressed log '
+                             'file')
+
+    def check_sharded_settings(self):
+
+        """Checks the settings of the pipeline can be used by the map and reduce steps of the sharded mode.
+
+        Raises:
+            ValueError: if the engine is not single-pass or a setting not supported by the partial aggregates is set.
+
+        """
+
+        if self.config.engine != 'single-pass':
+            raise ValueError('the sharded map and reduce steps require the single-pass engine')
+
+        # the heavy hitters of the shards can not be merged exactly, and the shards are parsed as a stream
+        if self.config.num_of_workers > 1 or self.config.use_mmap or self.config.heavy_hitters_capacity or \
+                self.config.state_file is not None or self.config.cache_dir is not None or \
+                self.config.rollup_file is not None or self.config.sketch_file is not None:
+            raise ValueError('the sharded map and reduce steps can not be combined with num_of_workers, use_mmap, '
+                             'heavy_hitters_capacity, state_file, cache_dir, rollup_file or sketch_file')
+
+    def process_single_pass(self, input_file=None, log_chunks=None, bad_records=None, bad_records_file=None,
+                            output_files=None):
+
+        """Computes the features with the single-pass engine, recording the metrics of every stage.
+
+        Args:
+            input_file: NASA web server log file.
+            log_chunks: the record batches streamed from the log file.
+            bad_records: list or BadRecordsWriter to which the lines not matching the regular expression are appended.
+            bad_records_file: optional file to write the bad records to.
+            output_files: optional dictionary with the feature name as key and the output file as value.
+
+        Returns:
+            An ordered dictionary with the feature name as key and the list of output lines as value, None if there
+            are no records in the log file.
+
+        """
+
+        checkpoint_offset, resumed = None, False
+
+        with self.metrics.stage('parse_aggregate') as stage:
+
+            if self.config.num_of_workers > 1:
+
+                try:
+                    # parse and aggregate byte ranges of the log file in parallel worker processes
+                    log_aggregator = parse_log_file_parallel(
+                        input_file=input_file, regular_exp=self.config.regular_exp,
+                        num_workers=self.config.num_of_workers, blocked_window_time=self.config.block_window_min,
+                        consecutive_failure_limit=self.config.login_failures_limit,
+                        login_failure_window=self.config.login_failures_window_sec, invalid_records=bad_records,
+                        use_mmap=self.config.use_mmap, heavy_hitters_capacity=self.config.heavy_hitters_capacity)
+                except ValueError:
+                    # print error message if the timestamp or bytes conversion is invalid and exit the program
+                    print "Error while converting the timestamp or bytes transferred of the parsed records"
+                    sys.exit()
+
+            elif self.config.use_mmap:
+
+                try:
+                    # scan the memory-mapped log file, keeping the log entries as offsets into the mapped file
+                    log_aggregator = parse_log_file_mapped(input_file=input_file, regular_exp=self.config.regular_exp,
+                                                           log_aggregator=self.get_new_log_aggregator(),
+                                                           invalid_records=bad_records)
+                except ValueError:
+                    # print error message if the timestamp or bytes conversion is invalid and exit the program
+                    print "Error while converting the timestamp or bytes transferred of the parsed records"
+                    sys.exit()
+
+            elif self.config.state_file is not None:
+                # aggregate only the lines appended since the last run into the checkpointed aggregates
+                log_aggregator, checkpoint_offset, resumed = self.get_incremental_log_aggregator(
+                    input_file=input_file, invalid_records=bad_records)
+
+            else:
+                # aggregate the streamed record batches for all the features in one pass, then read the blocked log
+                # entries from the log file
+                log_aggregator = self.get_log_aggregator(input_chunks=log_chunks)
+                resolve_blocked_records(input_file=input_file, log_aggregator=log_aggregator)
+
+            stage.add_rows(rows_out=log_aggregator.num_records)
+
+        # write all the unprocessed records to bad records output file, only the new ones if resumed from a checkpoint
+        self.run_task(self.write_bad_records, bad_records, bad_records_file, resumed)
+
+        if self.config.state_file is not None:
+            with self.metrics.stage('checkpoint_save'):
+                self.checkpoint_log_aggregator(input_file=input_file, byte_offset=checkpoint_offset,
+                                               log_aggregator=log_aggregator)
+
+        if log_aggregator.num_records == 0:
+            return None
+
+        return self.compute_features(num_records=log_aggregator.num_records, output_files=output_files,
+                                     config=self.config, log_aggregator=log_aggregator)
+
+    def process_pandas(self, input_file=None, log_chunks=None, bad_records=None, bad_records_file=None,
+                       output_files=None):
+
+        """Computes the features with the pandas engine, recording the metrics of every stage.
+
+        Args:
+            input_file: NASA web server log file.
+            log_chunks: the record batches streamed from the log file.
+            bad_records: list or BadRecordsWriter to which the lines not matching the regular expression are appended.
+            bad_records_file: optional file to write the bad records to.
+            output_files: optional dictionary with the feature name as key and the output file as value.
+
+        Returns:
+            An ordered dictionary with the feature name as key and the list of output lines as value, None if there
+            are no records in the log file.
+
+        """
+
+        cached_log_data = None
+
+        if self.config.cache_dir is not None:
+            with self.metrics.stage('cache_load') as stage:
+                # load the data frame parsed by an earlier run for the same log file and regular expression, if any
+                cached_log_data = self.get_cached_data_frame(
+                    cache_key=get_cache_key(input_file=input_file, regular_exp=self.config.regular_exp))
+                stage.add_rows(rows_out=len(cached_log_data[0]) if cached_log_data is not None else 0)
+
+        if cached_log_data is not None:
+            df_log_data, bad_records = cached_log_data
+
+        else:
+            with self.metrics.stage('data_frame') as stage:
+                # get the pandas data frame from the streamed record batches for further analysis
+                df_log_data = get_data_frame(input_chunks=log_chunks)
+                stage.add_rows(rows_in=self.metrics.get_stage('parse').rows_out or 0, rows_out=len(df_log_data))
+
+            if self.config.cache_dir is not None:
+                with self.metrics.stage('cache_save', rows_in=len(df_log_data)):
+                    self.cache_data_frame(
+                        cache_key=get_cache_key(input_file=input_file, regular_exp=self.config.regular_exp),
+                        input_data_frame=df_log_data, bad_records=bad_records)
+
+        # write all the unprocessed records to bad records output file
+        self.run_task(self.write_bad_records, bad_records, bad_records_file)
+
+        if len(df_log_data) == 0:
+            return None
+
+        return self.compute_features(num_records=len(df_log_data), output_files=output_files, config=self.config,
+                                     input_data_frame=df_log_data, input_file=input_file)
+
+    def compute_features(self, num_records=0, output_files=None, **feature_arguments):
+
+        """Computes every feature stage with the function of the engine and writes its output, as a task each.
+
+        Every feature is recorded as a stage of the metrics and the writing of the outputs as the write_output stage.
+
+        Args:
+            num_records: number of records the features are computed from.
+            output_files: optional dictionary with the feature name as key and the output file as value, the
+             features without an output file are not written.
+            feature_arguments: the keyword arguments of the feature functions of the engine.
+
+        Returns:
+            An ordered dictionary with the feature name as key and the list of output lines as value, filled in as the
+            tasks are done.
+
+        """
+
+        feature_outputs = OrderedDict((feature_stage.name, None) for feature_stage in self.feature_stages)
+
+        for feature_stage in self.feature_stages:
+            self.run_task(self.run_feature_stage, feature_stage, num_records, feature_outputs, output_files,
+                          feature_arguments)
+
+        return feature_outputs
+
+    def run_feature_stage(self, feature_stage=None, num_records=0, feature_outputs=None, output_files=None,
+                          feature_arguments=None):
+
+        """Computes the feature stage, stores its output in feature_outputs and writes it to its output file."""
+
+        feature_function = feature_stage.data_frame_function if self.config.engine == 'pandas' else \
+            feature_stage.aggregator_function
+
+        with self.metrics.stage(feature_stage.stage_name, rows_in=num_records) as stage:
+            feature_output = feature_function(**feature_arguments)
+
+            if feature_output is not None:
+                stage.add_rows(rows_out=len(feature_output))
+
+        feature_outputs[feature_stage.name] = feature_output
+
+        if output_files is None or output_files.get(feature_stage.name) is None:
+            return
+
+        with self.metrics.stage('write_output'):
+            if feature_output is not None:
+                write_to_file(output_file=output_files[feature_stage.name], input_data=feature_output)
+            else:
+                print "Error while getting the feature : " + feature_stage.name
+
+    def get_bad_records_writer(self, bad_records_file=None, append=False):
+
+        """Gets a BadRecordsWriter to the bad records file with the sampling and maximum of the pipeline."""
+
+        return BadRecordsWriter(output_file=bad_records_file, sample_rate=self.config.bad_records_sample_rate,
+                                max_records=self.config.max_bad_records, append_to_file=append)
+
+    def write_bad_records(self, bad_records=None, bad_records_file=None, append=False):
+
+        """Writes the records not parsed by the regular expression to the bad records file, if any.
+
+        The bad records streamed by a BadRecordsWriter while parsing are already written, so its file is only closed.
+
+        """
+
+        with self.metrics.stage('write_bad_records', rows_in=len(bad_records)) as stage:
+
+            if not isinstance(bad_records, BadRecordsWriter):
+                bad_records_writer = self.get_bad_records_writer(bad_records_file=bad_records_file, append=append)
+                bad_records_writer.extend(bad_records)
+                bad_records = bad_records_writer
+
+            bad_records.close()
+
+            with self.metrics.lock:
+                stage.add_rows(rows_out=bad_records.num_written)
+
+    def get_new_log_aggregator(self):
+
+        """Gets an empty LogAggregator with the login failure and heavy hitters settings of the pipeline."""
+
+        return LogAggregator(blocked_window_time=self.config.block_window_min,
+                             consecutive_failure_limit=self.config.login_failures_limit,
+                             login_failure_window=self.config.login_failures_window_sec,
+                             heavy_hitters_capacity=self.config.heavy_hitters_capacity)
+
+    def get_log_aggregator(self, input_chunks=None, log_aggregator=None):
+
+        """Aggregates the streamed record batches in a single pass without creating a data frame.
+
+        Feeds every batch yielded by parse_log_file_chunks to a LogAggregator which keeps the running host visit
+        counts, bandwidth per resource, per second visit histogram and login failure state needed for the four
+        features.
+
+        Args:
+            input_chunks: an iterable of columnar record batches as yielded by parse_log_file_chunks.
+            log_aggregator: the LogAggregator to aggregate the records into, e.g. a ShardAggregator, an empty one with
+             the settings of the pipeline if None.
+
+        Returns:
+            The LogAggregator with all the streamed records aggregated.
+
+        """
+
+        if log_aggregator is None:
+            log_aggregator = self.get_new_log_aggregator()
+
+        try:
+            for batch in input_chunks:
+                log_aggregator.update(batch)
+
+        except ValueError:
+            # print error message if the timestamp or bytes conversion is invalid and exit the program
+            print "Error while converting the timestamp or bytes transferred of the parsed records"
+            sys.exit()
+
+        else:
+            return log_aggregator
+
+    def get_checkpoint_parameters(self):
+
+        """Gets the settings the aggregates of a checkpoint depend on, so a checkpoint is resumed only with the same
+        ones."""
+
+        return (self.config.regular_exp.pattern, self.config.regular_exp.flags, self.config.block_window_min,
+                self.config.login_failures_limit, self.config.login_failures_window_sec,
+                self.config.heavy_hitters_capacity)
+
+    def get_incremental_log_aggregator(self, input_file=None, invalid_records=None):
+
+        """Aggregates only the lines appended to the log file since the last checkpoint.
+
+        The checkpoint in the state file holds the byte offset parsed up to and the LogAggregator with the running
+        aggregates of all the lines before it (host visit counts, bandwidth per resource, per second visit histogram,
+        login failure state of the hosts with trailing failures or an active block, and the blocked records). The
+        lines after the byte offset are streamed into the restored aggregator, so the features are identical to a
+        full run over the log file. The log file is parsed from the start if there is no usable checkpoint, e.g. on
+        the first run or if the log file was rotated or truncated. A partially written last line is left for the next
+        run.
+
+        Args:
+            input_file: NASA web server log file.
+            invalid_records: optional list to which the appended lines not matching the regular expression are
+             appended, or a BadRecordsWriter, which then appends them to the bad records file of the previous runs if
+             resumed from the checkpoint.
+
+        Returns:
+            A tuple of the LogAggregator with all the complete lines of the log file aggregated, the byte offset after
+            the last aggregated line and whether the aggregates were resumed from the checkpoint.
+
+        Raises:
+            IOError: if the log file is missing or there is some problem reading it.
+
+        """
+
+        try:
+            checkpoint = load_checkpoint(state_file=self.config.state_file, input_file=input_file,
+                                         parameters=self.get_checkpoint_parameters())
+
+        except (IOError, ValueError) as e:
+            # an unreadable state file is ignored and the log file is parsed from the start
+            print "Error reading the state file, parsing the log file from the start"
+            print "Error Message : " + str(e)
+            checkpoint = None
+
+        if checkpoint is not None:
+            start_offset, log_aggregator = checkpoint
+
+            if isinstance(invalid_records, BadRecordsWriter):
+                invalid_records.append_to_file = True
+
+            print "\nResuming the log file from byte offset {} of the state file : {}".format(start_offset,
+                                                                                            self.config.state_file)
+
+        else:
+            start_offset = 0
+            log_aggregator = self.get_new_log_aggregator()
+
+        end_offset = get_complete_lines_end(input_file=input_file, start_offset=start_offset)
+
+        log_chunks = parse_log_file_chunks(input_file=input_file, regular_exp=self.config.regular_exp,
+                                           chunk_size=self.config.chunk_size, invalid_records=invalid_records,
+                                           start_offset=start_offset, end_offset=end_offset, keep_log_entries=False)
+
+        try:
+            for batch in log_chunks:
+                log_aggregator.update(batch)
+
+        except ValueError:
+            # print error message if the timestamp or bytes conversion is invalid and exit the program
+            print "Error while converting the timestamp or bytes transferred of the parsed records"
+            sys.exit()
+
+        # the blocked log entries are read before the aggregates are checkpointed
+        resolve_blocked_records(input_file=input_file, log_aggregator=log_aggregator)
+
+        return log_aggregator, end_offset, checkpoint is not None
+
+    def checkpoint_log_aggregator(self, input_file=None, byte_offset=0, log_aggregator=None):
+
+        """Saves the byte offset and the running aggregates to the state file for the next incremental run.
+
+        Args:
+            input_file: NASA web server log file.
+            byte_offset: byte offset after the last aggregated line of the log file.
+            log_aggregator: the LogAggregator with all the lines up to byte_offset aggregated.
+
+        """
+
+        try:
+            save_checkpoint(state_file=self.config.state_file, input_file=input_file, byte_offset=byte_offset,
+                            parameters=self.get_checkpoint_parameters(), log_aggregator=log_aggregator)
+
+        except (IOError, OSError) as e:
+            # the next run parses the log file from the start, so only print the error message
+            print "Error writing the state file!!"
+            print "I/O error({0}): {1}".format(e.errno, e.strerror)
+
+    def get_cached_data_frame(self, cache_key=None):
+
+        """Loads the preprocessed data frame and bad records of the log file from the parsed log cache.
+
+        Args:
+            cache_key: the cache key of the parsed log file.
+
+        Returns:
+            A tuple of the cached data frame and the list of bad records, None if the log file is not cached yet or
+            the cache file can not be read.
+
+        """
+
+        try:
+            cached_log_data = load_data_frame(cache_dir=self.config.cache_dir, cache_key=cache_key)
+
+        except (IOError, ValueError, KeyError) as e:
+            # an unreadable cache file is ignored and the log file is parsed again
+            print "Error reading the parsed log cache, parsing the log file again"
+            print "Error Message : " + str(e)
+            return None
+
+        if cached_log_data is not None:
+            print "\nLoaded the parsed log file from the cache : " + self.config.cache_dir
+
+        return cached_log_data
+
+    def cache_data_frame(self, cache_key=None, input_data_frame=None, bad_records=None):
+
+        """Saves the preprocessed data frame and bad records of the log file to the parsed log cache.
+
+        Args:
+            cache_key: the cache key of the parsed log file.
+            input_data_frame: the preprocessed data frame returned by get_data_frame.
+            bad_records: list of the lines which did not match the regular expression.
+
+        """
+
+        try:
+            save_data_frame(cache_dir=self.config.cache_dir, cache_key=cache_key, input_data_frame=input_data_frame,
+                            bad_records=bad_records)
+
+        except (IOError, OSError) as e:
+            # the analysis does not depend on the cache, so only print the error message
+            print "Error writing the parsed log cache!!"
+            print "I/O error({0}): {1}".format(e.errno, e.strerror)
+
+
 def main():
 
     """
-    Main method calls the various methods to extract features from the NASA Web Server logs.
-    First, the log file is parsed and a pandas dataframe is created and preprocessed to
-    get the required columns. Methods to get individual features are called by passing
-    the pandas dataframe as one of the input parameters.
+    Main method extracts the features from the NASA Web Server log file given on the command line with the LogPipeline
+    set up from the command line arguments, and writes them to the output files.
+
+    In follow mode, the live log file is tailed instead and only the blocked attempts (feature 4) are written, as
+    soon as they happen. In map mode, only the partial aggregates of the log file and its bad records are written,
+    and in reduce mode the features are computed from the partial aggregates files given as the log file.
 
     """
 
-    # get the list of parsed records and bad records
-    parsed_records, bad_records = parse_log_file(input_file=LOG_FILE, regular_exp=REGEX)
+    # in follow mode, tail the live log file and write the blocked attempts as they happen
+    if FOLLOW_MODE:
+        PIPELINE.follow(input_file=LOG_FILE, blocked_file=BLOCKED_FILE, bad_records_file=BAD_RECORDS_FILE)
+        return
 
-    # write all the unprocessed records to bad records output file
-    if bad_records is not None and len(bad_records) > 0:
-        write_to_file(output_file=BAD_RECORDS_FILE, input_data=bad_records)
+    output_files = {'hosts': HOSTS_FILE, 'resources': RESOURCES_FILE, 'hours': HOURS_FILE, 'blocked': BLOCKED_FILE,
+                    'busy_periods': BUSY_PERIODS_FILE}
 
-    if len(parsed_records) == 0:
-        print "\nNo records present in the log file for analysis."
+    try:
+        if MAP_FILE is not None:
+            PIPELINE.map_shard(input_file=LOG_FILE, partial_file=MAP_FILE, bad_records_file=BAD_RECORDS_FILE)
+        elif REDUCE_MODE:
+            PIPELINE.reduce_shards(partial_files=LOG_FILE, output_files=output_files)
+        else:
+            PIPELINE.process(input_file=LOG_FILE, bad_records_file=BAD_RECORDS_FILE, output_files=output_files)
+
+    except ValueError as e:
+        # print the error message if a partial aggregates file can not be reduced and terminate the program.
+        print "Error reading the partial aggregates!!"
+        print "Error Message : " + str(e)
         sys.exit()
 
-    # get the pandas data frame from the parsed records for further analysis
-    df_log_data = get_data_frame(input_records=parsed_records)
-
-    if df_log_data is None and len(df_log_data) == 0:
-        print "Invalid dataframe or no records in dataframe to analyze."
+    except (IOError, OSError) as e:
+        # print the error message if issues in opening, reading or decompressing the log file and terminate the
+        # program.
+        print "Error reading the log file!!"
+        print "I/O error({0}): {1}: {2}".format(e.errno, e.strerror, e.filename)
         sys.exit()
 
-    # feature 1 : get the top active hosts
-    top_active_hosts = get_top_n_active_hosts(n=NUM_OF_ACTIVE_HOSTS, input_data_frame=df_log_data)
+    finally:
+        PIPELINE.close()
 
-    # if top active hosts is not none then write to the hosts.txt file
-    if top_active_hosts is not None:
-        write_to_file(output_file=HOSTS_FILE, input_data=top_active_hosts)
-    else:
-        print "Error while getting top 10 active hosts"
 
-    # feature 2 : get the top resources based on the bandwidth used
-    top_resources = get_top_n_resources_max_bandwidth(n=NUM_OF_TOP_RESOURCES, input_data_frame=df_log_data)
+if __name__ == '__main__':
 
-    # if top resources is not none then write to the resources.text file
-    if top_resources is not None:
-        write_to_file(output_file=RESOURCES_FILE, input_data=top_resources)
-    else:
-        print "Error while getting top 10 resources"
+    # parse the command line arguments for the input log file, output files and the optional settings.
+    arg_parser = argparse.ArgumentParser(
+        description='Extracts the features from the NASA web server log file.',
+        epilog='Example Usage : python ./src/process_log.py ./log_input/log.txt ./log_output/hosts.txt '
+               './log_output/hours.txt ./log_output/resources.txt ./log_output/blocked.txt '
+               './log_output/bad_records.txt')
+    arg_parser.add_argument('log_file', help='input NASA web server log file, plain or gzip, bz2 or xz compressed, or a '
+                                             'quoted glob pattern of rotated log files parsed as one log')
+    arg_parser.add_argument('hosts_file', help='file to write the feature 1 i.e. top 10 active hosts')
+    arg_parser.add_argument('hours_file', help='file to write the feature 3 i.e. top busiest hours')
+    arg_parser.add_argument('resources_file', help='file to write the feature 2 i.e. top 10 resources')
+    arg_parser.add_argument('blocked_file', help='file to write the feature 4 i.e. blocked attempts')
+    arg_parser.add_argument('bad_records_file', help='file to write the records not parsed by the regular expression')
+    arg_parser.add_argument('--engine', choices=['pandas', 'single-pass'], default='pandas',
+                            help='pandas builds a dataframe and computes every feature on it, single-pass '
+                                 'aggregates all the features in one pass without a dataframe (default: pandas)')
+    arg_parser.add_argument('--workers', type=int, default=1, metavar='N',
+                            help='number of worker processes parsing the log file in parallel, requires the '
+                                 'single-pass engine (default: 1)')
+    arg_parser.add_argument('--mmap', action='store_true',
+                            help='memory-map the log file and match the regular expression directly against the '
+                                 'mapped bytes, requires the single-pass engine')
+    arg_parser.add_argument('--follow', action='store_true',
+                            help='tail the live log file and append the blocked attempts to the blocked file as they '
+                                 'happen, until interrupted with Ctrl+C')
+    arg_parser.add_argument('--heavy-hitters', type=int, default=0, metavar='K',
+                            help='approximate the top hosts and resources with Space-Saving counters keeping at most '
+                                 'K hosts and K resources, requires the single-pass engine (default: 0 i.e. exact)')
+    arg_parser.add_argument('--state-file', metavar='FILE',
+                            help='checkpoint the byte offset and the running aggregates to this file, so later runs '
+                                 'only parse the lines appended to the log file, requires the single-pass engine')
+    arg_parser.add_argument('--cache-dir', metavar='DIR',
+                            help='directory to cache the parsed log dataframe in, so later runs on the unchanged log '
+                                 'file load it instead of parsing the log file again, requires the pandas engine')
+    arg_parser.add_argument('--threads', type=int, default=1, metavar='N',
+                            help='number of threads computing the features and writing the outputs concurrently '
+                                 '(default: 1)')
+    arg_parser.add_argument('--bad-records-sample', type=float, default=1.0, metavar='RATE',
+                            help='fraction of the bad records written to the bad records file, e.g. 0.01 for every '
+                                 '100th bad record (default: 1.0 i.e. all)')
+    arg_parser.add_argument('--max-bad-records', type=int, metavar='N',
+                            help='write at most N bad records to the bad records file (default: no maximum)')
+    arg_parser.add_argument('--rollup-index', metavar='FILE',
+                            help='save the per minute and per hour rollups of the host visits, resource bandwidth and '
+                                 'status codes to this file, to be queried over any time range with rollup_index.py')
+    arg_parser.add_argument('--sketch-stats', metavar='FILE',
+                            help='save the HyperLogLog sketches of the distinct hosts per hour and per resource and '
+                                 'the quantile sketches of the bytes transferred per resource to this file, to be '
+                                 'merged and queried with cardinality_sketches.py')
+    arg_parser.add_argument('--map', metavar='FILE',
+                            help='map mode: write the mergeable partial aggregates of the log file, one shard of the '
+                                 'log, to this file instead of the features. Only the bad records file is written. '
+                                 'Requires --engine single-pass')
+    arg_parser.add_argument('--reduce', action='store_true',
+                            help='reduce mode: the log file is a glob pattern of the partial aggregates files of the '
+                                 'shards written with --map, merged into the features. The bad records file is not '
+                                 'written. Requires --engine single-pass')
+    arg_parser.add_argument('--busy-periods', metavar='FILE',
+                            help='also write the top 10 busiest periods of every length of --busy-period-windows to '
+                                 'this file, each line prefixed with the period length in minutes')
+    arg_parser.add_argument('--busy-period-windows', default='1,5,60', metavar='MINUTES',
+                            help='comma separated period lengths in minutes of --busy-periods, computed in one sweep '
+                                 '(default: 1,5,60)')
+    arg_parser.add_argument('--metrics', metavar='FILE',
+                            help='write the wall time, CPU time, rows in and out and memory delta of every stage of '
+                                 'the run to this file')
+    arg_parser.add_argument('--metrics-format', choices=['json', 'prometheus'], default='json',
+                            help='format of the metrics file, prometheus writes the Prometheus text exposition format '
+                                 'e.g. for the node exporter textfile collector (default: json)')
+    arg_parser.add_argument('--profile', metavar='FILE',
+                            help='profile the run with cProfile and dump the statistics to this file, to be read '
+                                 'with pstats or snakeviz')
+    args = arg_parser.parse_args()
 
-    # feature 3 : get the busiest periods for the given time window
-    top_busy_periods = get_top_n_busiest_periods(n=NUM_OF_BUSIEST_PERIODS, period_in_minutes=BUSY_PERIOD_WINDOW,
-                                                 input_data_frame=df_log_data)
+    try:
+        BUSY_PERIOD_WINDOWS = [int(period) for period in args.busy_period_windows.split(',')]
+    except ValueError:
+        arg_parser.error('--busy-period-windows must be a comma separated list of minutes')
+
+    # the default parameter values for features 1 to 4 and the engine settings of the arguments, checked by the
+    # pipeline itself. Only the checks of the modes outside of the pipeline are left to the argument parser.
+    PIPELINE_CONFIG = PipelineConfig(engine=args.engine, num_of_workers=args.workers, use_mmap=args.mmap,
+                                     heavy_hitters_capacity=args.heavy_hitters, state_file=args.state_file,
+                                     cache_dir=args.cache_dir, num_of_threads=args.threads,
+                                     rollup_file=args.rollup_index, bad_records_sample_rate=args.bad_records_sample,
+                                     max_bad_records=args.max_bad_records, busy_period_windows=BUSY_PERIOD_WINDOWS,
+                                     sketch_file=args.sketch_stats)
+
+    if args.follow and (args.workers > 1 or args.mmap or args.state_file is not None):
+        arg_parser.error('--follow can not be combined with --workers, --mmap or --state-file')
+
+    if args.follow and (args.metrics is not None or args.profile is not None or args.rollup_index is not None or
+                        args.bad_records_sample < 1 or args.max_bad_records is not None or
+                        args.busy_periods is not None or args.sketch_stats is not None or args.map is not None or
+                        args.reduce):
+        arg_parser.error('--follow can not be combined with --metrics, --profile, --rollup-index, --bad-records-sample, '
+                         '--max-bad-records, --busy-periods, --sketch-stats, --map or --reduce')
+
+    if args.map is not None and args.reduce:
+        arg_parser.error('--map and --reduce can not be combined')
 
-    # if top busiest periods is not none then write to the hours.text file
-    if top_busy_periods is not None:
-        write_to_file(output_file=HOURS_FILE, input_data=top_busy_periods)
-    else:
-        print "Error while getting top 10 busiest periods"
+    try:
+        INPUT_FILES = expand_input_files(args.log_file)
+    except IOError as e:
+        arg_parser.error('{}: {}'.format(e.strerror, e.filename))
 
-    # feature 4 : get the potential blocked entries in case of 3 consecutive login attempts in 20 second window
-    potential_blocked_entries = get_login_failure_blocked_records(blocked_window_time=BLOCK_WINDOW_MIN,
-                                                                  consecutive_failure_limit=LOGIN_FAILURES_LIMIT,
-                                                                  login_failure_window=LOGIN_FAILURES_WINDOW_SEC,
-                                                                  input_data_frame=df_log_data)
+    if args.follow and not is_single_plain_file(INPUT_FILES):
+        arg_parser.error('--follow requires a single uncompressed log file')
 
-    # if the potential blocked entries is not none then write to the blocked.txt file
-    if potential_blocked_entries is not None:
-        write_to_file(output_file=BLOCKED_FILE, input_data=potential_blocked_entries)
-    else:
-        print "Error while getting the potential blocked entries in case of consecutive login failure"
+    # the pipeline with the settings of the arguments, which checks them itself, for the sharded mode and the log
+    # files as well
+    try:
+        PIPELINE = LogPipeline(PIPELINE_CONFIG)
 
+        if args.map is not None or args.reduce:
+            PIPELINE.check_sharded_settings()
 
-if __name__ == '__main__':
+        PIPELINE.check_input_files(INPUT_FILES)
 
-    # check the length command line arguments for missing parameters.
-    if len(sys.argv) != 7:
-        print "Missing command line arguments. 7 arguments expected and " + str(len(sys.argv)) + " provided."
-        print "Example Usage : \n python ./src/process_log.py ./log_input/log.txt ./log_output/hosts.txt " \
-              "./log_output/hours.txt ./log_output/resources.txt ./log_output/blocked.txt " \
-              "./log_output/bad_records.txt\n "
-        sys.exit()
+    except ValueError as e:
+        arg_parser.error(str(e))
+
+    # reading the file path locations from the parsed command line arguments
+    LOG_FILE = os.path.abspath(args.log_file)
+    HOSTS_FILE = os.path.abspath(args.hosts_file)
+    HOURS_FILE = os.path.abspath(args.hours_file)
+    RESOURCES_FILE = os.path.abspath(args.resources_file)
+    BLOCKED_FILE = os.path.abspath(args.blocked_file)
+    BAD_RECORDS_FILE = os.path.abspath(args.bad_records_file)
+    BUSY_PERIODS_FILE = os.path.abspath(args.busy_periods) if args.busy_periods is not None else None
+    FOLLOW_MODE = args.follow
+    MAP_FILE = os.path.abspath(args.map) if args.map is not None else None
+    REDUCE_MODE = args.reduce
 
-    # setting up the various parameter values for features 1 to 4
-    NUM_OF_ACTIVE_HOSTS = 10
-    NUM_OF_TOP_RESOURCES = 10
-    NUM_OF_BUSIEST_PERIODS = 10
-    BUSY_PERIOD_WINDOW = 60
-    BLOCK_WINDOW_MIN = 5
-    LOGIN_FAILURES_LIMIT = 3
-    LOGIN_FAILURES_WINDOW_SEC = 20
-
-    # reading the file path locations from system command line arguments
-    LOG_FILE = os.path.abspath(sys.argv[1])
-    HOSTS_FILE = os.path.abspath(sys.argv[2])
-    HOURS_FILE = os.path.abspath(sys.argv[3])
-    RESOURCES_FILE = os.path.abspath(sys.argv[4])
-    BLOCKED_FILE = os.path.abspath(sys.argv[5])
-    BAD_RECORDS_FILE = os.path.abspath(sys.argv[6])
-
-    # regular expression object to match the line in the server logs.
-    REGEX = re.compile(r"([^\s]+).*?\[(.*)?\s(.*)?\][\s]+\"(.*)?\"[\s]+([^\s]+)[\s]+([^\s]+)")
+    # metrics file and format of the stage metrics, and the file of the cProfile statistics
+    METRICS_FILE = os.path.abspath(args.metrics) if args.metrics is not None else None
+    METRICS_FORMAT = args.metrics_format
+    PROFILE_FILE = os.path.abspath(args.profile) if args.profile is not None else None
+
+    # the busiest periods of all the period lengths are computed along with the features 1 to 4 if requested
+    if BUSY_PERIODS_FILE is not None:
+        PIPELINE.add_feature_stage(get_busy_periods_feature_stage())
 
     # creating a time object to get the current time.
     start_time = time.time()
 
-    # call the main method
-    main()
+    profiler = cProfile.Profile() if PROFILE_FILE is not None else None
+
+    try:
+        # call the main method, under the profiler if requested
+        if profiler is not None:
+            profiler.runcall(main)
+        else:
+            main()
+
+    finally:
+        # write the metrics and the profile even if the run stopped early, e.g. with no records to analyze
+        try:
+            if profiler is not None:
+                profiler.dump_stats(PROFILE_FILE)
+
+            if METRICS_FILE is not None:
+                PIPELINE.metrics.write(metrics_file=METRICS_FILE, metrics_format=METRICS_FORMAT)
+
+        except (IOError, OSError) as e:
+            print "Error writing the metrics or profile file!!"
+            print "I/O error({0}): {1}".format(e.errno, e.strerror)
 
     # print the time taken for the complete execution of the program
     print("\n--- %s seconds ---" % (time.time() - start_time))
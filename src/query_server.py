@@ -0,0 +1,536 @@
+import os
+import sys
+import json
+import time
+import socket
+import urlparse
+import argparse
+import SocketServer
+import BaseHTTPServer
+from collections import OrderedDict
+
+from heavy_hitters import SpaceSavingCounter
+from log_aggregator import ExpiringLoginFailureDetector, format_timestamp
+from log_checkpoint import get_complete_lines_end
+from log_follower import MAX_TRACKED_HOSTS
+from log_input import expand_input_files, is_single_plain_file
+from process_log import PipelineConfig, parse_log_file_chunks, parse_log_files_chunks
+from rollup_index import RollupIndexBuilder, decode_batch_columns, parse_query_time
+from timestamp_decoder import TimestampDecoder
+
+# default port of the localhost HTTP server
+DEFAULT_PORT = 8642
+
+# default maximum number of megabytes of the aggregates kept in memory
+DEFAULT_MEMORY_LIMIT_MB = 512
+
+# default number of seconds between the checks of the loaded log files for appended lines, 0 to never check
+DEFAULT_REFRESH_INTERVAL = 5
+
+# approximate number of bytes of the login failure state of a host
+HOST_STATE_BYTES = 256
+
+# queries answered by the server, the path of the query url
+SERVER_QUERIES = ['hosts', 'resources', 'hours', 'statuses', 'blocked', 'stats']
+
+
+def get_values_memory_size(values=None):
+
+    """Gets the approximate number of bytes of a numpy array, including the objects of an object array."""
+
+    if values.dtype == object:
+        return values.nbytes + sum(sys.getsizeof(value) for value in values)
+
+    return values.nbytes
+
+
+class LogState(object):
+
+    """The aggregates of a log kept in memory by the QueryServer.
+
+    The log is streamed once into a RollupIndexBuilder, answering the feature queries over any time range, and an
+    ExpiringLoginFailureDetector, telling if a host is blocked. The rollup index is built again after the lines
+    appended to a single uncompressed log file are streamed into them, see refresh.
+
+    Like in follow mode, the login failure state of the hosts idle for longer than the login failure and blocked
+    windows is dropped, and at most max_tracked_hosts hosts are tracked. The blocked requests per host are counted by
+    a SpaceSavingCounter of the same capacity, exact until more hosts are blocked.
+
+    Attributes:
+        log_file: the log file path or glob pattern, as given to the server.
+        input_files: the list of the log files parsed as one log.
+        config: the PipelineConfig with the regular expression, chunk size and login failure parameters.
+        rollup_index_builder: the RollupIndexBuilder the records are rolled up in.
+        rollup_index: the RollupIndex of the records streamed so far.
+        max_tracked_hosts: maximum number of hosts with a login failure state and with a blocked requests count.
+        login_failure_detector: the ExpiringLoginFailureDetector of the records streamed so far.
+        host_blocked_counts: SpaceSavingCounter with the host name as key and its number of blocked requests as value.
+        timestamp_decoder: the TimestampDecoder converting the record timestamps to UTC epoch seconds.
+        last_timestamp: UTC epoch seconds of the latest record, None if there is no record.
+        end_offset: byte offset after the last line parsed of a single uncompressed log file, None for other logs.
+        file_id: (device, inode) of the single uncompressed log file, to detect its rotation.
+        memory_size: approximate number of bytes of the aggregates, see build.
+        last_access_time: time of the last query of the log.
+        last_refresh_time: time of the last check of the log file for appended lines.
+
+    """
+
+    def __init__(self, log_file=None, config=None, max_tracked_hosts=MAX_TRACKED_HOSTS):
+        self.log_file = log_file
+        self.input_files = expand_input_files(log_file)
+        self.config = config
+        self.max_tracked_hosts = max_tracked_hosts
+        self.last_access_time = self.last_refresh_time = time.time()
+        self.reset()
+
+    def reset(self):
+
+        """Drops the aggregates, so the log is streamed again from its start."""
+
+        self.rollup_index_builder = RollupIndexBuilder()
+        self.rollup_index = None
+        self.login_failure_detector = ExpiringLoginFailureDetector(
+            blocked_window_time=self.config.block_window_min, consecutive_failure_limit=self.config.login_failures_limit,
+            login_failure_window=self.config.login_failures_window_sec, max_tracked_hosts=self.max_tracked_hosts)
+        self.host_blocked_counts = SpaceSavingCounter(capacity=self.max_tracked_hosts)
+        self.timestamp_decoder = TimestampDecoder()
+        self.last_timestamp = None
+        self.end_offset = 0 if is_single_plain_file(self.input_files) else None
+        self.file_id = None
+        self.memory_size = 0
+
+    def load(self):
+
+        """Streams the log into the aggregates and builds the rollup index.
+
+        Raises:
+            IOError: if there is some problem reading the log file.
+            ValueError: if the timestamp or the bytes transferred of a record can not be converted.
+
+        """
+
+        if self.end_offset is None:
+            self.update(parse_log_files_chunks(input_files=self.input_files, regular_exp=self.config.regular_exp,
+                                               chunk_size=self.config.chunk_size))
+            self.build()
+        else:
+            self.refresh()
+
+    def refresh(self):
+
+        """Streams the complete lines appended to a single uncompressed log file since the last refresh.
+
+        The log file is loaded again from the start if it was rotated or truncated.
+
+        Returns:
+            True if lines were appended, else False.
+
+        Raises:
+            IOError: if there is some problem reading the log file.
+            ValueError: if the timestamp or the bytes transferred of a record can not be converted.
+
+        """
+
+        self.last_refresh_time = time.time()
+
+        if self.end_offset is None:
+            return False
+
+        input_file = self.input_files[0]
+        file_stat = os.stat(input_file)
+
+        if self.file_id is not None and (self.file_id != (file_stat.st_dev, file_stat.st_ino) or
+                                         file_stat.st_size < self.end_offset):
+            print "\nThe log file {} was rotated or truncated, loading it again".format(input_file)
+            self.reset()
+            file_stat = os.stat(input_file)
+
+        end_offset = get_complete_lines_end(input_file=input_file, start_offset=self.end_offset)
+
+        if end_offset == self.end_offset and self.rollup_index is not None:
+            return False
+
+        self.update(parse_log_file_chunks(input_file=input_file, regular_exp=self.config.regular_exp,
+                                          chunk_size=self.config.chunk_size, start_offset=self.end_offset,
+                                          end_offset=end_offset, keep_log_entries=False))
+        self.end_offset = end_offset
+        self.file_id = file_stat.st_dev, file_stat.st_ino
+        self.build()
+
+        return True
+
+    def update(self, input_chunks=None):
+
+        """Streams the parsed record batches into the rollup index builder and the login failure detector."""
+
+        for batch in input_chunks:
+
+            records = decode_batch_columns(batch=batch, timestamp_decoder=self.timestamp_decoder)
+
+            if records is None:
+                continue
+
+            self.rollup_index_builder.update_records(records)
+
+            for host_name, epoch_seconds, http_status_code in zip(records['host_name'],
+                                                                  records['epoch_seconds'].tolist(),
+                                                                  records['http_status_code']):
+                if self.login_failure_detector.update(host_name, epoch_seconds, http_status_code):
+                    self.host_blocked_counts[host_name] += 1
+
+            batch_last_timestamp = int(records['epoch_seconds'].max())
+            self.last_timestamp = batch_last_timestamp if self.last_timestamp is None else \
+                max(self.last_timestamp, batch_last_timestamp)
+
+    def build(self):
+
+        """Builds the rollup index of the records streamed so far and measures the memory of the aggregates.
+
+        The memory of the aggregates counts the arrays of the rollup index and of the partial rollups not merged yet,
+        including the strings of the distinct hosts, resources and status codes, the dictionaries encoding them, and
+        HOST_STATE_BYTES for every host with a login failure state or a blocked requests count. The interpreter, the
+        record batches parsed while the log is streamed and the temporary arrays of a query are not counted.
+
+        """
+
+        self.rollup_index = self.rollup_index_builder.build()
+
+        arrays = list(self.rollup_index.dimension_values.values()) + list(self.rollup_index.second_visits)
+        for rollup in self.rollup_index.rollups.values() + sum(self.rollup_index_builder.partial_rollups.values(), []):
+            arrays.extend(rollup)
+
+        self.memory_size = sum(get_values_memory_size(values) for values in arrays) + \
+            sum(sys.getsizeof(codes) for codes in self.rollup_index_builder.codes.values()) + \
+            HOST_STATE_BYTES * (len(self.login_failure_detector.host_states) + len(self.host_blocked_counts))
+
+    def get_blocked_status(self, host_name=None, timestamp=None):
+
+        """Tells if a host is blocked at the given time, the time of the latest record of the log by default.
+
+        Returns:
+            A dictionary with the host, the time, whether the host is blocked, the end of its block if any, its
+            number of blocked requests in the log and the maximum overestimation of that number.
+
+        Raises:
+            ValueError: if the time is before the latest record, as only the current login state of the hosts is kept.
+
+        """
+
+        if timestamp is None:
+            timestamp = self.last_timestamp if self.last_timestamp is not None else 0
+
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            raise ValueError('the blocked state is only known from the time of the latest record of the log on: ' +
+                             format_timestamp(self.last_timestamp, self.rollup_index.timezone))
+
+        is_blocked = self.login_failure_detector.is_blocked(host_name, timestamp)
+        host_state = self.login_failure_detector.host_states.get(host_name)
+        timezone = self.rollup_index.timezone or '+0000'
+
+        return OrderedDict([
+            ('host', host_name), ('time', format_timestamp(timestamp, timezone)), ('blocked', is_blocked),
+            ('blocked_until', format_timestamp(host_state.block_start_time +
+                                               self.login_failure_detector.blocked_window_seconds, timezone)
+             if is_blocked else None),
+            ('blocked_requests', self.host_blocked_counts[host_name]),
+            ('blocked_requests_error', self.host_blocked_counts.get_error(host_name))])
+
+
+class QueryServer(object):
+
+    """Answers the feature queries on the aggregates of the log files kept in memory.
+
+    The log files are loaded once, on the first query or at start, and the single uncompressed ones are checked for
+    appended lines every refresh_interval seconds. The least recently queried logs are evicted once the aggregates
+    take more than memory_limit bytes, and loaded again on their next query. A log whose aggregates alone take more
+    than memory_limit bytes is evicted as well, with a warning, and its queries fail with a MemoryError, so the limit
+    is never exceeded silently. See LogState.build for what the memory of the aggregates counts.
+
+    Attributes:
+        log_files: the list of the log file paths or glob patterns served, the first one queried by default.
+        config: the PipelineConfig with the regular expression, chunk size and login failure parameters.
+        memory_limit: maximum number of bytes of the aggregates kept in memory.
+        refresh_interval: number of seconds between the checks of the log files for appended lines, 0 to never check.
+        log_states: ordered dictionary with the log file as key and its LogState as value, the least recently queried
+         first.
+        num_queries: number of queries answered.
+        num_evictions: number of logs evicted.
+
+    """
+
+    def __init__(self, log_files=None, config=None, memory_limit=DEFAULT_MEMORY_LIMIT_MB * 1024 * 1024,
+                 refresh_interval=DEFAULT_REFRESH_INTERVAL):
+        self.log_files = list(log_files)
+        self.config = config or PipelineConfig()
+        self.memory_limit = memory_limit
+        self.refresh_interval = refresh_interval
+        self.log_states = OrderedDict()
+        self.num_queries = 0
+        self.num_evictions = 0
+
+    def get_log_state(self, log_file=None):
+
+        """Gets the aggregates of the log file, loading them if they are not in memory.
+
+        Raises:
+            IOError: if there is some problem reading the log file.
+            ValueError: if the log file is not served, or a record can not be converted.
+            MemoryError: if the aggregates of the log file alone take more than the memory limit.
+
+        """
+
+        if log_file is None:
+            log_file = self.log_files[0]
+
+        if log_file not in self.log_files:
+            raise ValueError('the log file is not served: ' + log_file)
+
+        log_state = self.log_states.pop(log_file, None)
+
+        if log_state is None:
+            log_state = LogState(log_file=log_file, config=self.config)
+            log_state.load()
+
+        # the most recently queried log is the last one evicted
+        self.log_states[log_file] = log_state
+        log_state.last_access_time = time.time()
+        self.evict_log_states()
+
+        if log_file not in self.log_states:
+            raise MemoryError('the aggregates of the log file take {} bytes, more than the memory limit of {} bytes: '
+                              '{}'.format(log_state.memory_size, self.memory_limit, log_file))
+
+        return log_state
+
+    def evict_log_states(self):
+
+        """Evicts the least recently queried logs until the aggregates fit in the memory limit. The most recently
+        queried log is evicted too if its aggregates alone take more than the memory limit."""
+
+        while len(self.log_states) > 0 and self.get_memory_size() > self.memory_limit:
+            log_file, log_state = self.log_states.popitem(last=False)
+            self.num_evictions += 1
+
+            if len(self.log_states) == 0:
+                print "\nWarning: the aggregates of {} take {} bytes, more than the memory limit of {} bytes, " \
+                      "evicted them".format(log_file, log_state.memory_size, self.memory_limit)
+            else:
+                print "\nEvicted the aggregates of {} ({} bytes)".format(log_file, log_state.memory_size)
+
+    def get_memory_size(self):
+
+        """Gets the approximate number of bytes of the aggregates in memory."""
+
+        return sum(log_state.memory_size for log_state in self.log_states.values())
+
+    def refresh_log_states(self):
+
+        """Streams the lines appended to the loaded log files, if the refresh interval of a log file is over."""
+
+        if not self.refresh_interval:
+            return
+
+        for log_file, log_state in self.log_states.items():
+            if time.time() - log_state.last_refresh_time >= self.refresh_interval:
+                try:
+                    log_state.refresh()
+                except (IOError, OSError, ValueError) as e:
+                    # the log file is loaded again from the start on its next query
+                    print "\nError refreshing the log file {}, evicting its aggregates".format(log_file)
+                    print "Error Message : " + str(e)
+                    del self.log_states[log_file]
+
+        self.evict_log_states()
+
+    def query(self, query=None, parameters=None):
+
+        """Answers a query.
+
+        Args:
+            query: one of SERVER_QUERIES.
+            parameters: dictionary of the query parameters: log (default: the first log file), start and end of the
+             time range (log file timestamps with an optional timezone, default: the whole log), n (default: 10),
+             period (comma separated minutes of the busiest periods, default: 60), host and at (time of the blocked
+             query from the latest record of the log on, default: the latest record).
+
+        Returns:
+            An ordered dictionary with the log file and the results of the query.
+
+        Raises:
+            IOError: if there is some problem reading the log file.
+            ValueError: if the query or a parameter is invalid.
+            MemoryError: if the aggregates of the log file alone take more than the memory limit.
+
+        """
+
+        if query not in SERVER_QUERIES:
+            raise ValueError('unknown query: ' + repr(query))
+
+        self.num_queries += 1
+
+        if query == 'stats':
+            return OrderedDict([
+                ('memory_size', self.get_memory_size()), ('memory_limit', self.memory_limit),
+                ('num_queries', self.num_queries), ('num_evictions', self.num_evictions),
+                ('logs', [OrderedDict([('log', log_file), ('loaded', log_file in self.log_states),
+                                       ('num_records', self.log_states[log_file].rollup_index.num_records
+                                        if log_file in self.log_states else None),
+                                       ('memory_size', self.log_states[log_file].memory_size
+                                        if log_file in self.log_states else None)])
+                          for log_file in self.log_files])])
+
+        try:
+            n = int(parameters.get('n', 10))
+            periods = [int(period) for period in parameters.get('period', '60').split(',')]
+        except ValueError:
+            raise ValueError('n must be a number and period a comma separated list of minutes')
+
+        if n < 0 or min(periods) < 1:
+            raise ValueError('n must not be negative and every period must be at least 1 minute')
+
+        start_time, end_time = parse_query_time(parameters.get('start')), parse_query_time(parameters.get('end'))
+
+        log_state = self.get_log_state(parameters.get('log'))
+        rollup_index = log_state.rollup_index
+
+        if query == 'hosts':
+            results = rollup_index.get_top_n_active_hosts(n=n, start_time=start_time, end_time=end_time)
+        elif query == 'resources':
+            results = rollup_index.get_top_n_resources_max_bandwidth(n=n, start_time=start_time, end_time=end_time)
+        elif query == 'hours':
+            results = rollup_index.get_top_n_busiest_periods_by_window(n=n, periods_in_minutes=periods,
+                                                                       start_time=start_time, end_time=end_time)
+        elif query == 'statuses':
+            results = rollup_index.get_status_code_counts(start_time=start_time, end_time=end_time)
+        elif 'host' not in parameters:
+            raise ValueError('the blocked query requires a host')
+        else:
+            results = log_state.get_blocked_status(host_name=parameters['host'],
+                                                   timestamp=parse_query_time(parameters.get('at')))
+
+        return OrderedDict([('log', log_state.log_file), ('query', query), ('results', results)])
+
+    def serve(self, http_server=None):
+
+        """Answers the requests of the HTTP server until interrupted, refreshing the log files between them."""
+
+        http_server.query_server = self
+        http_server.timeout = min(self.refresh_interval or 1, 1)
+
+        while True:
+            http_server.handle_request()
+            self.refresh_log_states()
+
+
+class QueryRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    """Handles the GET requests of the queries, e.g. /hosts?n=10&start=01/Jul/1995:00:00:00%20-0400, with a JSON
+    response."""
+
+    def do_GET(self):
+
+        url = urlparse.urlparse(self.path)
+        parameters = dict((name, values[-1]) for name, values in urlparse.parse_qs(url.query).iteritems())
+
+        try:
+            if url.path.strip('/') not in SERVER_QUERIES:
+                status, response = 404, {'error': 'unknown query, the queries are: ' + ', '.join(SERVER_QUERIES)}
+            else:
+                status, response = 200, self.server.query_server.query(url.path.strip('/'), parameters)
+        except ValueError as e:
+            status, response = 400, {'error': str(e)}
+        except MemoryError as e:
+            status, response = 503, {'error': str(e)}
+        except (IOError, OSError) as e:
+            status, response = 500, {'error': 'error reading the log file: ' + str(e)}
+
+        body = json.dumps(response) + '\n'
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+
+        # the clients of a Unix socket have no address
+        client_address = self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+        sys.stderr.write("%s - - [%s] %s\n" % (client_address, self.log_date_time_string(), format % args))
+
+
+class UnixHTTPServer(SocketServer.UnixStreamServer):
+
+    """HTTP server listening on a Unix socket."""
+
+
+if __name__ == '__main__':
+
+    # parse the command line arguments for the log files to serve and the server settings
+    arg_parser = argparse.ArgumentParser(
+        description='Keeps the aggregates of the log files in memory and answers the feature queries over any time '
+                    'range and the blocked host queries over localhost HTTP or a Unix socket, with JSON responses.',
+        epilog="Example Usage : python ./src/query_server.py ./log_input/log.txt --port 8642 ; "
+               "curl 'http://127.0.0.1:8642/hosts?n=5&start=01/Jul/1995:12:00:00%20-0400'")
+    arg_parser.add_argument('log_files', nargs='+', metavar='log_file',
+                            help='NASA web server log file, or glob pattern of rotated and compressed log files, the '
+                                 'first one queried by default')
+    arg_parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                            help='port of the HTTP server on 127.0.0.1 (default: {})'.format(DEFAULT_PORT))
+    arg_parser.add_argument('--socket', metavar='PATH', help='listen on this Unix socket instead of the port')
+    arg_parser.add_argument('--memory-limit', type=int, default=DEFAULT_MEMORY_LIMIT_MB, metavar='MB',
+                            help='evict the aggregates of the least recently queried log files once they take more '
+                                 'megabytes, the queries of a log file whose aggregates alone take more fail '
+                                 '(default: {})'.format(DEFAULT_MEMORY_LIMIT_MB))
+    arg_parser.add_argument('--refresh', type=float, default=DEFAULT_REFRESH_INTERVAL, metavar='SECONDS',
+                            help='check the loaded uncompressed log files for appended lines every SECONDS, 0 to never '
+                                 'check (default: {})'.format(DEFAULT_REFRESH_INTERVAL))
+    arg_parser.add_argument('--lazy', action='store_true',
+                            help='load the log files on their first query instead of at start')
+    args = arg_parser.parse_args()
+
+    if args.memory_limit < 1 or args.refresh < 0:
+        arg_parser.error('--memory-limit must be at least 1 and --refresh must not be negative')
+
+    QUERY_SERVER = QueryServer(log_files=args.log_files, memory_limit=args.memory_limit * 1024 * 1024,
+                               refresh_interval=args.refresh)
+
+    try:
+        if not args.lazy:
+            # load the log files at start, the first one last so it is the last one evicted
+            for LOG_FILE in reversed(args.log_files):
+                QUERY_SERVER.get_log_state(LOG_FILE)
+
+    except (IOError, OSError, ValueError, MemoryError) as e:
+        # print the error message if issues in reading the log files or a log file does not fit in the memory limit
+        print "Error loading the log file!!"
+        print "Error Message : " + str(e)
+        sys.exit(1)
+
+    try:
+        if args.socket is not None:
+            HTTP_SERVER = UnixHTTPServer(args.socket, QueryRequestHandler)
+        else:
+            HTTP_SERVER = BaseHTTPServer.HTTPServer(('127.0.0.1', args.port), QueryRequestHandler)
+
+    except socket.error as e:
+        # print the error message if the port or socket can not be listened on
+        print "Error starting the query server!!"
+        print "Error Message : " + str(e)
+        sys.exit(1)
+
+    print "\nServing the queries on {} (press Ctrl+C to stop)...".format(
+        args.socket if args.socket is not None else 'http://127.0.0.1:{}'.format(args.port))
+
+    try:
+        QUERY_SERVER.serve(HTTP_SERVER)
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        HTTP_SERVER.server_close()
+        if args.socket is not None and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+    print "\nStopped the query server."
@@ -0,0 +1,563 @@
+import os
+import sys
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+from log_aggregator import get_top_n_busiest_windows, get_top_n_busiest_windows_by_length, format_timestamp, \
+    format_busiest_periods_by_window
+from atomic_file import atomic_write
+from log_cache import encode_string_column, decode_string_values
+from timestamp_decoder import TimestampDecoder
+
+# version of the rollup index layout, an index with another version is not loaded
+ROLLUP_FORMAT_VERSION = 1
+
+# rolled up dimensions, with the array key prefix and the name of their distinct values
+ROLLUP_DIMENSIONS = [('hosts', 'host_names'), ('uris', 'uris'), ('statuses', 'status_codes')]
+
+# number of partial rollups of record batches kept before they are merged
+MAX_PARTIAL_ROLLUPS = 16
+
+
+def reduce_bucket_values(buckets=None, codes=None, values=None):
+
+    """Sums the values of the same bucket and code.
+
+    Args:
+        buckets: int64 numpy array with the time bucket of every value. E.g. the epoch minute
+        codes: int32 numpy array with the code of the host, uri or status code of every value.
+        values: int64 numpy array of the values.
+
+    Returns:
+        A tuple of the buckets, codes and summed values numpy arrays, with every (bucket, code) pair once and sorted
+        by bucket and code.
+
+    """
+
+    if len(buckets) == 0:
+        return buckets, codes, values
+
+    order = np.lexsort((codes, buckets))
+    buckets, codes, values = buckets[order], codes[order], values[order]
+
+    # the first position of every distinct (bucket, code) pair
+    group_starts = np.concatenate(([0], np.flatnonzero((buckets[1:] != buckets[:-1]) | (codes[1:] != codes[:-1])) + 1))
+
+    return buckets[group_starts], codes[group_starts], np.add.reduceat(values, group_starts)
+
+
+def decode_batch_columns(batch=None, timestamp_decoder=None):
+
+    """Preprocesses a columnar batch of parsed log records like the features, as numpy arrays.
+
+    The records with an empty http request are skipped, '-' bytes transferred are counted as 0 and the uri is
+    extracted from the http request. Every column is factorized first, so the http requests, timestamps and bytes
+    transferred are converted once per distinct value of the batch instead of once per record.
+
+    Args:
+        batch: dictionary with the column headers as keys and the list of column values as values, as yielded by
+         parse_log_file_chunks.
+        timestamp_decoder: the TimestampDecoder converting the record timestamps to UTC epoch seconds.
+
+    Returns:
+        A dictionary with the host_name, uri and http_status_code object arrays, the epoch_seconds and
+        bytes_transferred int64 arrays of the records and the timezone of the first record, None if there is no
+        record with an http request.
+
+    Raises:
+        ValueError: if the timestamp or the bytes transferred of a record can not be converted.
+
+    """
+
+    request_codes, http_requests = pd.factorize(np.asarray(batch['http_request'], dtype=object))
+
+    # the uri of every distinct http request, None for the empty ones
+    request_uris = np.empty(len(http_requests), dtype=object)
+    for i, http_request in enumerate(http_requests):
+        request_parts = str(http_request).strip().split()
+        request_uris[i] = request_parts[1] if len(request_parts) > 1 else request_parts[0] if request_parts else None
+
+    # skip the records with empty http_request field
+    is_valid = np.not_equal(request_uris, None)[request_codes]
+
+    if not is_valid.any():
+        return None
+
+    timestamp_codes, timestamps = pd.factorize(np.asarray(batch['timestamp'], dtype=object)[is_valid])
+    timezone_codes, timezones = pd.factorize(np.asarray(batch['timezone'], dtype=object)[is_valid])
+    bytes_codes, bytes_values = pd.factorize(np.asarray(batch['bytes_transferred'], dtype=object)[is_valid])
+
+    local_seconds = np.array([timestamp_decoder.decode_local(timestamp) for timestamp in timestamps], dtype=np.int64)
+    timezone_offsets = np.array([timestamp_decoder.get_timezone_offset(timezone) for timezone in timezones],
+                                dtype=np.int64)
+
+    return {
+        'host_name': np.asarray(batch['host_name'], dtype=object)[is_valid],
+        'uri': request_uris[request_codes[is_valid]],
+        'http_status_code': np.asarray(batch['http_status_code'], dtype=object)[is_valid],
+        'epoch_seconds': local_seconds[timestamp_codes] - timezone_offsets[timezone_codes],
+        'bytes_transferred': np.array([0 if bytes_transferred == '-' else int(bytes_transferred)
+                                       for bytes_transferred in bytes_values], dtype=np.int64)[bytes_codes],
+        'timezone': timezones[timezone_codes[0]],
+    }
+
+
+class RollupIndexBuilder(object):
+
+    """Builder of the rollup index from the streamed record batches of the log file.
+
+    Every batch is rolled up into the visits per minute and host, the bandwidth per minute and uri, the visits per
+    minute and status code and the visits per second. The partial rollups of the batches are merged every
+    MAX_PARTIAL_ROLLUPS batches, so the memory used is proportional to the number of distinct (minute, host) and
+    (minute, uri) pairs and not to the number of records. The records are preprocessed like the features: the records
+    with an empty http request are skipped, '-' bytes transferred are counted as 0 and the uri is extracted from the
+    http request.
+
+    Attributes:
+        codes: dictionary with the dimension as key and the dictionary of the distinct values to their codes as value.
+        partial_rollups: dictionary with the dimension or 'seconds' as key and the list of the (buckets, codes,
+         values) tuples of the partial rollups as value.
+        timestamp_decoder: the TimestampDecoder converting the record timestamps to UTC epoch seconds.
+        timezone: the timezone of the first record, in which the busiest periods are displayed.
+        num_records: number of records rolled up.
+
+    """
+
+    def __init__(self):
+        self.codes = dict((dimension, dict()) for dimension, values_name in ROLLUP_DIMENSIONS)
+        self.partial_rollups = dict((dimension, list()) for dimension in self.codes.keys() + ['seconds'])
+        self.timestamp_decoder = TimestampDecoder()
+        self.timezone = None
+        self.num_records = 0
+
+    def update(self, batch=None):
+
+        """Rolls up a columnar batch of parsed log records as yielded by parse_log_file_chunks.
+
+        Raises:
+            ValueError: if the timestamp or the bytes transferred of a record can not be converted.
+
+        """
+
+        records = decode_batch_columns(batch=batch, timestamp_decoder=self.timestamp_decoder)
+
+        if records is not None:
+            self.update_records(records)
+
+    def update_records(self, records=None):
+
+        """Rolls up the preprocessed records of a batch, as returned by decode_batch_columns."""
+
+        if self.timezone is None:
+            self.timezone = records['timezone']
+
+        epoch_seconds = records['epoch_seconds']
+        minutes = epoch_seconds // 60
+        visits = np.ones(len(epoch_seconds), dtype=np.int64)
+
+        self.add_partial_rollup('hosts', minutes, self.get_codes('hosts', records['host_name']), visits)
+        self.add_partial_rollup('uris', minutes, self.get_codes('uris', records['uri']), records['bytes_transferred'])
+        self.add_partial_rollup('statuses', minutes, self.get_codes('statuses', records['http_status_code']), visits)
+        self.add_partial_rollup('seconds', epoch_seconds, np.zeros(len(epoch_seconds), dtype=np.int32), visits)
+
+        self.num_records += len(epoch_seconds)
+
+    def get_codes(self, dimension=None, values=None):
+
+        """Gets the codes of the values of a batch, adding the new distinct values to the codes of the dimension.
+
+        Returns:
+            An int32 numpy array with the code of every value.
+
+        """
+
+        codes = self.codes[dimension]
+        value_codes, distinct_values = pd.factorize(values)
+
+        return np.array([codes.setdefault(value, len(codes)) for value in distinct_values], dtype=np.int32)[value_codes]
+
+    def add_partial_rollup(self, dimension=None, buckets=None, codes=None, values=None):
+
+        """Adds the rollup of a batch to the partial rollups of the dimension, merging them if there are too many."""
+
+        partial_rollups = self.partial_rollups[dimension]
+        partial_rollups.append(reduce_bucket_values(buckets, codes, values))
+
+        if len(partial_rollups) >= MAX_PARTIAL_ROLLUPS:
+            partial_rollups[:] = [self.merge_partial_rollups(dimension)]
+
+    def merge_partial_rollups(self, dimension=None):
+
+        """Merges the partial rollups of the dimension into one (buckets, codes, values) tuple."""
+
+        partial_rollups = self.partial_rollups[dimension]
+
+        if len(partial_rollups) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int64)
+
+        return reduce_bucket_values(*[np.concatenate(arrays) for arrays in zip(*partial_rollups)])
+
+    def iterate(self, input_chunks=None):
+
+        """Rolls up every record batch of the iterable as it is streamed to the next stage.
+
+        Yields:
+            Every record batch of input_chunks.
+
+        """
+
+        for batch in input_chunks:
+            self.update(batch)
+            yield batch
+
+    def build(self):
+
+        """Builds the rollup index from the rolled up records.
+
+        The codes of every dimension are renumbered in the sorted order of their values, so the ties of the top n
+        queries are in lexicographical order, and the minute rollups are rolled up once more by hour. The merged
+        partial rollups are kept, so more records can be rolled up and the index built again.
+
+        Returns:
+            The RollupIndex.
+
+        """
+
+        rollups = dict()
+        dimension_values = dict()
+
+        for dimension, values_name in ROLLUP_DIMENSIONS:
+
+            values = np.empty(len(self.codes[dimension]), dtype=object)
+            for value, code in self.codes[dimension].iteritems():
+                values[code] = value
+
+            # new code of every old code in the sorted order of the values
+            sort_order = np.argsort(values, kind='mergesort')
+            sorted_codes = np.empty(len(values), dtype=np.int32)
+            sorted_codes[sort_order] = np.arange(len(values), dtype=np.int32)
+
+            minutes, codes, minute_values = self.merge_partial_rollups(dimension)
+            self.partial_rollups[dimension] = [(minutes, codes, minute_values)]
+            rollups['minute_' + dimension] = reduce_bucket_values(minutes, sorted_codes[codes], minute_values)
+            rollups['hour_' + dimension] = reduce_bucket_values(minutes // 60, sorted_codes[codes], minute_values)
+            dimension_values[dimension] = values[sort_order]
+
+        seconds, codes, visits = self.merge_partial_rollups('seconds')
+        self.partial_rollups['seconds'] = [(seconds, codes, visits)]
+
+        return RollupIndex(dimension_values=dimension_values, rollups=rollups, second_visits=(seconds, visits),
+                           timezone=self.timezone, num_records=self.num_records)
+
+
+class RollupIndex(object):
+
+    """Time bucketed rollups of the log file answering the feature queries over any time range.
+
+    The host visits, uri bandwidth and status code visits are kept per minute and per hour as sparse (bucket, code,
+    value) arrays sorted by bucket, and the visits per second for the busiest periods. A query sums the hour buckets
+    fully inside the time range and the minute buckets of the partial hours at its ends, so it reads at most 118
+    minute buckets plus one bucket per hour of the range instead of the raw log.
+
+    The time ranges are UTC epoch seconds [start_time, end_time), rounded down to the minute for the host, uri and
+    status code queries. None is an open end of the range.
+
+    Attributes:
+        dimension_values: dictionary with the dimension (hosts, uris or statuses) as key and the numpy object array of
+         its sorted distinct values as value, indexed by the codes of the rollups.
+        rollups: dictionary with minute_<dimension> and hour_<dimension> as keys and the (buckets, codes, values)
+         tuples of the rollups as values. The buckets are the epoch minutes or hours.
+        second_visits: tuple of the sorted epoch seconds with visits and the number of visits in each.
+        timezone: the timezone of the first record, in which the busiest periods are displayed.
+        num_records: number of records in the index.
+
+    """
+
+    def __init__(self, dimension_values=None, rollups=None, second_visits=None, timezone=None, num_records=0):
+        self.dimension_values = dimension_values
+        self.rollups = rollups
+        self.second_visits = second_visits
+        self.timezone = timezone
+        self.num_records = num_records
+
+    def get_totals(self, dimension=None, start_time=None, end_time=None):
+
+        """Sums the values of every host, uri or status code over the time range.
+
+        Args:
+            dimension: hosts, uris or statuses.
+            start_time: UTC epoch seconds of the start of the range, None for the start of the log.
+            end_time: UTC epoch seconds of the end of the range (excluded), None for the end of the log.
+
+        Returns:
+            A tuple of an int64 numpy array with the total of every code of the dimension and a boolean numpy array
+            telling which codes occur in the time range, as a total can be 0 e.g. for a resource of 0 bytes.
+
+        """
+
+        num_codes = len(self.dimension_values[dimension])
+        minute_buckets = self.rollups['minute_' + dimension][0]
+
+        if len(minute_buckets) == 0:
+            return np.zeros(num_codes, dtype=np.int64), np.zeros(num_codes, dtype=bool)
+
+        start_minute = start_time // 60 if start_time is not None else int(minute_buckets[0])
+        end_minute = end_time // 60 if end_time is not None else int(minute_buckets[-1]) + 1
+
+        # the hours fully inside the range are read from the hour rollup, the rest from the minute rollup
+        start_hour, end_hour = -(-start_minute // 60), end_minute // 60
+
+        if start_hour < end_hour:
+            bucket_ranges = [('minute_', start_minute, start_hour * 60), ('hour_', start_hour, end_hour),
+                             ('minute_', end_hour * 60, end_minute)]
+        else:
+            bucket_ranges = [('minute_', start_minute, end_minute)]
+
+        codes, values = list(), list()
+
+        for granularity, start_bucket, end_bucket in bucket_ranges:
+            buckets, bucket_codes, bucket_values = self.rollups[granularity + dimension]
+            start, end = np.searchsorted(buckets, [start_bucket, end_bucket])
+            codes.append(bucket_codes[start:end])
+            values.append(bucket_values[start:end])
+
+        codes = np.concatenate(codes)
+
+        # summed as int64, exact for any total, unlike the float64 weights of np.bincount above 2 ** 53
+        totals = np.zeros(num_codes, dtype=np.int64)
+        np.add.at(totals, codes, np.concatenate(values).astype(np.int64))
+
+        return totals, np.bincount(codes, minlength=num_codes) > 0
+
+    def get_top_n(self, dimension=None, n=0, start_time=None, end_time=None):
+
+        """Gets the n values of the dimension with the largest totals over the time range.
+
+        Returns:
+            A list of (value, total) tuples in descending order of the totals, the ties in lexicographical order.
+
+        """
+
+        totals, present = self.get_totals(dimension, start_time, end_time)
+        present_codes = np.flatnonzero(present)
+
+        # the codes are in the sorted order of the values, so the code breaks the ties
+        top_codes = present_codes[np.lexsort((present_codes, -totals[present_codes]))[:n]]
+
+        return zip(self.dimension_values[dimension][top_codes].tolist(), totals[top_codes].tolist())
+
+    def get_top_n_active_hosts(self, n=0, start_time=None, end_time=None):
+
+        """Fetches the top n active hosts of the time range with the visit counts separated by a comma, like
+        feature 1."""
+
+        return [host_name + ',' + str(visits) for host_name, visits in
+                self.get_top_n('hosts', n, start_time, end_time)]
+
+    def get_top_n_resources_max_bandwidth(self, n=0, start_time=None, end_time=None):
+
+        """Fetches the top n resources of the time range based on the bandwidth consumed, like feature 2."""
+
+        return [uri for uri, bandwidth in self.get_top_n('uris', n, start_time, end_time)]
+
+    def get_status_code_counts(self, start_time=None, end_time=None):
+
+        """Fetches the number of visits of every http status code of the time range separated by a comma."""
+
+        totals, present = self.get_totals('statuses', start_time, end_time)
+
+        return [status_code + ',' + str(visits) for status_code, visits, is_present in
+                zip(self.dimension_values['statuses'].tolist(), totals.tolist(), present.tolist()) if is_present]
+
+    def get_top_n_busiest_periods(self, n=0, period_in_minutes=0, start_time=None, end_time=None):
+
+        """Fetches the n busiest periods of the visits in the time range with the number of visits separated by a
+        comma, like feature 3. The time range is not rounded for the busiest periods."""
+
+        busiest_periods = get_top_n_busiest_windows(n=n, window_seconds=period_in_minutes * 60,
+                                                    timestamp_visit_counts=self.get_second_visits(start_time,
+                                                                                                  end_time),
+                                                    timezone=self.timezone)
+
+        return [format_timestamp(window_start, self.timezone) + ',' + str(num_visits_in_window)
+                for window_start, num_visits_in_window in busiest_periods]
+
+    def get_top_n_busiest_periods_by_window(self, n=0, periods_in_minutes=None, start_time=None, end_time=None):
+
+        """Fetches the n busiest periods of every period length in minutes of the visits in the time range in one
+        sweep, as an ordered dictionary with the period in minutes as key and the list of busiest periods as value."""
+
+        return format_busiest_periods_by_window(
+            get_top_n_busiest_windows_by_length(n=n, window_lengths=[period * 60 for period in periods_in_minutes],
+                                                timestamp_visit_counts=self.get_second_visits(start_time, end_time),
+                                                timezone=self.timezone),
+            timezone=self.timezone)
+
+    def get_second_visits(self, start_time=None, end_time=None):
+
+        """Gets the dictionary of the number of visits per second of the time range, with the epoch seconds as key."""
+
+        seconds, visits = self.second_visits
+        start, end = np.searchsorted(seconds, [start_time if start_time is not None else seconds[:1].sum(),
+                                               end_time if end_time is not None else sys.maxint])
+
+        return dict(zip(seconds[start:end].tolist(), visits[start:end].tolist()))
+
+    def save(self, index_file=None):
+
+        """Saves the rollup index to the index file as numpy arrays in one .npz file.
+
+        The file is written to a temporary file first and then renamed, so a partially written index is never read.
+
+        Raises:
+            IOError: if there is some problem writing the index file.
+            OSError: if there is some problem opening or renaming the index file.
+
+        """
+
+        arrays = dict()
+
+        for dimension, values_name in ROLLUP_DIMENSIONS:
+            arrays[values_name + '_blob'], arrays[values_name + '_offsets'] = \
+                encode_string_column(self.dimension_values[dimension])[1:]
+
+            for granularity in ('minute_', 'hour_'):
+                for array_name, array in zip(('buckets', 'codes', 'values'), self.rollups[granularity + dimension]):
+                    arrays['{}{}_{}'.format(granularity, dimension, array_name)] = array
+
+        arrays['seconds'], arrays['second_visits'] = self.second_visits
+        arrays['manifest'] = np.frombuffer(json.dumps({'version': ROLLUP_FORMAT_VERSION, 'timezone': self.timezone,
+                                                       'num_records': self.num_records}), dtype=np.uint8)
+
+        with atomic_write(index_file) as output_file:
+            np.savez(output_file, **arrays)
+
+
+def load_rollup_index(index_file=None):
+
+    """Loads the rollup index saved by RollupIndex.save.
+
+    Raises:
+        IOError: if there is some problem reading the index file.
+        ValueError: if the index file is not a rollup index of the current version.
+
+    """
+
+    index_arrays = np.load(index_file, allow_pickle=False)
+
+    try:
+        manifest = json.loads(index_arrays['manifest'].tostring())
+
+        if manifest.get('version') != ROLLUP_FORMAT_VERSION:
+            raise ValueError('unsupported rollup index version: ' + repr(manifest.get('version')))
+
+        dimension_values = dict()
+        rollups = dict()
+
+        for dimension, values_name in ROLLUP_DIMENSIONS:
+            dimension_values[dimension] = decode_string_values(index_arrays[values_name + '_blob'],
+                                                               index_arrays[values_name + '_offsets'])
+
+            for granularity in ('minute_', 'hour_'):
+                rollups[granularity + dimension] = tuple(
+                    index_arrays['{}{}_{}'.format(granularity, dimension, array_name)]
+                    for array_name in ('buckets', 'codes', 'values'))
+
+        second_visits = index_arrays['seconds'], index_arrays['second_visits']
+
+    except KeyError as e:
+        raise ValueError('invalid rollup index: missing ' + str(e))
+
+    finally:
+        index_arrays.close()
+
+    return RollupIndex(dimension_values=dimension_values, rollups=rollups, second_visits=second_visits,
+                       timezone=manifest['timezone'], num_records=manifest['num_records'])
+
+
+def parse_query_time(query_time=None):
+
+    """Converts a query time in the log file timestamp format and its optional timezone to UTC epoch seconds.
+
+    Args:
+        query_time: the time string. E.g. 01/Jul/1995:00:00:00 -0400
+
+    Returns:
+        The UTC epoch seconds, None if no time is given. A time without a timezone is read as UTC.
+
+    Raises:
+        ValueError: if the time is not a log file timestamp, optionally followed by a [+-]HHMM timezone.
+
+    """
+
+    if query_time is None:
+        return None
+
+    timestamp, _, timezone = query_time.strip().partition(' ')
+
+    return TimestampDecoder().decode(timestamp, timezone.strip() or None)
+
+
+if __name__ == '__main__':
+
+    # parse the command line arguments for the index file, the query and its time range
+    arg_parser = argparse.ArgumentParser(
+        description='Answers the feature queries over a time range from the rollup index built by process_log.',
+        epilog="Example Usage : python ./src/rollup_index.py ./log_output/rollup.npz hosts "
+               "--start '01/Jul/1995:00:00:00 -0400' --end '02/Jul/1995:00:00:00 -0400'")
+    arg_parser.add_argument('index_file', help='rollup index file written by process_log.py --rollup-index')
+    arg_parser.add_argument('query', choices=['hosts', 'resources', 'hours', 'statuses'],
+                            help='top active hosts, top bandwidth-intensive resources, busiest periods or visits per '
+                                 'http status code')
+    arg_parser.add_argument('--start', metavar='TIME',
+                            help="start of the time range like '01/Jul/1995:00:00:00 -0400' (default: start of log)")
+    arg_parser.add_argument('--end', metavar='TIME', help='end of the time range, excluded (default: end of log)')
+    arg_parser.add_argument('-n', type=int, default=10, help='number of top values (default: 10)')
+    arg_parser.add_argument('--period', default='60', metavar='MINUTES',
+                            help='length of the busiest periods in minutes, or comma separated lengths swept at once, '
+                                 'each output line then prefixed with its length (default: 60)')
+    args = arg_parser.parse_args()
+
+    try:
+        query_periods = [int(period) for period in args.period.split(',')]
+    except ValueError:
+        query_periods = list()
+
+    if not query_periods or min(query_periods) < 1:
+        arg_parser.error('--period must be a comma separated list of minutes, each at least 1')
+
+    try:
+        query_start_time, query_end_time = parse_query_time(args.start), parse_query_time(args.end)
+    except ValueError as e:
+        arg_parser.error('invalid --start or --end time: ' + str(e))
+
+    try:
+        rollup_index = load_rollup_index(index_file=args.index_file)
+
+    except (IOError, ValueError) as e:
+        # print the error message if issues in reading the rollup index
+        print "Error reading the rollup index!!"
+        print "Error Message : " + str(e)
+        sys.exit(1)
+
+    if args.query == 'hosts':
+        query_output = rollup_index.get_top_n_active_hosts(n=args.n, start_time=query_start_time,
+                                                           end_time=query_end_time)
+    elif args.query == 'resources':
+        query_output = rollup_index.get_top_n_resources_max_bandwidth(n=args.n, start_time=query_start_time,
+                                                                      end_time=query_end_time)
+    elif args.query == 'hours' and len(query_periods) == 1:
+        query_output = rollup_index.get_top_n_busiest_periods(n=args.n, period_in_minutes=query_periods[0],
+                                                              start_time=query_start_time, end_time=query_end_time)
+    elif args.query == 'hours':
+        query_output = [str(period) + ',' + busiest_period for period, busiest_periods in
+                        rollup_index.get_top_n_busiest_periods_by_window(
+                            n=args.n, periods_in_minutes=query_periods, start_time=query_start_time,
+                            end_time=query_end_time).iteritems()
+                        for busiest_period in busiest_periods]
+    else:
+        query_output = rollup_index.get_status_code_counts(start_time=query_start_time, end_time=query_end_time)
+
+    print "\n".join(query_output)
@@ -0,0 +1,443 @@
+import os
+import json
+import zipfile
+import numpy as np
+
+from atomic_file import atomic_write
+from log_aggregator import LogAggregator, HostLoginState
+from log_cache import encode_string_column, decode_string_column, decode_string_values
+
+# version of the partial aggregates file layout, the files of different versions can not be reduced together
+PARTIAL_FORMAT_VERSION = 2
+
+# header fields of the partial aggregates file, saved in its JSON manifest
+HEADER_FIELDS = ('shard_start_time', 'shard_end_time', 'timezone', 'num_records', 'num_valid_records',
+                 'num_invalid_records')
+
+
+class ShardAggregator(LogAggregator):
+
+    """LogAggregator of one shard of the log, whose partial aggregates are merged with the other shards later.
+
+    The host visit counts, bandwidth per resource and per second visit histogram of the shards simply add up. The
+    login failures of a host depend on its requests in the earlier shards though, through the state the shard starts
+    with: trailing failed logins or an active block. The login failures are detected in the shard as if every host
+    started without any state, and every host is tracked until its state is the same whatever it started with, its
+    sync point: the first successful request more than blocked_window_time after the start of the shard and after the
+    last failed login of the host. No block can be active then, so the request clears the state of the host in any
+    case. The requests of a host before its sync point, its head, are kept to be replayed from the actual state by
+    merge_partial_aggregates, while the blocked requests and the state after the sync point are final.
+
+    Only the hosts with requests near the start of the shard, or failing their logins before their sync point, have
+    a head, so the heads are a small part of the shard.
+
+    Attributes:
+        shard_start_time: timestamp of the first record of the shard, None if there are no records.
+        shard_end_time: latest timestamp of the shard.
+        host_heads: dictionary with the host name as key and the list of (timestamp, http status code, sequence
+         number, log entry) tuples of its requests before the sync point as value, for the hosts with any request
+         before it.
+        synced_hosts: set of the host names past their sync point.
+        host_last_failures: dictionary with the host name as key and the timestamp of its last failed login as
+         value, for the hosts before their sync point.
+        num_login_records: number of records fed to the login failure detector, the sequence number of the next one.
+        blocked_records: list of (host name, timestamp, sequence number, log entry) tuples of the requests blocked
+         after the sync point of their host.
+
+    """
+
+    def __init__(self, blocked_window_time=0, consecutive_failure_limit=0, login_failure_window=0):
+        super(ShardAggregator, self).__init__(blocked_window_time=blocked_window_time,
+                                              consecutive_failure_limit=consecutive_failure_limit,
+                                              login_failure_window=login_failure_window)
+        self.shard_start_time = None
+        self.shard_end_time = None
+        self.host_heads = dict()
+        self.synced_hosts = set()
+        self.host_last_failures = dict()
+        self.num_login_records = 0
+
+    def update_login_state(self, host_name=None, epoch_seconds=0, http_status_code=None, log_entry=None):
+
+        """Feeds a record to the login failure detector, keeping it in the head of its host before the sync point
+        and recording it if it would have been blocked after the sync point.
+
+        Args:
+            host_name: the host/IP address making the request
+            epoch_seconds: the request timestamp in epoch seconds
+            http_status_code: the http status code string of the request. E.g. '401'
+            log_entry: the complete log line of the request
+
+        """
+
+        sequence_number = self.num_login_records
+        self.num_login_records += 1
+
+        if self.shard_start_time is None:
+            self.shard_start_time = epoch_seconds
+        self.shard_end_time = max(self.shard_end_time, epoch_seconds)
+
+        is_blocked = self.login_failure_detector.update(host_name, epoch_seconds, http_status_code)
+
+        if host_name in self.synced_hosts:
+            if is_blocked:
+                self.blocked_records.append((host_name, epoch_seconds, sequence_number, log_entry))
+            return
+
+        blocked_window_seconds = self.login_failure_detector.blocked_window_seconds
+        last_failure_time = self.host_last_failures.get(host_name)
+
+        # a successful request out of reach of any block clears the state of the host, whatever it started with
+        if http_status_code != '401' and \
+                epoch_seconds - self.shard_start_time > blocked_window_seconds and \
+                (last_failure_time is None or
+                 epoch_seconds - last_failure_time > blocked_window_seconds):
+            self.synced_hosts.add(host_name)
+            self.host_last_failures.pop(host_name, None)
+            return
+
+        self.host_heads.setdefault(host_name, list()).append((epoch_seconds, http_status_code, sequence_number,
+                                                              log_entry))
+
+        if http_status_code == '401':
+            self.host_last_failures[host_name] = epoch_seconds
+
+    def get_partial_aggregates(self, num_valid_records=0, num_invalid_records=0):
+
+        """Gets the partial aggregates of the shard to be saved with save_partial_aggregates.
+
+        Args:
+            num_valid_records: number of lines of the shard matching the regular expression.
+            num_invalid_records: number of lines of the shard not matching the regular expression.
+
+        Returns:
+            A tuple of the header dictionary, with the shard time range and record counts, and the dictionary of the
+            partial aggregates.
+
+        """
+
+        header = {
+            'shard_start_time': self.shard_start_time,
+            'shard_end_time': self.shard_end_time,
+            'timezone': self.timezone,
+            'num_records': self.num_records,
+            'num_valid_records': num_valid_records,
+            'num_invalid_records': num_invalid_records,
+        }
+
+        # the state at the end of the shard of the synced hosts, the state of the other hosts comes from their heads
+        host_states = dict((host_name, (host_state.failure_timestamps, host_state.block_start_time))
+                           for host_name, host_state in self.login_failure_detector.host_states.iteritems()
+                           if host_name in self.synced_hosts)
+
+        partial_aggregates = {
+            'host_visit_counts': dict(self.host_visit_counts),
+            'uri_bandwidth': dict(self.uri_bandwidth),
+            'timestamp_visit_counts': dict(self.timestamp_visit_counts),
+            'host_heads': self.host_heads,
+            'synced_head_hosts': set(host_name for host_name in self.host_heads if host_name in self.synced_hosts),
+            'synced_host_states': host_states,
+            'blocked_records': self.blocked_records,
+        }
+
+        return header, partial_aggregates
+
+
+def encode_login_records(arrays=None, prefix=None, login_records=None, host_codes=None):
+
+    """Adds the (host name, timestamp, sequence number, log entry) tuples of the login records to the arrays of the
+    partial aggregates file, the host names as their codes."""
+
+    host_names, epoch_seconds, sequence_numbers, log_entries = zip(*login_records) if login_records else ((), ) * 4
+
+    arrays[prefix + 'hosts'] = np.array([host_codes[host_name] for host_name in host_names], dtype=np.int32)
+    arrays[prefix + 'seconds'] = np.array(epoch_seconds, dtype=np.int64)
+    arrays[prefix + 'sequence_numbers'] = np.array(sequence_numbers, dtype=np.int64)
+    arrays[prefix + 'entries'], arrays[prefix + 'entries_blob'], arrays[prefix + 'entries_offsets'] = \
+        encode_string_column(log_entries)
+
+
+def decode_login_records(partial_arrays=None, prefix=None, host_names=None):
+
+    """Gets the list of (host name, timestamp, sequence number, log entry) tuples of the login records added by
+    encode_login_records."""
+
+    return zip(host_names[partial_arrays[prefix + 'hosts']].tolist(), partial_arrays[prefix + 'seconds'].tolist(),
+               partial_arrays[prefix + 'sequence_numbers'].tolist(),
+               decode_string_column(partial_arrays[prefix + 'entries'], partial_arrays[prefix + 'entries_blob'],
+                                    partial_arrays[prefix + 'entries_offsets']).tolist())
+
+
+def save_partial_aggregates(partial_file=None, parameters=None, header=None, partial_aggregates=None):
+
+    """Saves the partial aggregates of a shard to the partial aggregates file as numpy arrays in one compressed .npz
+    file.
+
+    The header and the parameters are saved in a JSON manifest, so the shards can be ordered by loading the headers
+    only. The host names and resources are dictionary encoded with their counts in aligned arrays, and the heads, the
+    state of the synced hosts and the blocked records refer to the hosts by their codes. The file holds no pickled
+    objects, so it is loaded with allow_pickle=False and does not depend on the classes of the aggregator. The file
+    is written to a temporary file first and then renamed, so a partially written file is never read.
+
+    Args:
+        partial_file: file to which the partial aggregates are written.
+        parameters: tuple of the settings the partial aggregates depend on, e.g. the regular expression and the login
+         failure limits. Only the partial aggregates of the same parameters are reduced together.
+        header: dictionary with the shard time range and record counts, as returned by get_partial_aggregates.
+        partial_aggregates: dictionary of the partial aggregates, as returned by get_partial_aggregates.
+
+    Raises:
+        IOError: if there is some problem writing the partial aggregates file.
+        OSError: if there is some problem opening or renaming the partial aggregates file.
+
+    """
+
+    arrays = dict()
+
+    # every host of the heads, the synced states and the blocked records has visits in the shard
+    host_names = partial_aggregates['host_visit_counts'].keys()
+    host_codes = dict((host_name, code) for code, host_name in enumerate(host_names))
+    arrays['host_names_blob'], arrays['host_names_offsets'] = encode_string_column(host_names)[1:]
+    arrays['host_visit_counts'] = np.array([partial_aggregates['host_visit_counts'][host_name]
+                                            for host_name in host_names], dtype=np.int64)
+
+    uris = partial_aggregates['uri_bandwidth'].keys()
+    arrays['uris_blob'], arrays['uris_offsets'] = encode_string_column(uris)[1:]
+    arrays['uri_bandwidth'] = np.array([partial_aggregates['uri_bandwidth'][uri] for uri in uris], dtype=np.int64)
+
+    seconds = sorted(partial_aggregates['timestamp_visit_counts'])
+    arrays['seconds'] = np.array(seconds, dtype=np.int64)
+    arrays['second_visits'] = np.array([partial_aggregates['timestamp_visit_counts'][epoch_seconds]
+                                        for epoch_seconds in seconds], dtype=np.int64)
+
+    # the heads of all the hosts one after the other, in the order of the requests of every host
+    head_records = [(host_name, epoch_seconds, http_status_code, sequence_number, log_entry)
+                    for host_name, host_head in partial_aggregates['host_heads'].iteritems()
+                    for epoch_seconds, http_status_code, sequence_number, log_entry in host_head]
+    encode_login_records(arrays=arrays, prefix='head_', login_records=[
+        (host_name, epoch_seconds, sequence_number, log_entry)
+        for host_name, epoch_seconds, _, sequence_number, log_entry in head_records], host_codes=host_codes)
+    arrays['head_statuses'], arrays['head_statuses_blob'], arrays['head_statuses_offsets'] = \
+        encode_string_column([http_status_code for _, _, http_status_code, _, _ in head_records])
+    arrays['synced_head_hosts'] = np.array([host_codes[host_name] for host_name in
+                                            partial_aggregates['synced_head_hosts']], dtype=np.int32)
+
+    # the failure timestamps of the synced hosts one after the other, split by their offsets
+    synced_host_states = partial_aggregates['synced_host_states'].items()
+    arrays['state_hosts'] = np.array([host_codes[host_name] for host_name, _ in synced_host_states], dtype=np.int32)
+    arrays['state_failure_offsets'] = np.zeros(len(synced_host_states) + 1, dtype=np.int64)
+    np.cumsum([len(failure_timestamps) for _, (failure_timestamps, _) in synced_host_states],
+              out=arrays['state_failure_offsets'][1:])
+    arrays['state_failure_timestamps'] = np.array([failure_timestamp for _, (failure_timestamps, _) in
+                                                   synced_host_states for failure_timestamp in failure_timestamps],
+                                                  dtype=np.int64)
+    arrays['state_blocked'] = np.array([block_start_time is not None for _, (_, block_start_time) in
+                                        synced_host_states], dtype=bool)
+    arrays['state_block_start_times'] = np.array([block_start_time or 0 for _, (_, block_start_time) in
+                                                  synced_host_states], dtype=np.int64)
+
+    encode_login_records(arrays=arrays, prefix='blocked_', login_records=partial_aggregates['blocked_records'],
+                         host_codes=host_codes)
+
+    manifest = dict((field, header[field]) for field in HEADER_FIELDS)
+    manifest.update(version=PARTIAL_FORMAT_VERSION, parameters=parameters)
+    arrays['manifest'] = np.frombuffer(json.dumps(manifest), dtype=np.uint8)
+
+    partial_dir = os.path.dirname(os.path.abspath(partial_file))
+
+    if not os.path.isdir(partial_dir):
+        os.makedirs(partial_dir)
+
+    with atomic_write(partial_file) as output_file:
+        np.savez_compressed(output_file, **arrays)
+
+
+def load_partial_aggregates(partial_file=None, header_only=False):
+
+    """Loads the header and the partial aggregates of a shard from the partial aggregates file.
+
+    Args:
+        partial_file: file written by save_partial_aggregates.
+        header_only: whether to load the header only.
+
+    Returns:
+        A tuple of the header dictionary and the dictionary of the partial aggregates, None if header_only.
+
+    Raises:
+        IOError: if there is some problem reading the partial aggregates file.
+        ValueError: if the file is not a partial aggregates file of the current version.
+
+    """
+
+    try:
+        partial_arrays = np.load(partial_file, allow_pickle=False)
+    except zipfile.BadZipfile as e:
+        raise ValueError('invalid partial aggregates file {}: {}'.format(partial_file, e))
+    except ValueError:
+        # neither an .npz nor an .npy file, e.g. a pickle of an earlier version
+        raise ValueError('not a partial aggregates file: ' + partial_file)
+
+    # a single .npy array instead of an .npz file
+    if not isinstance(partial_arrays, np.lib.npyio.NpzFile):
+        raise ValueError('not a partial aggregates file: ' + partial_file)
+
+    try:
+        manifest = json.loads(partial_arrays['manifest'].tostring())
+
+        if not isinstance(manifest, dict) or manifest.get('version') != PARTIAL_FORMAT_VERSION:
+            raise ValueError('not a partial aggregates file of version {}: {}'.format(PARTIAL_FORMAT_VERSION,
+                                                                                     partial_file))
+
+        # the strings of the log file are byte strings, like the ones of the parser
+        header = dict(manifest, timezone=str(manifest['timezone']) if manifest['timezone'] is not None else None)
+
+        if header_only:
+            return header, None
+
+        host_names = decode_string_values(partial_arrays['host_names_blob'], partial_arrays['host_names_offsets'])
+        uris = decode_string_values(partial_arrays['uris_blob'], partial_arrays['uris_offsets'])
+
+        host_heads = dict()
+        head_statuses = decode_string_column(partial_arrays['head_statuses'], partial_arrays['head_statuses_blob'],
+                                             partial_arrays['head_statuses_offsets']).tolist()
+        for (host_name, epoch_seconds, sequence_number, log_entry), http_status_code in \
+                zip(decode_login_records(partial_arrays=partial_arrays, prefix='head_', host_names=host_names),
+                    head_statuses):
+            host_heads.setdefault(host_name, list()).append((epoch_seconds, http_status_code, sequence_number,
+                                                             log_entry))
+
+        failure_offsets = partial_arrays['state_failure_offsets'].tolist()
+        failure_timestamps = partial_arrays['state_failure_timestamps'].tolist()
+        synced_host_states = dict(
+            (host_name, (failure_timestamps[failure_offsets[row]:failure_offsets[row + 1]],
+                         block_start_time if is_blocked else None))
+            for row, (host_name, is_blocked, block_start_time) in enumerate(zip(
+                host_names[partial_arrays['state_hosts']].tolist(), partial_arrays['state_blocked'].tolist(),
+                partial_arrays['state_block_start_times'].tolist())))
+
+        partial_aggregates = {
+            'host_visit_counts': dict(zip(host_names.tolist(), partial_arrays['host_visit_counts'].tolist())),
+            'uri_bandwidth': dict(zip(uris.tolist(), partial_arrays['uri_bandwidth'].tolist())),
+            'timestamp_visit_counts': dict(zip(partial_arrays['seconds'].tolist(),
+                                               partial_arrays['second_visits'].tolist())),
+            'host_heads': host_heads,
+            'synced_head_hosts': set(host_names[partial_arrays['synced_head_hosts']].tolist()),
+            'synced_host_states': synced_host_states,
+            'blocked_records': decode_login_records(partial_arrays=partial_arrays, prefix='blocked_',
+                                                    host_names=host_names),
+        }
+
+        return header, partial_aggregates
+
+    except (KeyError, IndexError, TypeError) as e:
+        raise ValueError('invalid partial aggregates file {}: {}'.format(partial_file, e))
+
+    finally:
+        partial_arrays.close()
+
+
+def merge_partial_aggregates(partial_files=None, parameters=None, blocked_window_time=0, consecutive_failure_limit=0,
+                             login_failure_window=0):
+
+    """Merges the partial aggregates of the shards into a LogAggregator with all the records of the log aggregated.
+
+    The shards are merged in the order of their first timestamp, loading one shard at a time. The counts and the
+    visit histograms are added up. The login failure state of every host is carried from shard to shard: the head of
+    every host is replayed from its state at the end of the earlier shards, and once the host is past its sync point
+    its state and blocked requests are the ones of the shard. The blocked requests are therefore the same as with a
+    single LogAggregator over the whole log, as long as the shards are consecutive parts of the log. Overlapping
+    shards, e.g. the logs of several web servers over the same days, are merged exactly for the top hosts, resources
+    and busiest periods, but not for the blocked requests, and a warning is printed.
+
+    Args:
+        partial_files: list of the partial aggregates files of the shards, in any order.
+        parameters: tuple of the settings the partial aggregates must have been saved with.
+        blocked_window_time: blocked window time in minutes after consecutive login failures. E.g. 5 min attempts block
+        consecutive_failure_limit: threshold for number of consecutive login failures. E.g. 3 failures
+        login_failure_window: failure window time in seconds over which the consecutive failures occur. E.g. 20 seconds
+
+    Returns:
+        A tuple of the LogAggregator with the merged aggregates, whose blocked records have (shard index, sequence
+        number) tuples as sequence numbers, and the total numbers of lines of the shards matching and not matching
+        the regular expression.
+
+    Raises:
+        IOError: if there is some problem reading a partial aggregates file.
+        ValueError: if a file is not a partial aggregates file or was saved with other parameters.
+
+    """
+
+    shard_headers = list()
+
+    for partial_file in partial_files:
+        header, _ = load_partial_aggregates(partial_file=partial_file, header_only=True)
+
+        # the parameters of the manifest are a JSON list, compared with the ones of the pipeline as saved
+        if header['parameters'] != json.loads(json.dumps(parameters)):
+            raise ValueError('the partial aggregates file was saved with other settings: ' + partial_file)
+
+        # the shards without any record have no time range and nothing to merge
+        if header['shard_start_time'] is not None:
+            shard_headers.append((header['shard_start_time'], len(shard_headers), partial_file, header))
+
+    shard_headers.sort()
+
+    log_aggregator = LogAggregator(blocked_window_time=blocked_window_time,
+                                   consecutive_failure_limit=consecutive_failure_limit,
+                                   login_failure_window=login_failure_window)
+    host_states = log_aggregator.login_failure_detector.host_states
+    num_valid_records, num_invalid_records = 0, 0
+    previous_header = None
+
+    for shard_index, (shard_start_time, _, partial_file, header) in enumerate(shard_headers):
+
+        if previous_header is not None and previous_header['shard_end_time'] > shard_start_time:
+            print "Warning: the shards {} and {} overlap in time, the blocked attempts are only exact for " \
+                  "consecutive shards".format(previous_header['partial_file'], partial_file)
+        previous_header = dict(header, partial_file=partial_file)
+
+        _, partial_aggregates = load_partial_aggregates(partial_file=partial_file)
+
+        for host_name, visit_count in partial_aggregates['host_visit_counts'].iteritems():
+            log_aggregator.host_visit_counts[host_name] += visit_count
+
+        for uri, bandwidth in partial_aggregates['uri_bandwidth'].iteritems():
+            log_aggregator.uri_bandwidth[uri] += bandwidth
+
+        for epoch_seconds, visit_count in partial_aggregates['timestamp_visit_counts'].iteritems():
+            log_aggregator.timestamp_visit_counts[epoch_seconds] += visit_count
+
+        if log_aggregator.timezone is None:
+            log_aggregator.timezone = header['timezone']
+
+        log_aggregator.num_records += header['num_records']
+        num_valid_records += header['num_valid_records']
+        num_invalid_records += header['num_invalid_records']
+
+        # replay the heads from the state the hosts have at the end of the earlier shards
+        for host_name, head_records in partial_aggregates['host_heads'].iteritems():
+            for epoch_seconds, http_status_code, sequence_number, log_entry in head_records:
+                if log_aggregator.login_failure_detector.update(host_name, epoch_seconds, http_status_code):
+                    log_aggregator.blocked_records.append((host_name, epoch_seconds, (shard_index, sequence_number),
+                                                           log_entry))
+
+        # past their sync point, the hosts of the shard have their state at the end of the shard. The hosts without
+        # requests in the shard keep their state, and the ones not synced the state of their replayed head.
+        host_heads, synced_head_hosts = partial_aggregates['host_heads'], partial_aggregates['synced_head_hosts']
+
+        for host_name in [host_name for host_name in host_states
+                          if host_name in partial_aggregates['host_visit_counts'] and
+                          (host_name not in host_heads or host_name in synced_head_hosts)]:
+            del host_states[host_name]
+
+        for host_name, (failure_timestamps, block_start_time) in \
+                partial_aggregates['synced_host_states'].iteritems():
+            host_state = host_states[host_name] = HostLoginState()
+            host_state.failure_timestamps = list(failure_timestamps)
+            host_state.block_start_time = block_start_time
+
+        log_aggregator.blocked_records.extend((host_name, epoch_seconds, (shard_index, sequence_number), log_entry)
+                                              for host_name, epoch_seconds, sequence_number, log_entry in
+                                              partial_aggregates['blocked_records'])
+
+    return log_aggregator, num_valid_records, num_invalid_records
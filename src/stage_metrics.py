@@ -0,0 +1,293 @@
+import os
+import sys
+import json
+import time
+import resource
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from atomic_file import atomic_write
+
+# prefix of the names of the Prometheus metrics
+METRIC_PREFIX = 'process_log'
+
+
+def get_cpu_seconds():
+
+    """Gets the user and system CPU time of the process so far in seconds."""
+
+    cpu_times = os.times()
+
+    return cpu_times[0] + cpu_times[1]
+
+
+def get_rss_bytes():
+
+    """Gets the current resident set size of the process in bytes.
+
+    Read from /proc/self/statm on Linux. Elsewhere the peak resident set size is used instead, so the memory deltas
+    are then only the growth of the peak.
+
+    """
+
+    try:
+        with open('/proc/self/statm') as statm_file:
+            return int(statm_file.read().split()[1]) * resource.getpagesize()
+
+    except (IOError, OSError, IndexError, ValueError):
+        return get_peak_rss_bytes()
+
+
+def get_peak_rss_bytes():
+
+    """Gets the peak resident set size of the process so far in bytes."""
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # macOS reports the peak resident set size in bytes, Linux in kilobytes
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+
+class StageRecord(object):
+
+    """Metrics of one stage of the program.
+
+    The times and the memory delta exclude the nested stages, so the stages of a run add up to its total.
+
+    Attributes:
+        name: name of the stage. E.g. parse
+        calls: number of times the stage was entered.
+        wall_seconds: wall clock time spent in the stage.
+        cpu_seconds: user and system CPU time spent in the stage.
+        memory_delta_bytes: change of the resident set size over the stage.
+        rows_in: number of rows the stage consumed, None if not applicable.
+        rows_out: number of rows the stage produced, None if not applicable.
+        peak_rss_bytes: peak resident set size of the process at the end of the stage.
+
+    """
+
+    def __init__(self, name=None):
+        self.name = name
+        self.calls = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.memory_delta_bytes = 0
+        self.rows_in = None
+        self.rows_out = None
+        self.peak_rss_bytes = 0
+
+    def add(self, wall_seconds=0.0, cpu_seconds=0.0, memory_delta_bytes=0):
+        self.wall_seconds += wall_seconds
+        self.cpu_seconds += cpu_seconds
+        self.memory_delta_bytes += memory_delta_bytes
+
+    def add_rows(self, rows_in=None, rows_out=None):
+
+        """Adds to the number of rows consumed and produced by the stage."""
+
+        if rows_in is not None:
+            self.rows_in = (self.rows_in or 0) + rows_in
+
+        if rows_out is not None:
+            self.rows_out = (self.rows_out or 0) + rows_out
+
+    def to_dict(self):
+        return OrderedDict([('stage', self.name), ('calls', self.calls), ('wall_seconds', self.wall_seconds),
+                            ('cpu_seconds', self.cpu_seconds), ('memory_delta_bytes', self.memory_delta_bytes),
+                            ('rows_in', self.rows_in), ('rows_out', self.rows_out),
+                            ('peak_rss_bytes', self.peak_rss_bytes)])
+
+
+class StageMetrics(object):
+
+    """Recorder of the wall time, CPU time, rows and memory delta of the stages of the program.
+
+    The stages are recorded with the stage context manager, or with the iterate generator for the stages which are
+    streamed, e.g. the parsing of the log file consumed batch by batch by the data frame creation. The time of a
+    stage nested in another one is not counted for the outer stage.
+
+    The stages can be recorded from more than one thread, each thread nesting its own stages. The CPU time and the
+    resident set size are those of the whole process, so they also include the other threads running concurrently.
+
+    Attributes:
+        stages: ordered dictionary with the stage name as key and its StageRecord as value, in the order the stages
+         were first entered.
+        thread_state: thread local state with the stack of the StageRecord objects of the stages currently entered by
+         the thread, as active_stages.
+        lock: lock held while creating and updating the StageRecord objects.
+        start_time: epoch seconds at which the recording started.
+
+    """
+
+    def __init__(self):
+        self.stages = OrderedDict()
+        self.thread_state = threading.local()
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+
+    def get_active_stages(self):
+
+        """Gets the stack of the StageRecord objects of the stages currently entered by the calling thread."""
+
+        if not hasattr(self.thread_state, 'active_stages'):
+            self.thread_state.active_stages = list()
+
+        return self.thread_state.active_stages
+
+    def get_stage(self, name=None):
+
+        """Gets the StageRecord of the stage, creating it on the first use."""
+
+        with self.lock:
+            if name not in self.stages:
+                self.stages[name] = StageRecord(name)
+
+            return self.stages[name]
+
+    @contextmanager
+    def stage(self, name=None, rows_in=None):
+
+        """Records the enclosed block as the named stage.
+
+        Args:
+            name: name of the stage.
+            rows_in: optional number of rows consumed by the stage.
+
+        Yields:
+            The StageRecord of the stage, to add the rows produced to.
+
+        """
+
+        stage_record = self.get_stage(name)
+        active_stages = self.get_active_stages()
+
+        with self.lock:
+            stage_record.calls += 1
+            stage_record.add_rows(rows_in=rows_in)
+
+        start_wall_seconds, start_cpu_seconds, start_rss_bytes = time.time(), get_cpu_seconds(), get_rss_bytes()
+        active_stages.append(stage_record)
+
+        try:
+            yield stage_record
+
+        finally:
+            active_stages.pop()
+
+            wall_seconds = time.time() - start_wall_seconds
+            cpu_seconds = get_cpu_seconds() - start_cpu_seconds
+            memory_delta_bytes = get_rss_bytes() - start_rss_bytes
+
+            with self.lock:
+                stage_record.add(wall_seconds, cpu_seconds, memory_delta_bytes)
+                stage_record.peak_rss_bytes = get_peak_rss_bytes()
+
+                # the enclosing stage only keeps its own share
+                if len(active_stages) > 0:
+                    active_stages[-1].add(-wall_seconds, -cpu_seconds, -memory_delta_bytes)
+
+    def iterate(self, name=None, iterable=None, count_rows=None):
+
+        """Records the time spent producing every item of the iterable as the named stage.
+
+        Args:
+            name: name of the stage.
+            iterable: the iterable to be consumed, e.g. a generator of record batches.
+            count_rows: optional function returning the number of rows in an item, added to the rows produced.
+
+        Yields:
+            Every item of the iterable.
+
+        """
+
+        iterator = iter(iterable)
+
+        while True:
+
+            with self.stage(name) as stage_record:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+
+                if count_rows is not None:
+                    with self.lock:
+                        stage_record.add_rows(rows_out=count_rows(item))
+
+            yield item
+
+    def to_dict(self):
+
+        """Gets the recorded metrics as a dictionary, which can be serialized as JSON."""
+
+        return OrderedDict([('start_time', self.start_time),
+                            ('wall_seconds', time.time() - self.start_time),
+                            ('peak_rss_bytes', get_peak_rss_bytes()),
+                            ('stages', [stage_record.to_dict() for stage_record in self.stages.itervalues()])])
+
+    def to_prometheus(self):
+
+        """Gets the recorded metrics in the Prometheus text exposition format.
+
+        Returns:
+            The text with one gauge per stage metric, labelled by the stage name, and the run totals. Example:
+
+                # HELP process_log_stage_wall_seconds Wall clock time spent in the stage.
+                # TYPE process_log_stage_wall_seconds gauge
+                process_log_stage_wall_seconds{stage="parse"} 1.418
+
+        """
+
+        lines = list()
+
+        stage_metrics = [('wall_seconds', 'Wall clock time spent in the stage.'),
+                         ('cpu_seconds', 'User and system CPU time spent in the stage.'),
+                         ('memory_delta_bytes', 'Change of the resident set size over the stage.'),
+                         ('rows_in', 'Number of rows consumed by the stage.'),
+                         ('rows_out', 'Number of rows produced by the stage.')]
+
+        for metric, help_text in stage_metrics:
+
+            metric_name = '{}_stage_{}'.format(METRIC_PREFIX, metric)
+            lines.append('# HELP {} {}'.format(metric_name, help_text))
+            lines.append('# TYPE {} gauge'.format(metric_name))
+
+            for stage_record in self.stages.itervalues():
+                value = getattr(stage_record, metric)
+                if value is not None:
+                    lines.append('{}{{stage="{}"}} {!r}'.format(metric_name, stage_record.name, value))
+
+        for metric, help_text, value in [
+                ('wall_seconds', 'Wall clock time of the run.', time.time() - self.start_time),
+                ('peak_rss_bytes', 'Peak resident set size of the run.', get_peak_rss_bytes()),
+                ('last_run_timestamp_seconds', 'Epoch seconds at which the run started.', self.start_time)]:
+
+            metric_name = '{}_{}'.format(METRIC_PREFIX, metric)
+            lines.append('# HELP {} {}'.format(metric_name, help_text))
+            lines.append('# TYPE {} gauge'.format(metric_name))
+            lines.append('{} {!r}'.format(metric_name, value))
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, metrics_file=None, metrics_format='json'):
+
+        """Writes the recorded metrics to the metrics file as JSON or in the Prometheus text format.
+
+        The file is written with atomic_write, so a collector like the node exporter textfile collector never reads a
+        partially written file, and it is readable by the collector, which usually runs as another user, under the
+        usual umask.
+
+        Raises:
+            IOError: if there is some problem writing the metrics file.
+            OSError: if there is some problem opening or renaming the metrics file.
+
+        """
+
+        if metrics_format == 'prometheus':
+            metrics_text = self.to_prometheus()
+        else:
+            metrics_text = json.dumps(self.to_dict(), indent=2) + '\n'
+
+        with atomic_write(metrics_file, mode='w') as output_file:
+            output_file.write(metrics_text)
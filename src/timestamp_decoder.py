@@ -0,0 +1,160 @@
+import time
+import calendar
+
+# format of the timestamp in the log entries (without the timezone)
+TIMESTAMP_FORMAT = '%d/%b/%Y:%H:%M:%S'
+
+# month numbers of the abbreviated month names in the log timestamps
+MONTH_NUMBERS = dict((month_name, month_number) for month_number, month_name in
+                     enumerate(['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'],
+                               start=1))
+
+
+def parse_timezone_offset(timezone=None):
+
+    """Converts the log file timezone to its offset from UTC in seconds.
+
+    Args:
+        timezone: the timezone string from the log file. E.g. -0400
+
+    Returns:
+        The offset of the timezone from UTC in seconds. E.g. -14400 for -0400
+
+    Raises:
+        ValueError: if the timezone is not a [+-]HHMM offset.
+
+    """
+
+    if timezone is None or len(timezone) != 5 or timezone[0] not in '+-' or not timezone[1:].isdigit() or \
+            int(timezone[3:5]) > 59:
+        raise ValueError('invalid timezone: ' + repr(timezone))
+
+    offset_seconds = int(timezone[1:3]) * 3600 + int(timezone[3:5]) * 60
+
+    return -offset_seconds if timezone[0] == '-' else offset_seconds
+
+
+class TimestampDecoder(object):
+
+    """Decoder of the fixed width log file timestamps into epoch seconds.
+
+    Parses the dd/Mon/YYYY:HH:MM:SS layout by slicing instead of time.strptime. The consecutive log records very
+    often share the same second and always the same few days, so the last decoded timestamp is reused as it is and
+    the epoch seconds of the midnight of every date prefix are memoized. The timestamps not in the fixed width layout
+    are parsed with time.strptime, so the accepted timestamps are the same.
+
+    With the timezone of a record, the timestamp is converted to the actual UTC instant, so the records of the log
+    files with more than one timezone are still compared correctly. For a single timezone log file, the differences
+    between the decoded timestamps are the same as without the timezone.
+
+    Attributes:
+        day_epoch_seconds: dictionary with the date prefix (dd/Mon/YYYY) as key and the epoch seconds of its
+         midnight as value.
+        timezone_offsets: dictionary with the timezone string as key and its offset from UTC in seconds as value.
+        last_timestamp: the last decoded timestamp string.
+        last_epoch_seconds: the epoch seconds of the last decoded timestamp, ignoring the timezone.
+
+    """
+
+    def __init__(self):
+        self.day_epoch_seconds = dict()
+        self.timezone_offsets = dict()
+        self.last_timestamp = None
+        self.last_epoch_seconds = None
+
+    def decode(self, timestamp=None, timezone=None):
+
+        """Converts the log file timestamp to epoch seconds.
+
+        Args:
+            timestamp: the timestamp string without the timezone. E.g. 01/Jul/1995:00:00:01
+            timezone: optional timezone string of the timestamp. E.g. -0400
+
+        Returns:
+            The UTC epoch seconds of the timestamp in the timezone, or the epoch seconds of the timestamp read as UTC
+            if no timezone is given.
+
+        Raises:
+            ValueError: if the timestamp does not match the log file timestamp format or the timezone is invalid.
+
+        """
+
+        if timestamp != self.last_timestamp:
+            self.last_epoch_seconds = self.decode_local(timestamp)
+            self.last_timestamp = timestamp
+
+        if timezone is None:
+            return self.last_epoch_seconds
+
+        return self.last_epoch_seconds - self.get_timezone_offset(timezone)
+
+    def decode_local(self, timestamp=None):
+
+        """Converts the log file timestamp to epoch seconds, reading it as UTC and without the last value memo.
+
+        Raises:
+            ValueError: if the timestamp does not match the log file timestamp format.
+
+        """
+
+        # fixed width layout dd/Mon/YYYY:HH:MM:SS
+        if timestamp is not None and len(timestamp) == 20 and timestamp[11] == ':' and timestamp[14] == ':' and \
+                timestamp[17] == ':':
+
+            day_epoch_seconds = self.day_epoch_seconds.get(timestamp[:11])
+
+            if day_epoch_seconds is None:
+                day_epoch_seconds = self.decode_day(timestamp[:11])
+
+            time_digits = timestamp[12:14] + timestamp[15:17] + timestamp[18:20]
+
+            if day_epoch_seconds is not None and time_digits.isdigit():
+
+                hours, minutes, seconds = int(time_digits[0:2]), int(time_digits[2:4]), int(time_digits[4:6])
+
+                if hours < 24 and minutes < 60 and seconds < 60:
+                    return day_epoch_seconds + hours * 3600 + minutes * 60 + seconds
+
+        # every other layout is left to strptime, e.g. leap seconds or the invalid timestamps
+        return calendar.timegm(time.strptime(timestamp, TIMESTAMP_FORMAT))
+
+    def decode_day(self, date_prefix=None):
+
+        """Converts the dd/Mon/YYYY date prefix of a timestamp to the epoch seconds of its midnight and memoizes it.
+
+        Returns:
+            The epoch seconds of the midnight of the date, None if the date prefix is not in the fixed width layout
+            or is not a valid date.
+
+        """
+
+        if date_prefix[2] != '/' or date_prefix[6] != '/' or date_prefix[3:6] not in MONTH_NUMBERS or \
+                not (date_prefix[0:2] + date_prefix[7:11]).isdigit():
+            return None
+
+        day, month, year = int(date_prefix[0:2]), MONTH_NUMBERS[date_prefix[3:6]], int(date_prefix[7:11])
+
+        if year < 1 or day < 1 or day > calendar.monthrange(year, month)[1]:
+            return None
+
+        day_epoch_seconds = calendar.timegm((year, month, day, 0, 0, 0))
+        self.day_epoch_seconds[date_prefix] = day_epoch_seconds
+
+        return day_epoch_seconds
+
+    def get_timezone_offset(self, timezone=None):
+
+        """Gets the memoized offset of the timezone from UTC in seconds.
+
+        Raises:
+            ValueError: if the timezone is not a [+-]HHMM offset.
+
+        """
+
+        offset_seconds = self.timezone_offsets.get(timezone)
+
+        if offset_seconds is None:
+            offset_seconds = parse_timezone_offset(timezone)
+            self.timezone_offsets[timezone] = offset_seconds
+
+        return offset_seconds